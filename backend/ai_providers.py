@@ -5,24 +5,42 @@ Supports multiple AI providers with automatic fallback
 
 import os
 import json
+import time
+import threading
 import requests
 from abc import ABC, abstractmethod
-from typing import Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import closing
+from typing import Optional, Dict, Any, Iterator, Callable
 import google.generativeai as genai
+import http_client
+from provider_health import ProviderError, ProviderHealth, is_rate_limit, parse_retry_after
+
 
 class AIProvider(ABC):
     """Abstract base class for AI providers"""
+    
     @abstractmethod
-    def generate_content(self, prompt: str) -> str:
+    def generate_content(self, prompt: str, json_mode: bool = False) -> str:
+        """Generate content based on the prompt (json_mode: ask for a bare JSON object)"""
         pass
+    
     @abstractmethod
     def is_available(self) -> bool:
+        """Check if the provider is available (API key configured)"""
         pass
+    
+    def stream_content(self, prompt: str) -> Iterator[str]:
+        """Yield the response text in chunks as it is generated (default: one chunk)"""
+        yield self.generate_content(prompt)
+    
     @property
     @abstractmethod
     def name(self) -> str:
+        """Provider name"""
         pass
 
+
 class GitHubModelProvider(AIProvider):
     """GitHub Models Provider - Generic class for any GitHub-hosted model"""
     def __init__(self, model_name: str, display_name: str, temperature: float = 0.8, top_p: float = 0.1, max_tokens: int = 2048):
@@ -38,7 +56,7 @@ class GitHubModelProvider(AIProvider):
         else:
             print("⚠️  GITHUB_TOKEN not found")
 
-    def generate_content(self, prompt: str) -> str:
+    def generate_content(self, prompt: str, json_mode: bool = False) -> str:
         if not self.api_key:
             raise Exception("GITHUB_TOKEN not configured")
         headers = {
@@ -55,12 +73,14 @@ class GitHubModelProvider(AIProvider):
             "temperature": self.temperature,
             "top_p": self.top_p
         }
+        if json_mode:
+            payload["response_format"] = {"type": "json_object"}
         try:
-            response = requests.post(
+            response = http_client.post(
                 self.api_url,
                 headers=headers,
                 json=payload,
-                timeout=60
+                read_timeout=60
             )
             response.raise_for_status()
             result = response.json()
@@ -76,7 +96,52 @@ class GitHubModelProvider(AIProvider):
             else:
                 raise Exception(f"Unexpected response format: {result}")
         except requests.exceptions.RequestException as e:
-            raise Exception(f"{self.display_name} API request failed: {str(e)}")
+            raise self._request_error(e)
+
+    def stream_content(self, prompt: str) -> Iterator[str]:
+        if not self.api_key:
+            raise Exception("GITHUB_TOKEN not configured")
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "Accept": "text/event-stream"
+        }
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": "You are a creative storyteller."},
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+            "top_p": self.top_p,
+            "stream": True
+        }
+        try:
+            with http_client.post(self.api_url, headers=headers, json=payload, read_timeout=60, stream=True) as response:
+                response.raise_for_status()
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        return
+                    chunk = json.loads(data)
+                    # The first chunk may only carry content-filter results
+                    for choice in chunk.get("choices") or []:
+                        content = (choice.get("delta") or {}).get("content")
+                        if content:
+                            yield content
+        except requests.exceptions.RequestException as e:
+            raise self._request_error(e)
+
+    def _request_error(self, error: requests.exceptions.RequestException) -> ProviderError:
+        response = getattr(error, "response", None)
+        return ProviderError(
+            f"{self.display_name} API request failed: {str(error)}",
+            status_code=response.status_code if response is not None else None,
+            retry_after=parse_retry_after(response.headers.get("Retry-After")) if response is not None else None
+        )
 
     def is_available(self) -> bool:
         return self.api_key is not None
@@ -85,38 +150,6 @@ class GitHubModelProvider(AIProvider):
     def name(self) -> str:
         return self.display_name
 
-"""
-AI Provider Abstraction Layer
-Supports multiple AI providers with automatic fallback
-"""
-
-import os
-import json
-import requests
-from abc import ABC, abstractmethod
-from typing import Optional, Dict, Any
-import google.generativeai as genai
-
-
-class AIProvider(ABC):
-    """Abstract base class for AI providers"""
-    
-    @abstractmethod
-    def generate_content(self, prompt: str) -> str:
-        """Generate content based on the prompt"""
-        pass
-    
-    @abstractmethod
-    def is_available(self) -> bool:
-        """Check if the provider is available (API key configured)"""
-        pass
-    
-    @property
-    @abstractmethod
-    def name(self) -> str:
-        """Provider name"""
-        pass
-
 
 class GeminiProvider(AIProvider):
     """Google Gemini AI Provider"""
@@ -133,13 +166,26 @@ class GeminiProvider(AIProvider):
                 print(f"⚠️  Gemini provider initialization failed: {e}")
                 self._model = None
     
-    def generate_content(self, prompt: str) -> str:
+    def generate_content(self, prompt: str, json_mode: bool = False) -> str:
         if not self._model:
             raise Exception("Gemini model not initialized")
         
-        response = self._model.generate_content(prompt)
+        if json_mode:
+            response = self._model.generate_content(
+                prompt, generation_config={'response_mime_type': 'application/json'}
+            )
+        else:
+            response = self._model.generate_content(prompt)
         return response.text
     
+    def stream_content(self, prompt: str) -> Iterator[str]:
+        if not self._model:
+            raise Exception("Gemini model not initialized")
+        
+        for chunk in self._model.generate_content(prompt, stream=True):
+            if chunk.text:
+                yield chunk.text
+    
     def is_available(self) -> bool:
         return self._model is not None and self.api_key is not None
     
@@ -176,29 +222,52 @@ class AIProviderManager:
                 "- GITHUB_TOKEN for GitHub Models\n"
                 "- GEMINI_API_KEY for Google Gemini")
         
+        # Runtime health per provider; available_providers is re-sorted as it changes
+        self._configured_order = list(self.available_providers)
+        self.health = {p.name: ProviderHealth(p.name) for p in self.available_providers}
+        self._order_lock = threading.Lock()
+        
         print(f"\n🤖 Available AI Providers: {[p.name for p in self.available_providers]}")
         print(f"🎯 Primary provider: {self.available_providers[0].name}\n")
+        
+        # Hedged mode: start a backup provider when the primary is slower than usual
+        self.hedged = os.getenv('AI_HEDGED', 'false').lower() in ('1', 'true', 'yes')
+        self.hedge_delay = float(os.getenv('AI_HEDGE_DELAY', 8))          # seconds, used until enough samples exist
+        self.hedge_min_delay = float(os.getenv('AI_HEDGE_MIN_DELAY', 2))
+        self.hedge_budget = max(1, int(os.getenv('AI_HEDGE_BUDGET', 2)))  # max provider calls in flight per request
+        self._executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('AI_HEDGE_POOL_SIZE', 8)),
+            thread_name_prefix='ai-hedge'
+        ) if self.hedged else None
+        if self.hedged:
+            print(f"🪁 Hedged requests enabled (budget: {self.hedge_budget} concurrent calls)")
     
-    def generate_content(self, prompt: str) -> str:
+    def generate_content(self, prompt: str, validate: Optional[Callable[[str], Any]] = None) -> str:
         """
         Generate content using available providers with automatic fallback
         Tries providers in order until one succeeds
-        Returns tuple: (content, provider_name)
+        In hedged mode, `validate` (raises on bad output) decides which response wins
         """
+        if self.hedged:
+            return self._generate_hedged(prompt, validate)
+        
         last_error = None
         
-        for provider in self.available_providers:
+        for provider in self.candidate_providers():
             try:
                 print(f"🔄 Trying {provider.name}...")
+                started = time.monotonic()
                 result = provider.generate_content(prompt)
+                self.record_success(provider, time.monotonic() - started)
                 print(f"✅ Story generated by: {provider.name}")
                 # Return result with model name embedded in a comment (for logging)
                 return result
             except Exception as e:
                 error_msg = str(e)
                 print(f"❌ {provider.name} failed: {error_msg}")
+                self.record_failure(provider, e)
                 # Check if it's a rate limit error (429) - continue to next provider
-                if "429" in error_msg or "Too Many Requests" in error_msg:
+                if is_rate_limit(e):
                     print(f"⏭️  Rate limit hit, trying next provider...")
                 last_error = e
                 continue
@@ -207,6 +276,158 @@ class AIProviderManager:
         raise Exception(
             f"All AI providers failed. Last error: {str(last_error)}"
         )
+
+    def generate_json(self, prompt: str) -> str:
+        """
+        One JSON-mode call on the fastest healthy provider, falling back in order.
+        Meant for short follow-ups such as repairing a malformed response, so it
+        is never hedged.
+        """
+        last_error = None
+        for provider in self.candidate_providers():
+            try:
+                started = time.monotonic()
+                result = provider.generate_content(prompt, json_mode=True)
+                self.record_success(provider, time.monotonic() - started)
+                print(f"✅ JSON repaired by: {provider.name}")
+                return result
+            except Exception as e:
+                print(f"❌ {provider.name} failed: {e}")
+                self.record_failure(provider, e)
+                last_error = e
+        raise Exception(f"All AI providers failed. Last error: {str(last_error)}")
+
+    def candidate_providers(self):
+        """Providers worth calling now, fastest healthy first; all of them if every breaker is open"""
+        self._reorder()
+        allowed = [p for p in self.available_providers if self.health[p.name].allow_request()]
+        return allowed or list(self.available_providers)
+    
+    def _reorder(self):
+        # sorted() is stable, so providers without data keep their configured order
+        with self._order_lock:
+            self.available_providers = sorted(
+                self._configured_order, key=lambda p: self.health[p.name].sort_key()
+            )
+    
+    def record_success(self, provider: AIProvider, latency: float, first_chunk: bool = False):
+        self.health[provider.name].record_success(latency, first_chunk=first_chunk)
+        self._reorder()
+    
+    def record_failure(self, provider: AIProvider, error: Exception):
+        self.health[provider.name].record_failure(error)
+        self._reorder()
+    
+    def current_hedge_delay(self, provider: AIProvider) -> float:
+        """p95 latency of the provider, or the configured delay until it has 20 samples"""
+        health = self.health[provider.name]
+        if health.sample_count() < 20:
+            return self.hedge_delay
+        return max(self.hedge_min_delay, health.latency(0.95))
+    
+    def _timed_call(self, provider: AIProvider, prompt: str):
+        started = time.monotonic()
+        result = provider.generate_content(prompt)
+        return result, time.monotonic() - started
+    
+    def _generate_hedged(self, prompt: str, validate: Optional[Callable[[str], Any]]) -> str:
+        """
+        Start the primary provider; every time the hedge delay passes without a valid
+        answer (or a call fails) start the next one, keeping at most hedge_budget calls
+        in flight. The first valid response wins. Losing calls that are still queued are
+        cancelled; calls already on the wire cannot be interrupted, so their results
+        are discarded when they finish.
+        """
+        providers = self.candidate_providers()
+        in_flight = {}
+        next_index = 0
+        last_error = None
+        delay = self.current_hedge_delay(providers[0])
+        
+        def launch():
+            nonlocal next_index
+            provider = providers[next_index]
+            next_index += 1
+            print(f"🔄 Trying {provider.name}{' (hedge)' if in_flight else ''}...")
+            in_flight[self._executor.submit(self._timed_call, provider, prompt)] = provider
+        
+        launch()
+        try:
+            while in_flight:
+                can_hedge = next_index < len(providers) and len(in_flight) < self.hedge_budget
+                done, _ = wait(list(in_flight), timeout=delay if can_hedge else None, return_when=FIRST_COMPLETED)
+                
+                if not done:
+                    launch()
+                    continue
+                
+                for future in done:
+                    provider = in_flight.pop(future)
+                    try:
+                        result, elapsed = future.result()
+                        if validate:
+                            validate(result)
+                    except Exception as e:
+                        print(f"❌ {provider.name} failed: {e}")
+                        self.record_failure(provider, e)
+                        last_error = e
+                        continue
+                    self.record_success(provider, elapsed)
+                    print(f"✅ Story generated by: {provider.name} in {elapsed:.1f}s")
+                    return result
+                
+                # Nothing left in flight after failures: fall back right away
+                if not in_flight and next_index < len(providers):
+                    launch()
+        finally:
+            for future in in_flight:
+                future.cancel()
+        
+        raise Exception(
+            f"All AI providers failed. Last error: {str(last_error)}"
+        )
+    
+    def stream_content(self, prompt: str) -> Iterator[str]:
+        """
+        Stream content from the first provider that starts answering.
+        Falls back to the next provider only if nothing has been yielded yet;
+        a failure mid-stream is raised, since the partial output was already sent.
+        """
+        last_error = None
+        
+        for provider in self.candidate_providers():
+            started = False
+            began = time.monotonic()
+            try:
+                print(f"🔄 Streaming from {provider.name}...")
+                # Closing this generator closes the provider's stream (and its pooled connection) right away
+                with closing(provider.stream_content(prompt)) as stream:
+                    for chunk in stream:
+                        if not started:
+                            # Kept apart from completion latencies, which drive ordering and hedging
+                            self.record_success(provider, time.monotonic() - began, first_chunk=True)
+                        started = True
+                        yield chunk
+                print(f"✅ Story streamed by: {provider.name}")
+                return
+            except Exception as e:
+                if started:
+                    # Too late to fall back, but the breaker still has to see it
+                    self.record_failure(provider, e)
+                    raise
+                print(f"❌ {provider.name} failed: {e}")
+                self.record_failure(provider, e)
+                last_error = e
+                continue
+        
+        raise Exception(
+            f"All AI providers failed. Last error: {str(last_error)}"
+        )
+    
+    def get_health(self) -> Dict[str, Any]:
+        """Per-provider health in current preference order"""
+        self._reorder()
+        return {p.name: self.health[p.name].snapshot() for p in self.available_providers}
     
     def get_current_provider(self) -> str:
         """Get the name of the current primary provider"""
@@ -1,22 +1,43 @@
 from flask_admin import Admin
 from flask_admin.contrib.sqla import ModelView
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from flask_bcrypt import Bcrypt
 import os
 from dotenv import load_dotenv
 import json
-import re
 from pathlib import Path
-from deep_translator import GoogleTranslator
 import requests
 import io
 import base64
-from PIL import Image
-from datetime import datetime
-from models import db, User, Story
+from datetime import date, datetime
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+from models import db, User, Story, StoryTranslation, Job, UserStats
+from database import init_database
+from user_cache import user_cache
+import user_stats
+import search
+from quota import consume_story_quota, refund_story_quota, remaining_story_quota, DAILY_STORY_LIMIT
 from ai_providers import AIProviderManager
+import http_client
+from cover_store import CoverStore, HASH_PATTERN, cover_url, sniff_mimetype
+import image_pipeline
+from json_stream import IncrementalJSONParser
+from json_extract import extract_json_report
+from prompt_registry import PromptRegistry
+from http_cache import PrecomputedJSON
+from fast_json import FastJSONProvider
+from compression import init_compression
+import schemas
+from schemas import SchemaError
+from response_cache import ResponseCache
+from cover_cache import CoverCache
+from jobs import JobQueue
+from translation import TranslationService
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
 
 # Load environment variables from parent directory
 env_path = Path(__file__).parent.parent / '.env'
@@ -24,8 +45,12 @@ load_dotenv(dotenv_path=env_path)
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-change-this-in-production')
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///storyloom.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# bcrypt cost; existing hashes are upgraded (or downgraded) to it on their next login
+app.config['BCRYPT_LOG_ROUNDS'] = int(os.getenv('BCRYPT_ROUNDS', 12))
+# orjson-backed jsonify, and gzip/br/zstd for large responses
+app.json = FastJSONProvider(app)
+init_compression(app)
 
  # Initialize extensions
 CORS(app,
@@ -39,7 +64,7 @@ CORS(app,
     allow_headers=["Content-Type", "Authorization", "X-Requested-With"],
     methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"]
 )
-db.init_app(app)
+init_database(app)
 bcrypt = Bcrypt(app)
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
@@ -49,10 +74,12 @@ admin = Admin(app, name='StoryLoom Admin', template_mode='bootstrap4')
 with app.app_context():
     admin.add_view(ModelView(User, db.session))
     admin.add_view(ModelView(Story, db.session))
+    print(f"🗄️  Database: {db.engine.url.render_as_string(hide_password=True)}")
 
 @login_manager.user_loader
 def load_user(user_id):
-    return db.session.get(User, int(user_id))
+    # Short-TTL per-process cache; ORM writes to the user invalidate it
+    return user_cache.get(int(user_id))
 
 # Initialize AI Provider Manager (supports multiple providers with fallback)
 try:
@@ -61,6 +88,20 @@ except Exception as e:
     print(f"❌ Failed to initialize AI providers: {e}")
     raise
 
+# Content-addressed storage for cover images (keeps blobs out of the Story table)
+cover_store = CoverStore()
+# Image prompt -> stored cover, so repeated prompts skip the diffusion call
+cover_cache = CoverCache()
+
+# Cache for quiz/flashcard generations; keys include the prompt template version
+response_cache = ResponseCache()
+
+# Translation memory + batched translator (doesn't use Gemini tokens)
+translation_service = TranslationService()
+
+# Background jobs (story + quiz + flashcards + cover) run on local worker threads
+job_queue = JobQueue(app)
+
 # Story themes/genres
 THEMES = [
     'Mystery', 'Comedy', 'Adventure', 'Science Fiction', 
@@ -134,19 +175,45 @@ LANGUAGES = {
 }
 
 
-def clean_json_response(text):
-    """Extract and clean JSON from response text"""
-    # Try to find JSON in code blocks
-    json_match = re.search(r'```json\s*(\{.*?\})\s*```', text, re.DOTALL)
-    if json_match:
-        return json_match.group(1)
-    
-    # Try to find raw JSON
-    json_match = re.search(r'\{.*\}', text, re.DOTALL)
-    if json_match:
-        return json_match.group(0)
-    
-    return text
+# Metadata never changes while the process runs: serialize and compress it once
+METADATA_RESPONSES = {
+    'themes': PrecomputedJSON({'themes': THEMES}),
+    'ageGroups': PrecomputedJSON({'ageGroups': AGE_GROUPS}),
+    'languages': PrecomputedJSON({'languages': LANGUAGES}),
+}
+
+
+def parse_json_response(text):
+    """Parse (and if needed repair) the JSON object in a model response; raises json.JSONDecodeError"""
+    value, repaired = extract_json_report(text)
+    if repaired:
+        print(f"🩹 Repaired malformed JSON in model output ({len(text)} chars)")
+    return value
+
+
+def build_repair_prompt(kind, broken_text, problem):
+    """Short follow-up prompt asking a provider to fix a malformed document"""
+    return f"""The JSON below is not valid for this structure: {schemas.SHAPES[kind]}
+
+Problem: {problem}
+
+Return ONLY the corrected JSON object. Keep all existing text exactly as written; only fix the structure and fill in anything missing.
+
+{broken_text}"""
+
+
+def parse_generated(kind, text):
+    """
+    Parse and schema-check a generated document. If it is malformed, one short
+    JSON-mode repair call goes to the fastest healthy provider instead of the
+    whole generation being repeated. Raises ValueError if the repair fails too.
+    """
+    try:
+        return schemas.validate(kind, parse_json_response(text))
+    except ValueError as e:
+        print(f"🔧 Generated {kind} failed validation ({e}); requesting a repair")
+        repaired = ai_manager.generate_json(build_repair_prompt(kind, text, str(e)))
+        return schemas.validate(kind, parse_json_response(repaired))
 
 
 @app.route('/api/health', methods=['GET'])
@@ -156,64 +223,72 @@ def health_check():
         'status': 'healthy',
         'message': 'Backend is running',
         'ai_provider': ai_manager.get_current_provider(),
-        'available_providers': [p.name for p in ai_manager.available_providers]
+        'available_providers': [p.name for p in ai_manager.available_providers],
+        'provider_health': ai_manager.get_health(),
+        'http_pool': http_client.get_stats(),
+        'response_cache': response_cache.get_stats(),
+        'translation_memory': translation_service.get_stats(),
+        'cover_cache': cover_cache.get_stats(),
+        'prompt_templates': prompts.get_stats(),
+        'user_cache': user_cache.get_stats()
     })
 
 
 @app.route('/api/themes', methods=['GET'])
 def get_themes():
     """Get available story themes"""
-    return jsonify({'themes': THEMES})
+    return METADATA_RESPONSES['themes'].response(request)
 
 
 @app.route('/api/age-groups', methods=['GET'])
 def get_age_groups():
     """Get available age groups"""
-    return jsonify({'ageGroups': AGE_GROUPS})
+    return METADATA_RESPONSES['ageGroups'].response(request)
 
 
 @app.route('/api/languages', methods=['GET'])
 def get_languages():
     """Get available languages for translation"""
-    return jsonify({'languages': LANGUAGES})
-
-
-@app.route('/api/generate-story', methods=['POST'])
-@login_required
-def generate_story():
-    """Generate a story based on theme, age group, and prompt, with per-user daily rate limit"""
-    try:
-        data = request.json
-        print(f"📥 Received request data: {data}")
-
-        # Rate limit: 3 stories per user per day
-        user = current_user
-        now = datetime.utcnow()
-        today = now.date()
-        last_activity = user.last_activity.date() if user.last_activity else None
-        if last_activity == today:
-            if user.stories_generated >= 5:
-                return jsonify({'error': 'Daily story generation limit reached. Please try again tomorrow.'}), 429
-            user.stories_generated += 1
-        else:
-            user.stories_generated = 1
-            user.last_activity = now
-        db.session.commit()
-
-        theme = data.get('theme', 'Mystery')
-        custom_prompt = data.get('prompt', '')
-        age_group = data.get('ageGroup', 'children')  # early_readers, children, preteens, teens, adults
-
-        print(f"📚 Theme: {theme}, Age Group: {age_group}, Prompt: {custom_prompt[:50] if custom_prompt else 'None'}...")
+    return METADATA_RESPONSES['languages'].response(request)
+
+
+def build_story_prompt(theme, age_group, custom_prompt='', combined=False):
+    """
+    Construct the prompt for story generation. The quiz and flashcards are
+    separate prompts unless `combined` asks for all three in one document.
+    """
+    age_info = AGE_GROUPS.get(age_group, AGE_GROUPS['children'])
+    word_count = age_info['word_count']
+    reading_level = age_info['description']
+
+    if custom_prompt:
+        intro = f'Create an engaging {theme} story based on this prompt: "{custom_prompt}"'
+        extra_rules = "\n- Dont include long dashes"
+    else:
+        intro = f"Create an original, engaging {theme} story."
+        extra_rules = ""
+
+    extra_fields = ""
+    if combined:
+        extra_rules += f"""
+- Also write a comprehension quiz with 5 multiple-choice questions about the story (plot, characters, key story elements), and 5 vocabulary flashcards with important or interesting words from it, both suitable for {age_info['label']}"""
+        extra_fields = """,
+  "questions": [
+    {
+      "question": "Question text?",
+      "options": ["Option A", "Option B", "Option C", "Option D"],
+      "correct": 0
+    }
+  ],
+  "flashcards": [
+    {
+      "word": "example word",
+      "definition": "simple definition",
+      "example": "example sentence"
+    }
+  ]"""
 
-        age_info = AGE_GROUPS.get(age_group, AGE_GROUPS['children'])
-        word_count = age_info['word_count']
-        reading_level = age_info['description']
-        
-        
-        # Construct the prompt for story generation (quiz is separate)
-        if custom_prompt:
-            prompt = f"""Create an engaging {theme} story based on this prompt: "{custom_prompt}"
+    prompt = f"""{intro}
 
 The story should be:
 - Appropriate for {age_info['label']}
@@ -221,8 +296,7 @@ The story should be:
 - Length: {word_count} words
 - Use vocabulary and sentence structure suitable for this age group
 - Include age-appropriate themes and content
-- Be engaging and entertaining for the target audience
-- Dont include long dashes
+- Be engaging and entertaining for the target audience{extra_rules}
 
 Return ONLY a JSON object with this exact structure (no markdown, no code blocks):
 {{
@@ -230,62 +304,194 @@ Return ONLY a JSON object with this exact structure (no markdown, no code blocks
   "genre": "{theme}",
   "content": "The full story text with multiple paragraphs separated by \\n\\n",
   "readTime": "X min read",
-  "imageDescription": "A detailed description of the main scene or characters for a book cover illustration. Be VERY specific about: number of characters, their appearance, what they're doing, the setting, colors, and mood. Example: 'Two golden retriever dogs playing together in a sunny garden, one dog is brown with floppy ears, the other is lighter colored, both looking happy, green grass, blue sky, flowers in background'"
+  "imageDescription": "A detailed description of the main scene or characters for a book cover illustration. Be VERY specific about: number of characters, their appearance, what they're doing, the setting, colors, and mood. Example: 'Two golden retriever dogs playing together in a sunny garden, one dog is brown with floppy ears, the other is lighter colored, both looking happy, green grass, blue sky, flowers in background'"{extra_fields}
 }}"""
-        else:
-            prompt = f"""Create an original, engaging {theme} story.
+    if combined:
+        prompt += '\n\nThe "correct" field should be the index (0-3) of the correct answer in the options array.'
+    return prompt
+
+
+def generate_story_data(theme, age_group, custom_prompt=''):
+    """Generate and parse a story document"""
+    prompt = prompts.render('story', theme=theme, age_group=age_group, custom_prompt=custom_prompt, combined=False)
+    response_text = ai_manager.generate_content(prompt, validate=parse_json_response)
+    return parse_generated('story', response_text)
+
+
+def generate_story_bundle(theme, age_group, custom_prompt=''):
+    """
+    Story, quiz and flashcards from a single prompt, so the story is never sent
+    back to the model as input. A part missing or malformed in the combined
+    answer falls back to its own call; valid parts seed the response cache used
+    by /api/generate-quiz and /api/generate-flashcards.
+    """
+    prompt = prompts.render('story', theme=theme, age_group=age_group, custom_prompt=custom_prompt, combined=True)
+    response_text = ai_manager.generate_content(prompt, validate=parse_json_response)
+    bundle = parse_generated('story', response_text)
+    title, content = bundle['title'], bundle['content']
+
+    parts = (
+        ('quiz', 'questions', quiz_cache_key(title, content, age_group),
+         lambda: generate_quiz_data(title, content, age_group)),
+        ('flashcards', 'flashcards', flashcards_cache_key(content, age_group),
+         lambda: generate_flashcards_data(content, age_group)),
+    )
+    for kind, field, cache_key, fallback in parts:
+        try:
+            part = schemas.validate(kind, {field: bundle.get(field)})
+            response_cache.set(cache_key, part)
+        except SchemaError as e:
+            print(f"⚠️ Combined answer has no usable {kind} ({e}); generating it separately")
+            part = fallback()
+        bundle[field] = part[field]
+    return bundle
 
-The story should be:
-- Appropriate for {age_info['label']}
-- Reading level: {reading_level}
-- Length: {word_count} words
-- Use vocabulary and sentence structure suitable for this age group
-- Include age-appropriate themes and content
-- Be engaging and entertaining for the target audience
 
-Return ONLY a JSON object with this exact structure (no markdown, no code blocks):
-{{
-  "title": "Story Title",
-  "genre": "{theme}",
-  "content": "The full story text with multiple paragraphs separated by \\n\\n",
-  "readTime": "X min read",
-  "imageDescription": "A detailed description of the main scene or characters for a book cover illustration. Be VERY specific about: number of characters, their appearance, what they're doing, the setting, colors, and mood. Example: 'Two golden retriever dogs playing together in a sunny garden, one dog is brown with floppy ears, the other is lighter colored, both looking happy, green grass, blue sky, flowers in background'"
-}}"""
+@app.route('/api/generate-story', methods=['POST'])
+@login_required
+def generate_story():
+    """Generate a story based on theme, age group, and prompt, with per-user daily rate limit"""
+    quota_day = None
+    try:
+        data = request.json
+        print(f"📥 Received request data: {data}")
 
-        # Generate story
-        response_text = ai_manager.generate_content(prompt)
-        
-        
-        # Clean and parse JSON
-        cleaned_text = clean_json_response(response_text)
-        
-        story_data = json.loads(cleaned_text)
-        
-        return jsonify(story_data)
+        # Rate limit: DAILY_STORY_LIMIT stories per user per day, refunded if generation fails
+        quota_day = consume_story_quota(current_user.id)
+        if not quota_day:
+            return jsonify({'error': 'Daily story generation limit reached. Please try again tomorrow.'}), 429
+
+        theme = data.get('theme', 'Mystery')
+        custom_prompt = data.get('prompt', '')
+        age_group = data.get('ageGroup', 'children')  # early_readers, children, preteens, teens, adults
+
+        print(f"📚 Theme: {theme}, Age Group: {age_group}, Prompt: {custom_prompt[:50] if custom_prompt else 'None'}...")
+
+        # Opt-in: quiz and flashcards come back in the same response, from the same call
+        if data.get('combined'):
+            return jsonify(generate_story_bundle(theme, age_group, custom_prompt))
+        return jsonify(generate_story_data(theme, age_group, custom_prompt))
     
-    except json.JSONDecodeError as e:
-        print(f"❌ JSON decode error: {e}")
-        print(f"Response text was: {response_text if 'response_text' in locals() else 'N/A'}")
-        return jsonify({'error': 'Failed to parse story data', 'details': str(e)}), 500
+    except (json.JSONDecodeError, SchemaError) as e:
+        print(f"❌ Unusable story data: {e}")
+        refund_story_quota(current_user.id, quota_day)
+        return jsonify({'error': 'Failed to parse story data', 'details': str(e)}), 502
     except Exception as e:
         print(f"❌ Error generating story: {e}")
         import traceback
         traceback.print_exc()
+        refund_story_quota(current_user.id, quota_day)
         return jsonify({'error': 'Failed to generate story', 'details': str(e)}), 500
 
 
-@app.route('/api/generate-quiz', methods=['POST'])
-def generate_quiz():
-    """Generate a quiz based on the story"""
+def sse_event(event, payload):
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+@app.route('/api/generate-story/stream', methods=['POST'])
+@login_required
+def generate_story_stream():
+    """
+    Stream a story as Server-Sent Events while the provider is still writing it.
+    Events: title, field (genre/readTime), paragraph, imageDescription, done, error.
+    """
+    data = request.json or {}
+
+    # Rate limit: DAILY_STORY_LIMIT stories per user per day, refunded if generation fails
+    user_id = current_user.id
+    quota_day = consume_story_quota(user_id)
+    if not quota_day:
+        return jsonify({'error': 'Daily story generation limit reached. Please try again tomorrow.'}), 429
+
+    theme = data.get('theme', 'Mystery')
+    custom_prompt = data.get('prompt', '')
+    age_group = data.get('ageGroup', 'children')
+    prompt = prompts.render('story', theme=theme, age_group=age_group, custom_prompt=custom_prompt, combined=False)
+
+    print(f"📡 Streaming story - Theme: {theme}, Age Group: {age_group}")
+
+    def generate():
+        try:
+            parser = IncrementalJSONParser(paragraph_fields=('content',))
+            chunks = []
+            story = None
+            # Closed as soon as a valid story is parsed, so the provider's HTTP response goes back to the pool
+            with closing(ai_manager.stream_content(prompt)) as stream:
+                for chunk in stream:
+                    chunks.append(chunk)
+                    if parser.done:
+                        # The streamed object was unusable; keep reading for the full-text fallback
+                        continue
+                    for event in parser.feed(chunk):
+                        yield format_story_event(event)
+                    if parser.done:
+                        try:
+                            story = schemas.validate('story', parser.result)
+                            break
+                        except SchemaError:
+                            pass
+            if not parser.done:
+                for event in parser.close():
+                    yield format_story_event(event)
+                try:
+                    story = schemas.validate('story', parser.result)
+                except SchemaError:
+                    pass
+
+            if story is None:
+                # The `done` payload is authoritative, so a repaired story replaces what streamed
+                story = parse_generated('story', ''.join(chunks))
+            yield sse_event('done', story)
+        except (json.JSONDecodeError, SchemaError) as e:
+            print(f"❌ Unusable streamed story: {e}")
+            refund_story_quota(user_id, quota_day)
+            yield sse_event('error', {'error': 'Failed to parse story data', 'details': str(e)})
+        except Exception as e:
+            print(f"❌ Error streaming story: {e}")
+            refund_story_quota(user_id, quota_day)
+            yield sse_event('error', {'error': 'Failed to generate story', 'details': str(e)})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+def format_story_event(event):
+    """Map parser events onto the SSE events the story stream exposes"""
+    if event[0] == 'paragraph':
+        _, _, index, text = event
+        return sse_event('paragraph', {'index': index, 'text': text})
+
+    _, key, value = event
+    if key == 'title':
+        return sse_event('title', {'title': value})
+    if key == 'imageDescription':
+        return sse_event('imageDescription', {'imageDescription': value})
+    if key == 'content':
+        # Already delivered paragraph by paragraph
+        return ''
+    return sse_event('field', {'name': key, 'value': value})
+
+
+def find_saved_story(story_id):
+    """The current user's saved story with this id, if any"""
+    if not story_id or not current_user.is_authenticated:
+        return None
     try:
-        data = request.json
-        story_title = data.get('title', '')
-        story_content = data.get('content', '')
-        age_group = data.get('ageGroup', 'children')
-        
-        age_info = AGE_GROUPS.get(age_group, AGE_GROUPS['children'])
-        
-        prompt = f"""Based on this story titled "{story_title}", create a comprehension quiz with 5 multiple-choice questions.
+        story_id = int(story_id)
+    except (TypeError, ValueError):
+        return None
+    return Story.query.filter_by(id=story_id, user_id=current_user.id).first()
+
+
+def build_quiz_prompt(story_title, story_content, age_group):
+    """Construct the comprehension quiz prompt"""
+    age_info = AGE_GROUPS.get(age_group, AGE_GROUPS['children'])
+
+    return f"""Based on this story titled "{story_title}", create a comprehension quiz with 5 multiple-choice questions.
 
 Story:
 {story_content}
@@ -315,35 +521,12 @@ Return ONLY a JSON object with this exact structure (no markdown, no code blocks
 
 The "correct" field should be the index (0-3) of the correct answer in the options array."""
 
-        # Generate quiz
-        quiz_text = ai_manager.generate_content(prompt)
-        
-        # Clean and parse JSON
-        cleaned_text = clean_json_response(quiz_text)
-        quiz_data = json.loads(cleaned_text)
-        
-        return jsonify(quiz_data)
-    
-    except json.JSONDecodeError as e:
-        print(f"JSON decode error: {e}")
-        print(f"Response text: {quiz_text}")
-        return jsonify({'error': 'Failed to parse quiz data', 'details': str(e)}), 500
-    except Exception as e:
-        print(f"Error generating quiz: {e}")
-        return jsonify({'error': 'Failed to generate quiz', 'details': str(e)}), 500
 
+def build_flashcards_prompt(story_content, age_group):
+    """Construct the vocabulary flashcards prompt"""
+    age_info = AGE_GROUPS.get(age_group, AGE_GROUPS['children'])
 
-@app.route('/api/generate-flashcards', methods=['POST'])
-def generate_flashcards():
-    """Generate flashcards from the story for vocabulary learning"""
-    try:
-        data = request.json
-        story_content = data.get('content', '')
-        age_group = data.get('ageGroup', 'children')
-        
-        age_info = AGE_GROUPS.get(age_group, AGE_GROUPS['children'])
-        
-        prompt = f"""Based on this story, create 5 vocabulary flashcards with important or interesting words.
+    return f"""Based on this story, create 5 vocabulary flashcards with important or interesting words.
 
 Story:
 {story_content}
@@ -366,20 +549,104 @@ Return ONLY a JSON object with this exact structure (no markdown, no code blocks
   ]
 }}"""
 
-        # Generate flashcards
-        print("🃏 Generating flashcards...")
-        flashcard_text = ai_manager.generate_content(prompt)
+
+# Builders compiled once per (theme, age group, ...); only the per-request text is filled in.
+# Each template's version hash changes whenever its text does, which retires old cache entries.
+prompts = PromptRegistry()
+prompts.register('story', build_story_prompt, dynamic=('custom_prompt',), variants=[
+    {'theme': 'Mystery', 'age_group': age_group, 'combined': combined}
+    for age_group in AGE_GROUPS for combined in (False, True)
+])
+prompts.register('quiz', build_quiz_prompt, dynamic=('story_title', 'story_content'),
+                 variants=[{'age_group': age_group} for age_group in AGE_GROUPS])
+prompts.register('flashcards', build_flashcards_prompt, dynamic=('story_content',),
+                 variants=[{'age_group': age_group} for age_group in AGE_GROUPS])
+
+
+def quiz_cache_key(story_title, story_content, age_group):
+    return ResponseCache.make_key('quiz', f"{story_title}\n{story_content}", age_group, prompts.version('quiz'))
+
+
+def flashcards_cache_key(story_content, age_group):
+    return ResponseCache.make_key('flashcards', story_content, age_group, prompts.version('flashcards'))
+
+
+def generate_quiz_data(story_title, story_content, age_group):
+    """Quiz for a story, from the response cache or the AI providers"""
+    cache_key = quiz_cache_key(story_title, story_content, age_group)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    quiz_text = ai_manager.generate_content(
+        prompts.render('quiz', story_title=story_title, story_content=story_content, age_group=age_group),
+        validate=parse_json_response
+    )
+    quiz_data = parse_generated('quiz', quiz_text)
+    response_cache.set(cache_key, quiz_data)
+    return quiz_data
+
+
+def generate_flashcards_data(story_content, age_group):
+    """Flashcards for a story, from the response cache or the AI providers"""
+    cache_key = flashcards_cache_key(story_content, age_group)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    print("🃏 Generating flashcards...")
+    flashcard_text = ai_manager.generate_content(
+        prompts.render('flashcards', story_content=story_content, age_group=age_group),
+        validate=parse_json_response
+    )
+    flashcard_data = parse_generated('flashcards', flashcard_text)
+    response_cache.set(cache_key, flashcard_data)
+    print(f"✅ Generated {len(flashcard_data.get('flashcards', []))} flashcards")
+    return flashcard_data
+
+
+@app.route('/api/generate-quiz', methods=['POST'])
+def generate_quiz():
+    """Generate a quiz based on the story"""
+    try:
+        data = request.json
+        story_title = data.get('title', '')
+        story_content = data.get('content', '')
+        age_group = data.get('ageGroup', 'children')
+        
+        # A saved story that already has a quiz needs no AI call
+        saved = find_saved_story(data.get('storyId'))
+        if saved and saved.questions:
+            return jsonify({'questions': saved.questions})
+        
+        return jsonify(generate_quiz_data(story_title, story_content, age_group))
+    
+    except (json.JSONDecodeError, SchemaError) as e:
+        print(f"Unusable quiz data: {e}")
+        return jsonify({'error': 'Failed to parse quiz data', 'details': str(e)}), 502
+    except Exception as e:
+        print(f"Error generating quiz: {e}")
+        return jsonify({'error': 'Failed to generate quiz', 'details': str(e)}), 500
+
+
+@app.route('/api/generate-flashcards', methods=['POST'])
+def generate_flashcards():
+    """Generate flashcards from the story for vocabulary learning"""
+    try:
+        data = request.json
+        story_content = data.get('content', '')
+        age_group = data.get('ageGroup', 'children')
         
-        # Clean and parse JSON
-        cleaned_text = clean_json_response(flashcard_text)
-        flashcard_data = json.loads(cleaned_text)
+        # A saved story that already has flashcards needs no AI call
+        saved = find_saved_story(data.get('storyId'))
+        if saved and saved.flashcards:
+            return jsonify({'flashcards': saved.flashcards})
         
-        print(f"✅ Generated {len(flashcard_data.get('flashcards', []))} flashcards")
-        return jsonify(flashcard_data)
+        return jsonify(generate_flashcards_data(story_content, age_group))
     
-    except json.JSONDecodeError as e:
-        print(f"JSON decode error: {e}")
-        return jsonify({'error': 'Failed to parse flashcard data', 'details': str(e)}), 500
+    except (json.JSONDecodeError, SchemaError) as e:
+        print(f"Unusable flashcard data: {e}")
+        return jsonify({'error': 'Failed to parse flashcard data', 'details': str(e)}), 502
     except Exception as e:
         print(f"Error generating flashcards: {e}")
         return jsonify({'error': 'Failed to generate flashcards', 'details': str(e)}), 500
@@ -401,17 +668,10 @@ def translate_content():
         
         print(f"🌍 Translating to {LANGUAGES[target_language]}...")
         
-        # Use deep-translator for efficient translation (doesn't use Gemini tokens)
-        translator = GoogleTranslator(source='en', target=target_language)
-        
-        # Split text into paragraphs for better translation
-        paragraphs = text.split('\n\n')
-        translated_paragraphs = []
-        
-        for para in paragraphs:
-            if para.strip():
-                translated = translator.translate(para)
-                translated_paragraphs.append(translated)
+        # Split text into paragraphs for better translation; known paragraphs come
+        # from the translation memory, the rest go out in batched requests
+        paragraphs = [para for para in text.split('\n\n') if para.strip()]
+        translated_paragraphs = translation_service.translate_texts(paragraphs, target_language)
         
         translated_text = '\n\n'.join(translated_paragraphs)
         
@@ -427,6 +687,167 @@ def translate_content():
         return jsonify({'error': 'Failed to translate', 'details': str(e)}), 500
 
 
+def build_cover_prompt(title, genre, story_summary=''):
+    """Create a detailed, accurate prompt for image generation"""
+    if story_summary:
+        # Use the detailed description if provided
+        return f"{story_summary}. Professional children's book cover illustration, storybook art style, vibrant colors, detailed, high quality"
+    # Fallback to basic prompt
+    return f"Book cover illustration: '{title}', {genre} genre story. Beautiful detailed professional children's book cover art, storybook illustration style, vibrant colors, perfect composition"
+
+
+def render_cover_image(title, genre, story_summary=''):
+    """
+    Run the Hugging Face image models in order until one returns an image.
+    Returns {'imageBytes', 'prompt', 'model'} on success or {'imageBytes': None, 'error'}.
+    """
+    image_prompt = build_cover_prompt(title, genre, story_summary)
+    
+    print(f"🖼️ Image prompt: {image_prompt[:250]}...")
+    
+    # Use Hugging Face's best image generation models for accuracy
+    # These models are better at following prompts accurately
+    models = [
+        "black-forest-labs/FLUX.1-schnell",         # Fast, accurate, excellent at prompt following
+        "stabilityai/stable-diffusion-xl-base-1.0", # High quality SDXL
+        "runwayml/stable-diffusion-v1-5",           # Reliable fallback
+    ]
+    
+    # Get Hugging Face API key from environment
+    hf_api_key = os.getenv('HUGGINGFACE_API_KEY')
+    
+    if not hf_api_key or hf_api_key == 'your_huggingface_token_here':
+        print("⚠️ No valid Hugging Face API key found")
+        return {
+            'imageBytes': None,
+            'error': 'Hugging Face API key not configured. Get one at https://huggingface.co/settings/tokens'
+        }
+    
+    headers = {
+        "Authorization": f"Bearer {hf_api_key}"
+    }
+    
+    # Try each model until one succeeds
+    last_error = None
+    for model in models:
+        try:
+            # Use new Hugging Face Inference Providers API endpoint
+            API_URL = f"https://router.huggingface.co/hf-inference/models/{model}"
+            print(f"🎨 Trying model: {model}")
+            
+            response = http_client.post(
+                API_URL,
+                headers=headers,
+                json={"inputs": image_prompt, "wait_for_model": True},  # Wait for model to load
+                read_timeout=60  # Longer timeout for model loading
+            )
+            
+            print(f"📡 Image API response status: {response.status_code}")
+            
+            if response.status_code == 200:
+                print(f"✅ Cover image generated successfully with {model} (size: {len(response.content)} bytes)")
+                return {
+                    'imageBytes': response.content,
+                    'prompt': image_prompt,
+                    'model': model
+                }
+            elif response.status_code == 503:
+                # Model is loading
+                print(f"⏳ Model {model} is loading, trying next...")
+                last_error = f"Model loading (503)"
+                continue
+            else:
+                print(f"⚠️ Model {model} returned status {response.status_code}")
+                print(f"Response: {response.text[:300]}")
+                last_error = f"Status {response.status_code}: {response.text[:100]}"
+                continue
+                
+        except requests.exceptions.Timeout:
+            print(f"⏱️ Timeout for model {model}, trying next...")
+            last_error = "Request timeout"
+            continue
+        except Exception as e:
+            print(f"❌ Error with model {model}: {e}")
+            last_error = str(e)
+            continue
+    
+    # All models failed
+    print(f"⚠️ All image generation models failed. Last error: {last_error}")
+    return {
+        'imageBytes': None,
+        'error': f'Image generation temporarily unavailable: {last_error}'
+    }
+
+
+def store_cover_image(image_bytes):
+    """
+    Re-encode a generated cover (size-capped master + thumbnails) and store it.
+    Returns (cover hash, pipeline output) or (None, None) if the bytes are not an image.
+    """
+    try:
+        processed = image_pipeline.process_cover_in_pool(image_bytes)
+    except image_pipeline.UnidentifiedImageError as e:
+        print(f"⚠️ Generated cover is not a readable image: {e}")
+        return None, None
+    except image_pipeline.ImageTooLargeError as e:
+        print(f"⚠️ Generated cover is too large to decode: {e}")
+        return None, None
+    except Exception as e:
+        # Pool or encoder trouble shouldn't lose the cover: keep the original bytes
+        print(f"⚠️ Cover post-processing failed, storing original: {e}")
+        if not sniff_mimetype(image_bytes).startswith('image/'):
+            return None, None
+        return cover_store.put(image_bytes), None
+
+    cover_hash = cover_store.put(processed['master'])
+    for size, thumbnail in processed['thumbnails'].items():
+        cover_store.put_variant(cover_hash, size, thumbnail)
+    print(f"🗜️ Cover {processed['sourceFormat']} {len(image_bytes)} bytes -> "
+          f"{image_pipeline.OUTPUT_FORMAT} {len(processed['master'])} bytes + {len(processed['thumbnails'])} thumbnails")
+    return cover_hash, processed
+
+
+def generate_cover(title, genre, story_summary='', regenerate=False):
+    """
+    Cover for a story: reused from the cover cache when the same (or, if enabled,
+    a near-identical) prompt was rendered before, otherwise rendered, re-encoded
+    and cached. Returns {'coverHash', 'prompt', 'model', 'cached', 'processed'}
+    or {'coverHash': None, 'error'}.
+    """
+    image_prompt = build_cover_prompt(title, genre, story_summary)
+    if not regenerate:
+        hit = cover_cache.lookup(image_prompt)
+        if hit and cover_store.exists(hit['coverHash']):
+            print(f"⚡ Cover cache hit ({hit['match']}, similarity {hit['similarity']})")
+            return {
+                'coverHash': hit['coverHash'],
+                'prompt': image_prompt,
+                'model': hit['model'],
+                'cached': hit['match'],
+                'processed': None
+            }
+        if hit:
+            # The matched entry, which for a similar hit is not this prompt's
+            cover_cache.forget(hit['promptHash'])
+
+    cover = render_cover_image(title, genre, story_summary)
+    if not cover['imageBytes']:
+        return {'coverHash': None, 'error': cover['error']}
+
+    cover_hash, processed = store_cover_image(cover['imageBytes'])
+    if not cover_hash:
+        return {'coverHash': None, 'error': 'Image service returned an unreadable image'}
+
+    cover_cache.store(image_prompt, cover_hash, cover['model'])
+    return {
+        'coverHash': cover_hash,
+        'prompt': cover['prompt'],
+        'model': cover['model'],
+        'cached': None,
+        'processed': processed
+    }
+
+
 @app.route('/api/generate-cover-image', methods=['POST'])
 def generate_cover_image():
     """Generate a story cover image using Stable Diffusion API"""
@@ -441,93 +862,36 @@ def generate_cover_image():
         
         print(f"🎨 Generating cover image for: {title}")
         
-        # Create a detailed, accurate prompt for image generation
-        if story_summary:
-            # Use the detailed description if provided
-            image_prompt = f"{story_summary}. Professional children's book cover illustration, storybook art style, vibrant colors, detailed, high quality"
-        else:
-            # Fallback to basic prompt
-            image_prompt = f"Book cover illustration: '{title}', {genre} genre story. Beautiful detailed professional children's book cover art, storybook illustration style, vibrant colors, perfect composition"
-        
-        print(f"🖼️ Image prompt: {image_prompt[:250]}...")
-        
-        # Use Hugging Face's best image generation models for accuracy
-        # These models are better at following prompts accurately
-        models = [
-            "black-forest-labs/FLUX.1-schnell",         # Fast, accurate, excellent at prompt following
-            "stabilityai/stable-diffusion-xl-base-1.0", # High quality SDXL
-            "runwayml/stable-diffusion-v1-5",           # Reliable fallback
-        ]
-        
-        # Get Hugging Face API key from environment
-        hf_api_key = os.getenv('HUGGINGFACE_API_KEY')
-        
-        if not hf_api_key or hf_api_key == 'your_huggingface_token_here':
-            print("⚠️ No valid Hugging Face API key found")
+        # `regenerate` skips the cover cache and renders a fresh image
+        cover = generate_cover(title, genre, story_summary, regenerate=bool(data.get('regenerate')))
+        cover_hash = cover['coverHash']
+        if not cover_hash:
             return jsonify({
                 'imageData': None,
-                'error': 'Hugging Face API key not configured. Get one at https://huggingface.co/settings/tokens',
+                'error': cover['error'],
                 'fallback': True
             })
-        
-        headers = {
-            "Authorization": f"Bearer {hf_api_key}"
-        }
-        
-        # Try each model until one succeeds
-        last_error = None
-        for model in models:
-            try:
-                # Use new Hugging Face Inference Providers API endpoint
-                API_URL = f"https://router.huggingface.co/hf-inference/models/{model}"
-                print(f"🎨 Trying model: {model}")
-                
-                response = requests.post(
-                    API_URL,
-                    headers=headers,
-                    json={"inputs": image_prompt, "wait_for_model": True},  # Wait for model to load
-                    timeout=60  # Longer timeout for model loading
-                )
-                
-                print(f"📡 Image API response status: {response.status_code}")
-                
-                if response.status_code == 200:
-                    # Convert image to base64 for easy transfer
-                    image_bytes = response.content
-                    image_base64 = base64.b64encode(image_bytes).decode('utf-8')
-                    
-                    print(f"✅ Cover image generated successfully with {model} (size: {len(image_base64)} chars)")
-                    return jsonify({
-                        'imageData': f"data:image/jpeg;base64,{image_base64}",
-                        'prompt': image_prompt,
-                        'model': model
-                    })
-                elif response.status_code == 503:
-                    # Model is loading
-                    print(f"⏳ Model {model} is loading, trying next...")
-                    last_error = f"Model loading (503)"
-                    continue
-                else:
-                    print(f"⚠️ Model {model} returned status {response.status_code}")
-                    print(f"Response: {response.text[:300]}")
-                    last_error = f"Status {response.status_code}: {response.text[:100]}"
-                    continue
-                    
-            except requests.exceptions.Timeout:
-                print(f"⏱️ Timeout for model {model}, trying next...")
-                last_error = "Request timeout"
-                continue
-            except Exception as e:
-                print(f"❌ Error with model {model}: {e}")
-                last_error = str(e)
-                continue
-        
-        # All models failed
-        print(f"⚠️ All image generation models failed. Last error: {last_error}")
+
+        # URLs instead of megabytes of base64; `inline` asks for the compact master as a data-URI
+        if data.get('inline'):
+            image_data, mimetype = cover_store.get(cover_hash)
+            image_data = f"data:{mimetype};base64,{base64.b64encode(image_data).decode('utf-8')}"
+        else:
+            image_data = cover_url(cover_hash)
+        processed = cover['processed'] or {}
         return jsonify({
-            'imageData': None,
-            'error': f'Image generation temporarily unavailable: {last_error}',
-            'fallback': True
+            'imageData': image_data,
+            'coverHash': cover_hash,
+            'thumbnails': {
+                str(size): cover_url(cover_hash, size)
+                for size in cover_store.variant_sizes(cover_hash, image_pipeline.THUMBNAIL_SIZES)
+            },
+            'width': processed.get('width'),
+            'height': processed.get('height'),
+            'sourceFormat': processed.get('sourceFormat'),
+            'cached': cover['cached'],
+            'prompt': cover['prompt'],
+            'model': cover['model']
         })
     
     except Exception as e:
@@ -539,6 +903,127 @@ def generate_cover_image():
         }), 200  # Return 200 so frontend can handle gracefully
 
 
+@app.route('/api/covers/<cover_hash>', methods=['GET'])
+def get_cover(cover_hash):
+    """Serve a stored cover image by its SHA-256 hash (?size=128|256|512 for a thumbnail)"""
+    if not HASH_PATTERN.match(cover_hash):
+        return jsonify({'error': 'Invalid cover id'}), 400
+
+    # Parsed by hand: type=int would turn ?size=abc into None and serve the full-size master
+    size = request.args.get('size')
+    if size is not None:
+        size = int(size) if size.isdigit() else None
+        if size not in image_pipeline.THUMBNAIL_SIZES:
+            return jsonify({'error': f'size must be one of {list(image_pipeline.THUMBNAIL_SIZES)}'}), 400
+
+    if not cover_store.exists(cover_hash):
+        return jsonify({'error': 'Cover not found'}), 404
+
+    # The hash is the content, so the blob can never change under this URL
+    etag = f'{cover_hash}-{size}' if size else cover_hash
+    if etag in request.if_none_match:
+        response = app.response_class(status=304)
+    else:
+        data, mimetype = cover_store.get(cover_hash, size)
+        response = app.response_class(data, mimetype=mimetype)
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = 31536000
+    response.cache_control.immutable = True
+    return response
+
+
+# ============================================
+# BACKGROUND JOB ENDPOINTS
+# ============================================
+
+def run_story_job(job):
+    """Generate the story, then its quiz, flashcards and cover in parallel"""
+    params = job.params
+    age_group = params.get('ageGroup', 'children')
+
+    # Combined mode seeds the response cache, so the quiz and flashcard calls below return at once
+    generate = generate_story_bundle if params.get('combined') else generate_story_data
+    try:
+        story = generate(params.get('theme', 'Mystery'), age_group, params.get('prompt', ''))
+    except Exception:
+        # No story, no charge; failed extras below still count
+        if params.get('quotaDay'):
+            refund_story_quota(job.user_id, date.fromisoformat(params['quotaDay']))
+        raise
+    job.update(progress=40, story=story)
+
+    title = story.get('title', '')
+    content = story.get('content', '')
+    with ThreadPoolExecutor(max_workers=3, thread_name_prefix='story-job') as pool:
+        futures = {
+            pool.submit(generate_quiz_data, title, content, age_group): 'questions',
+            pool.submit(generate_flashcards_data, content, age_group): 'flashcards',
+            pool.submit(generate_cover, title, story.get('genre', ''), story.get('imageDescription', '')): 'cover',
+        }
+        errors = {}
+        for future in as_completed(futures):
+            part = futures[future]
+            partial = {}
+            try:
+                value = future.result()
+                if part == 'questions':
+                    partial['questions'] = value.get('questions', [])
+                elif part == 'flashcards':
+                    partial['flashcards'] = value.get('flashcards', [])
+                elif value.get('coverHash'):
+                    partial['coverHash'] = value['coverHash']
+                else:
+                    errors[part] = value.get('error')
+            except Exception as e:
+                # The story is the main deliverable; extras are reported, not fatal
+                print(f"⚠️ Story job {job.job_id}: {part} failed: {e}")
+                errors[part] = str(e)
+            job.update(progress=job.progress + 20, errors=errors, **partial)
+
+
+job_queue.register('story', run_story_job)
+
+
+@app.route('/api/jobs/story', methods=['POST'])
+@login_required
+def create_story_job():
+    """Queue a story generation job; poll GET /api/jobs/<id> for progress"""
+    quota_day = None
+    try:
+        data = request.json or {}
+
+        # Rate limit: DAILY_STORY_LIMIT stories per user per day, refunded if the story fails
+        quota_day = consume_story_quota(current_user.id)
+        if not quota_day:
+            return jsonify({'error': 'Daily story generation limit reached. Please try again tomorrow.'}), 429
+
+        job = job_queue.enqueue('story', current_user.id, {
+            'theme': data.get('theme', 'Mystery'),
+            'prompt': data.get('prompt', ''),
+            'ageGroup': data.get('ageGroup', 'children'),
+            'combined': bool(data.get('combined')),
+            'quotaDay': quota_day.isoformat()
+        })
+        return jsonify({'jobId': job.id, 'job': job.to_dict()}), 202
+
+    except Exception as e:
+        db.session.rollback()
+        refund_story_quota(current_user.id, quota_day)
+        print(f"Error queueing story job: {e}")
+        return jsonify({'error': 'Failed to queue story generation'}), 500
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+@login_required
+def get_job(job_id):
+    """Job status, progress and whatever results are ready so far"""
+    job = Job.query.filter_by(id=job_id, user_id=current_user.id).first()
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify({'job': job.to_dict()}), 200
+
+
 # ============================================
 # AUTHENTICATION ENDPOINTS
 # ============================================
@@ -565,6 +1050,7 @@ def register():
         # Create new user
         password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
         new_user = User(username=username, email=email, password_hash=password_hash)
+        new_user.stats = UserStats()
         
         db.session.add(new_user)
         db.session.commit()
@@ -587,6 +1073,14 @@ def register():
         return jsonify({'error': 'Registration failed'}), 500
 
 
+def password_hash_rounds(password_hash):
+    """Cost factor of a bcrypt hash ($2b$<rounds>$...); None if it is not one"""
+    try:
+        return int(password_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
 @app.route('/api/auth/login', methods=['POST'])
 def login():
     """Login user"""
@@ -603,6 +1097,11 @@ def login():
         if not user or not bcrypt.check_password_hash(user.password_hash, password):
             return jsonify({'error': 'Invalid username or password'}), 401
         
+        # The plain password is only available now, so this is where BCRYPT_ROUNDS changes take effect
+        if password_hash_rounds(user.password_hash) != app.config['BCRYPT_LOG_ROUNDS']:
+            user.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+            db.session.commit()
+        
         login_user(user)
         
         return jsonify({
@@ -615,6 +1114,7 @@ def login():
         }), 200
     
     except Exception as e:
+        db.session.rollback()
         print(f"Login error: {e}")
         return jsonify({'error': 'Login failed'}), 500
 
@@ -644,26 +1144,165 @@ def get_current_user():
 # STORY LIBRARY ENDPOINTS
 # ============================================
 
+LIBRARY_PAGE_SIZE = 20
+LIBRARY_MAX_PAGE_SIZE = 100
+
+
+def encode_library_cursor(created_at, story_id):
+    """Encode a keyset position (created_at, id) as an opaque cursor"""
+    raw = f"{created_at.isoformat()}|{story_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_library_cursor(cursor):
+    """Decode a cursor produced by encode_library_cursor; raises ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        created_at, story_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(story_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
 @app.route('/api/library/stories', methods=['GET'])
 @login_required
 def get_user_stories():
-    """Get all stories for the current user"""
+    """
+    Get stories for the current user.
+
+    Without query parameters every story is returned in full (legacy shape).
+    With `limit`, `cursor` or `fields` the listing is paginated newest-first on
+    (createdAt, id) and only the requested columns are read. `fields` is a
+    comma-separated list of story fields or `summary` (the default).
+    """
     try:
-        stories = Story.query.filter_by(user_id=current_user.id).order_by(Story.created_at.desc()).all()
+        if not any(key in request.args for key in ('limit', 'cursor', 'fields')):
+            stories = Story.query.filter_by(user_id=current_user.id).order_by(Story.created_at.desc()).all()
+            return jsonify({
+                'stories': [story.to_dict() for story in stories]
+            }), 200
+
+        api_columns = Story.api_columns()
+        fields_param = request.args.get('fields', 'summary')
+        if fields_param == 'summary':
+            fields = list(Story.SUMMARY_FIELDS)
+        else:
+            fields = [f.strip() for f in fields_param.split(',') if f.strip()]
+            unknown = [f for f in fields if f not in api_columns]
+            if not fields or unknown:
+                return jsonify({'error': f'Unknown fields: {", ".join(unknown) or fields_param}'}), 400
+
+        try:
+            limit = int(request.args.get('limit', LIBRARY_PAGE_SIZE))
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+        limit = max(1, min(limit, LIBRARY_MAX_PAGE_SIZE))
+
+        # id and created_at are always selected because they make up the cursor
+        query = db.session.query(
+            Story.id, Story.created_at, *[api_columns[f] for f in fields]
+        ).filter(Story.user_id == current_user.id)
+
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                cursor_created_at, cursor_id = decode_library_cursor(cursor)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            query = query.filter(or_(
+                Story.created_at < cursor_created_at,
+                and_(Story.created_at == cursor_created_at, Story.id < cursor_id)
+            ))
+
+        # Fetch one extra row to know whether another page exists
+        rows = query.order_by(Story.created_at.desc(), Story.id.desc()).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        stories = [
+            {field: Story.format_field(field, value) for field, value in zip(fields, row[2:])}
+            for row in rows
+        ]
+        next_cursor = encode_library_cursor(rows[-1][1], rows[-1][0]) if has_more else None
+
         return jsonify({
-            'stories': [story.to_dict() for story in stories]
+            'stories': stories,
+            'nextCursor': next_cursor
         }), 200
     except Exception as e:
         print(f"Error fetching stories: {e}")
         return jsonify({'error': 'Failed to fetch stories'}), 500
 
 
+@app.route('/api/library/search', methods=['GET'])
+@login_required
+def search_library():
+    """
+    Full-text search over the current user's stories, best matches first.
+
+    `q` is free text: every word must match, the last one as a prefix. `limit`
+    and `offset` page through the results. Each result has the summary fields
+    plus `snippet` (HTML-escaped story text with <mark> around matches) and a
+    BM25 `score`.
+    """
+    query = (request.args.get('q') or '').strip()
+    if not query:
+        return jsonify({'error': 'q is required'}), 400
+    try:
+        limit = int(request.args.get('limit', LIBRARY_PAGE_SIZE))
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        return jsonify({'error': 'limit and offset must be integers'}), 400
+    limit = max(1, min(limit, LIBRARY_MAX_PAGE_SIZE))
+    offset = max(0, offset)
+
+    try:
+        results, has_more = search.search_stories(current_user.id, query, limit, offset)
+        return jsonify({
+            'results': results,
+            'nextOffset': offset + len(results) if has_more else None
+        }), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error searching stories: {e}")
+        return jsonify({'error': 'Failed to search stories'}), 500
+
+
+def find_saved_copy(user_id, content_hash, idempotency_key=None):
+    """The user's story saved under this idempotency key, else the one with this text"""
+    if idempotency_key:
+        story = Story.query.filter_by(user_id=user_id, idempotency_key=idempotency_key).first()
+        if story:
+            return story
+    return Story.query.filter_by(user_id=user_id, content_hash=content_hash).first()
+
+
+def already_saved_response(existing, content_hash):
+    """The saved copy with 200, or 409 when its Idempotency-Key was sent with a different story"""
+    if existing.content_hash != content_hash:
+        return jsonify({'error': 'Idempotency-Key was already used for a different story'}), 409
+    return jsonify({'message': 'Story already saved', 'story': existing.to_dict()}), 200
+
+
 @app.route('/api/library/stories', methods=['POST'])
 @login_required
 def save_story():
-    """Save a story to user's library"""
+    """
+    Save a story to user's library. Saving the same story again (double-click,
+    retry, or a repeated Idempotency-Key header) returns the existing copy with
+    200 instead of storing another one; reusing a key for a different story is a 409.
+    """
     try:
         data = request.json
+        idempotency_key = request.headers.get('Idempotency-Key')
+        if idempotency_key is not None and not 0 < len(idempotency_key) <= 64:
+            return jsonify({'error': 'Idempotency-Key must be 1-64 characters'}), 400
+        content_hash = Story.compute_content_hash(data.get('title'), data.get('content'), data.get('ageGroup'))
+        
+        # Checked before the cover is decoded and stored
+        existing = find_saved_copy(current_user.id, content_hash, idempotency_key)
+        if existing:
+            return already_saved_response(existing, content_hash)
         
         # Create new story
         new_story = Story(
@@ -672,14 +1311,25 @@ def save_story():
             content=data.get('content'),
             age_group=data.get('ageGroup'),
             read_time=data.get('readTime'),
-            cover_image=data.get('coverImage'),
-            questions=json.dumps(data.get('questions', [])),
-            flashcards=json.dumps(data.get('flashcards', [])),
+            cover_hash=cover_store.ingest(data.get('coverImage')),
+            questions=data.get('questions', []),
+            flashcards=data.get('flashcards', []),
+            content_hash=content_hash,
+            idempotency_key=idempotency_key,
             user_id=current_user.id
         )
         
-        db.session.add(new_story)
-        db.session.commit()
+        try:
+            db.session.add(new_story)
+            user_stats.story_added(current_user.id, new_story.genre, new_story.age_group)
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent request saved it first; the rollback also undoes the stats update
+            db.session.rollback()
+            existing = find_saved_copy(current_user.id, content_hash, idempotency_key)
+            if existing is None:
+                raise
+            return already_saved_response(existing, content_hash)
         
         return jsonify({
             'message': 'Story saved successfully',
@@ -720,6 +1370,7 @@ def delete_story(story_id):
             return jsonify({'error': 'Story not found'}), 404
         
         db.session.delete(story)
+        user_stats.story_removed(current_user.id, story.genre, story.age_group)
         db.session.commit()
         
         return jsonify({'message': 'Story deleted successfully'}), 200
@@ -748,8 +1399,13 @@ def update_story(story_id):
         if 'content' in data:
             story.content = data['content']
         if 'genre' in data:
+            user_stats.story_regenred(current_user.id, story.genre, data['genre'])
             story.genre = data['genre']
         
+        # Stored translations describe the old text
+        if 'title' in data or 'content' in data:
+            StoryTranslation.query.filter_by(story_id=story.id).delete()
+        
         db.session.commit()
         
         return jsonify({
@@ -757,25 +1413,108 @@ def update_story(story_id):
             'story': story.to_dict()
         }), 200
     
+    except IntegrityError:
+        # The edit made it identical to another story in the library (uq_story_user_id_content_hash)
+        db.session.rollback()
+        return jsonify({'error': 'An identical story is already in your library'}), 409
+    
     except Exception as e:
         db.session.rollback()
         print(f"Error updating story: {e}")
         return jsonify({'error': 'Failed to update story'}), 500
 
 
+def translate_story_payload(story, target_language):
+    """
+    Translate a story's title, paragraphs, quiz and flashcards with one batched
+    pipeline: every string is collected once, translated together, then put back.
+    """
+    questions = story.questions or []
+    flashcards = story.flashcards or []
+    paragraphs = [para for para in (story.content or '').split('\n\n') if para.strip()]
+
+    texts = [story.title] + paragraphs
+    for q in questions:
+        texts.append(q.get('question', ''))
+        texts.extend(q.get('options', []))
+    for card in flashcards:
+        texts.extend([card.get('word', ''), card.get('definition', ''), card.get('example', '')])
+
+    # Blank strings need no translation (and the translator rejects them)
+    unique = list(dict.fromkeys(t for t in texts if t and t.strip()))
+    translated = dict(zip(unique, translation_service.translate_texts(unique, target_language)))
+    tr = lambda text: translated.get(text, text)
+
+    return {
+        'title': tr(story.title),
+        'content': '\n\n'.join(tr(para) for para in paragraphs),
+        'questions': [
+            {**q, 'question': tr(q.get('question', '')), 'options': [tr(o) for o in q.get('options', [])]}
+            for q in questions
+        ],
+        'flashcards': [
+            {**card, 'word': tr(card.get('word', '')), 'definition': tr(card.get('definition', '')),
+             'example': tr(card.get('example', ''))}
+            for card in flashcards
+        ]
+    }
+
+
+@app.route('/api/library/stories/<int:story_id>/translate/<language>', methods=['POST'])
+@login_required
+def translate_story(story_id, language):
+    """Translate a saved story with its quiz and flashcards; stored per language after the first call"""
+    try:
+        if language not in LANGUAGES:
+            return jsonify({'error': 'Unsupported language'}), 400
+
+        story = Story.query.filter_by(id=story_id, user_id=current_user.id).first()
+        if not story:
+            return jsonify({'error': 'Story not found'}), 404
+
+        translation = StoryTranslation.query.filter_by(story_id=story.id, language=language).first()
+        if not translation:
+            print(f"🌍 Translating story {story.id} to {LANGUAGES[language]}...")
+            translation = StoryTranslation(
+                story_id=story.id,
+                language=language,
+                payload=json.dumps(translate_story_payload(story, language))
+            )
+            db.session.add(translation)
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # A concurrent request stored this language first (uq story_id + language)
+                db.session.rollback()
+                translation = StoryTranslation.query.filter_by(story_id=story_id, language=language).first()
+                if translation is None:
+                    raise
+
+        return jsonify({
+            'translation': translation.to_dict(),
+            'languageName': LANGUAGES[language]
+        }), 200
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error translating story: {e}")
+        return jsonify({'error': 'Failed to translate story', 'details': str(e)}), 500
+
+
 @app.route('/api/user/stats', methods=['GET'])
 @login_required
 def get_user_stats():
     """Get user's usage statistics"""
     try:
+        stats = user_stats.get_user_stats(current_user.id)
         return jsonify({
-            'storiesGenerated': current_user.stories_generated,
-            'currentStreak': current_user.current_streak,
-            'longestStreak': current_user.longest_streak,
-            'totalStoriesSaved': Story.query.filter_by(user_id=current_user.id).count()
+            **stats.to_dict(),
+            'storiesRemainingToday': remaining_story_quota(current_user),
+            'dailyStoryLimit': DAILY_STORY_LIMIT
         }), 200
     
     except Exception as e:
+        db.session.rollback()
         print(f"Error fetching stats: {e}")
         return jsonify({'error': 'Failed to fetch statistics'}), 500
 
@@ -785,36 +1524,13 @@ def get_user_stats():
 def update_activity():
     """Update user activity and streak"""
     try:
-        from datetime import timedelta
-        
-        now = datetime.utcnow()
-        last_activity = current_user.last_activity
-        
-        # Check if this is a new day
-        if last_activity:
-            days_diff = (now.date() - last_activity.date()).days
-            
-            if days_diff == 1:
-                # Continue streak
-                current_user.current_streak += 1
-                if current_user.current_streak > current_user.longest_streak:
-                    current_user.longest_streak = current_user.current_streak
-            elif days_diff > 1:
-                # Streak broken
-                current_user.current_streak = 1
-        else:
-            # First activity
-            current_user.current_streak = 1
-        
-        current_user.stories_generated += 1
-        current_user.last_activity = now
-        
+        stats = user_stats.record_activity(current_user.id)
         db.session.commit()
         
         return jsonify({
-            'storiesGenerated': current_user.stories_generated,
-            'currentStreak': current_user.current_streak,
-            'longestStreak': current_user.longest_streak
+            'storiesGenerated': stats.stories_generated,
+            'currentStreak': stats.current_streak,
+            'longestStreak': stats.longest_streak
         }), 200
     
     except Exception as e:
@@ -0,0 +1,734 @@
+"""
+Benchmarks for the StoryLoom backend.
+Each benchmark builds its own throwaway SQLite database, so it never touches
+storyloom.db (`writes --database-url` targets a scratch database of your
+choice instead). Run from the backend directory:
+
+    python benchmark.py library --stories 100000
+    python benchmark.py extract --samples 2000
+    python benchmark.py combined --runs 5 [--live]
+    python benchmark.py response --stories 200
+    python benchmark.py writes --processes 4 --threads 4 [--database-url postgresql://...]
+    python benchmark.py auth --rounds 10 12
+    python benchmark.py search --stories 100000
+    python benchmark.py dedupe --saves 20
+"""
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import random
+import re
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import Flask
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from models import db, User, Story
+from database import init_database
+from json_extract import extract_json
+
+
+def make_app(db_path, tune=True):
+    """Minimal app bound to a scratch database (no providers, no routes); db_path may also be a URL"""
+    bench_app = Flask(__name__)
+    bench_app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    init_database(bench_app, db_path if '://' in db_path else f'sqlite:///{db_path}', tune=tune)
+    return bench_app
+
+
+def timed(fn, repeat):
+    """Run fn `repeat` times and return per-call latencies in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(label, samples):
+    samples = sorted(samples)
+    p50 = statistics.median(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f"  {label:<42} p50 {p50:8.2f} ms   p99 {p99:8.2f} ms")
+
+
+def seed_stories(total, users, content_size=600, questions=None, flashcards=None):
+    """Insert `total` stories spread over `users` users; returns the heaviest user id"""
+    db.session.execute(User.__table__.insert(), [
+        {'id': i, 'username': f'user{i}', 'email': f'user{i}@example.com', 'password_hash': 'x'}
+        for i in range(1, users + 1)
+    ])
+    heavy_user = 1
+    start = datetime(2024, 1, 1)
+    body = ('Once upon a time ' * (content_size // 17 + 1))[:content_size]
+    rows = []
+    for i in range(total):
+        # A third of all stories belong to one heavy user, the rest are spread out
+        user_id = heavy_user if i % 3 == 0 else random.randint(2, users)
+        rows.append({
+            'title': f'Story {i}', 'genre': 'Adventure', 'content': body,
+            'age_group': 'children', 'read_time': '3 min read',
+            'questions': questions or [], 'flashcards': flashcards or [],
+            'created_at': start + timedelta(seconds=i), 'user_id': user_id
+        })
+        if len(rows) == 5000:
+            db.session.execute(Story.__table__.insert(), rows)
+            rows = []
+    if rows:
+        db.session.execute(Story.__table__.insert(), rows)
+    db.session.commit()
+    return heavy_user
+
+
+def bench_library(args):
+    """Library listing, page and count latency with and without the composite index"""
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_app = make_app(os.path.join(tmp, 'bench.db'))
+        with bench_app.app_context():
+            db.create_all()
+            print(f"Seeding {args.stories} stories across {args.users} users...")
+            user_id = seed_stories(args.stories, args.users)
+            owned = Story.query.filter_by(user_id=user_id).count()
+            print(f"Heavy user owns {owned} stories\n")
+
+            summary_columns = [Story.id, Story.title, Story.genre, Story.age_group,
+                               Story.read_time, Story.cover_hash, Story.created_at]
+
+            def full_listing():
+                Story.query.filter_by(user_id=user_id).order_by(Story.created_at.desc()).all()
+
+            def summary_page():
+                db.session.query(*summary_columns).filter(Story.user_id == user_id) \
+                    .order_by(Story.created_at.desc(), Story.id.desc()).limit(21).all()
+
+            def count():
+                Story.query.filter_by(user_id=user_id).count()
+
+            for label, indexed in (('without index', False), ('with ix_story_user_id_created_at', True)):
+                if indexed:
+                    db.session.execute(text(
+                        'CREATE INDEX IF NOT EXISTS ix_story_user_id_created_at '
+                        'ON story (user_id, created_at DESC)'))
+                else:
+                    db.session.execute(text('DROP INDEX IF EXISTS ix_story_user_id_created_at'))
+                db.session.commit()
+                db.session.execute(text('ANALYZE'))
+
+                print(f"{label}:")
+                report('full listing (legacy, all columns)', timed(full_listing, max(1, args.repeat // 10)))
+                report('summary page (limit 20)', timed(summary_page, args.repeat))
+                report('count()', timed(count, args.repeat))
+                print()
+
+
+def legacy_extract(text):
+    """The regex extraction extract_json replaced, kept for comparison"""
+    match = re.search(r'```json\s*(\{.*?\})\s*```', text, re.DOTALL) or re.search(r'\{.*\}', text, re.DOTALL)
+    return json.loads(match.group(match.lastindex or 0) if match else text)
+
+
+def synthetic_outputs(samples, rng):
+    """Story-shaped model outputs with the defects seen in practice; yields (kind, text, expected title)"""
+    words = 'the fox ran over a hill and found a small door in an old tree near the river'.split()
+
+    def sentence():
+        return ' '.join(rng.choice(words) for _ in range(rng.randint(6, 14))).capitalize() + '.'
+
+    kinds = ['clean', 'fenced', 'prose_with_braces', 'literal_newlines', 'trailing_commas',
+             'smart_quotes', 'unescaped_quotes', 'truncated', 'two_objects']
+    for i in range(samples):
+        kind = kinds[i % len(kinds)]
+        title = f"The Door {i}"
+        story = {
+            'title': title,
+            'genre': 'Fantasy',
+            'content': '\n\n'.join(' '.join(sentence() for _ in range(5)) for _ in range(rng.randint(3, 8))),
+            'readTime': '3 min read',
+            'imageDescription': sentence(),
+            'questions': [{'question': sentence(), 'options': [sentence() for _ in range(4)], 'correctAnswer': 0}
+                          for _ in range(3)]
+        }
+        text = json.dumps(story, indent=2)
+        if kind == 'fenced':
+            text = f"```json\n{text}\n```"
+        elif kind == 'prose_with_braces':
+            text = f"Here is the story {{as requested}}:\n{text}\nWant changes? Reply with {{edits}}."
+        elif kind == 'literal_newlines':
+            text = text.replace('\\n', '\n')
+        elif kind == 'trailing_commas':
+            text = re.sub(r'(["\d\]}])(\s*\n\s*[}\]])', r'\1,\2', text)
+        elif kind == 'smart_quotes':
+            parts = text.split('"')
+            text = parts[0] + ''.join(('”' if j % 2 else '“') + part for j, part in enumerate(parts[1:]))
+        elif kind == 'unescaped_quotes':
+            text = text.replace('found a', 'found "a', 1).replace('small door', 'small door"', 1)
+            text = text.replace('"readTime"', '"note": "the "old" tree",\n  "readTime"', 1)
+        elif kind == 'truncated':
+            text = text[:int(len(text) * rng.uniform(0.6, 0.95))]
+        elif kind == 'two_objects':
+            text = f"{text}\n\nOr, alternatively:\n{json.dumps(dict(story, title='Other'))}"
+        yield kind, text, title
+
+
+def bench_extract(args):
+    """JSON extraction from model output: recovery rate and latency, regex+json.loads vs extract_json"""
+    if args.corpus:
+        corpus = []
+        for path in sorted(glob.glob(os.path.join(args.corpus, '*'))):
+            with open(path, encoding='utf-8') as f:
+                corpus.append(('recorded', f.read(), None))
+        print(f"Loaded {len(corpus)} recorded outputs from {args.corpus}\n")
+    else:
+        corpus = list(synthetic_outputs(args.samples, random.Random(args.seed)))
+        print(f"Generated {len(corpus)} synthetic outputs\n")
+
+    for label, extractor in (('regex + json.loads', legacy_extract), ('extract_json', extract_json)):
+        outcomes = {}
+        samples = []
+        for kind, text, title in corpus:
+            start = time.perf_counter()
+            try:
+                value = extractor(text)
+                ok = title is None or value.get('title') == title
+            except ValueError:
+                ok = False
+            samples.append((time.perf_counter() - start) * 1000)
+            hits, total = outcomes.get(kind, (0, 0))
+            outcomes[kind] = (hits + ok, total + 1)
+        recovered = sum(h for h, _ in outcomes.values())
+        print(f"{label}: recovered {recovered}/{len(corpus)}")
+        for kind, (hits, total) in outcomes.items():
+            print(f"  {kind:<42} {hits:5d}/{total}")
+        report('per output', samples)
+        print()
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token for English prose and JSON)"""
+    return max(1, len(text) // 4)
+
+
+class SimulatedProvider:
+    """
+    Stand-in provider for offline runs: answers with documents shaped like real
+    ones and sleeps like an LLM (fixed overhead + prefill + decode time per token)
+    """
+    name = 'Simulated'
+
+    def __init__(self, story_words, overhead, prefill, decode):
+        self.story_words = story_words
+        self.overhead, self.prefill, self.decode = overhead, prefill, decode
+        self.input_tokens = self.output_tokens = self.calls = 0
+        self._lock = threading.Lock()
+
+    def is_available(self):
+        return True
+
+    def generate_content(self, prompt, json_mode=False):
+        words = 'the fox ran over a hill and found a small door in an old tree'.split()
+        content = ' '.join(words[i % len(words)] for i in range(self.story_words))
+        quiz = [{'question': 'What did the fox find?', 'options': ['A door', 'A key', 'A map', 'A boat'],
+                 'correct': 0} for _ in range(5)]
+        cards = [{'word': 'door', 'definition': 'a way in', 'example': 'The fox opened the door.'}
+                 for _ in range(5)]
+        if '"questions": [' in prompt and '"title"' in prompt:
+            doc = {'title': 'The Door', 'genre': 'Fantasy', 'content': content, 'readTime': '3 min read',
+                   'imageDescription': 'A fox at a door in a tree', 'questions': quiz, 'flashcards': cards}
+        elif '"title"' in prompt:
+            doc = {'title': 'The Door', 'genre': 'Fantasy', 'content': content, 'readTime': '3 min read',
+                   'imageDescription': 'A fox at a door in a tree'}
+        elif '"questions"' in prompt:
+            doc = {'questions': quiz}
+        else:
+            doc = {'flashcards': cards}
+        response = json.dumps(doc)
+        tokens_in, tokens_out = estimate_tokens(prompt), estimate_tokens(response)
+        with self._lock:
+            self.calls += 1
+            self.input_tokens += tokens_in
+            self.output_tokens += tokens_out
+        time.sleep(self.overhead + tokens_in * self.prefill + tokens_out * self.decode)
+        return response
+
+
+class CountingProvider:
+    """Wraps a real provider to count estimated tokens per call"""
+
+    def __init__(self, provider):
+        self.provider = provider
+        self.input_tokens = self.output_tokens = self.calls = 0
+
+    def __getattr__(self, attr):
+        return getattr(self.provider, attr)
+
+    def generate_content(self, prompt, json_mode=False):
+        response = self.provider.generate_content(prompt, json_mode=json_mode)
+        self.calls += 1
+        self.input_tokens += estimate_tokens(prompt)
+        self.output_tokens += estimate_tokens(response)
+        return response
+
+
+def bench_combined(args):
+    """Story + quiz + flashcards: three calls (as the app does today) vs one combined call"""
+    if not args.live:
+        os.environ.setdefault('GITHUB_TOKEN', 'offline-benchmark')
+    os.environ['JOB_WORKERS'] = '0'
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app as storyloom
+
+    manager = storyloom.ai_manager
+    manager.hedged = False
+    if args.live:
+        counters = [CountingProvider(p) for p in manager.available_providers]
+        manager.available_providers = manager._configured_order = counters
+        for counter in counters:
+            manager.health[counter.name] = manager.health[counter.provider.name]
+    else:
+        from provider_health import ProviderHealth
+        counters = [SimulatedProvider(args.story_words, args.overhead, args.prefill, args.decode)]
+        manager.available_providers = manager._configured_order = counters
+        manager.health = {'Simulated': ProviderHealth('Simulated')}
+    # Every run must reach the providers
+    storyloom.response_cache.get = lambda key: None
+
+    def separate():
+        story = storyloom.generate_story_data('Fantasy', args.age_group)
+        storyloom.generate_quiz_data(story['title'], story['content'], args.age_group)
+        storyloom.generate_flashcards_data(story['content'], args.age_group)
+
+    def separate_parallel():
+        story = storyloom.generate_story_data('Fantasy', args.age_group)
+        with storyloom.ThreadPoolExecutor(max_workers=2) as pool:
+            quiz = pool.submit(storyloom.generate_quiz_data, story['title'], story['content'], args.age_group)
+            cards = pool.submit(storyloom.generate_flashcards_data, story['content'], args.age_group)
+            quiz.result(), cards.result()
+
+    def combined():
+        storyloom.generate_story_bundle('Fantasy', args.age_group)
+
+    mode = 'live providers' if args.live else (
+        f'simulated provider ({args.story_words}-word stories, {args.overhead}s overhead, '
+        f'{args.prefill * 1000:.2f} ms/input token, {args.decode * 1000:.1f} ms/output token)')
+    print(f"{args.runs} runs per flow, {mode}\n")
+    for label, flow in (('three calls, sequential (frontend)', separate),
+                        ('three calls, quiz+flashcards parallel (jobs)', separate_parallel),
+                        ('one combined call', combined)):
+        for counter in counters:
+            counter.calls = counter.input_tokens = counter.output_tokens = 0
+        with contextlib.redirect_stdout(io.StringIO()):
+            samples = timed(flow, args.runs)
+        calls = sum(c.calls for c in counters) / args.runs
+        tokens_in = sum(c.input_tokens for c in counters) / args.runs
+        tokens_out = sum(c.output_tokens for c in counters) / args.runs
+        print(f"{label}: {calls:.1f} calls, ~{tokens_in:.0f} input + ~{tokens_out:.0f} output tokens per story")
+        report('wall time', samples)
+        print()
+
+
+def bench_response(args):
+    """/api/library/stories response layer: JSON encoder and compression (latency + bytes)"""
+    import compression
+    from flask import jsonify, request
+    from flask.json.provider import DefaultJSONProvider
+    from fast_json import FastJSONProvider, orjson
+
+    questions = [{'question': 'What did the fox find in the old tree?',
+                             'options': ['A small door', 'A key', 'A map', 'A boat'], 'correct': 0}] * 5
+    flashcards = [{'word': 'curious', 'definition': 'wanting to know or learn something',
+                              'example': 'The curious fox opened the door.'}] * 5
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_app = make_app(os.path.join(tmp, 'bench.db'))
+        compression.init_compression(bench_app)
+
+        @bench_app.route('/api/library/stories')
+        def listing():
+            stories = Story.query.filter_by(user_id=1).order_by(Story.created_at.desc()).all()
+            return jsonify({'stories': [story.to_dict() for story in stories]})
+
+        with bench_app.app_context():
+            db.create_all()
+            seed_stories(args.stories * 3, 2, content_size=args.content_size,
+                         questions=questions, flashcards=flashcards)
+            # Distinct text per story, so compression ratios resemble real libraries
+            rng = random.Random(args.stories)
+            vocabulary = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(2, 9)))
+                          for _ in range(3000)]
+            for story_id, in db.session.query(Story.id).filter(Story.user_id == 1).all():
+                words = ' '.join(rng.choice(vocabulary) for _ in range(args.content_size // 6))
+                db.session.execute(Story.__table__.update().where(Story.id == story_id).values(content=words))
+            db.session.commit()
+
+        client = bench_app.test_client()
+        configs = [('stdlib json, identity', DefaultJSONProvider, None),
+                   (f"{'orjson' if orjson else 'stdlib (orjson missing)'}, identity", FastJSONProvider, None)]
+        configs += [(f'  + {encoding}', FastJSONProvider, encoding) for encoding in compression.ENCODERS]
+
+        print(f"{args.stories} stories of ~{args.content_size} chars with quiz and flashcards\n")
+        for label, provider, encoding in configs:
+            bench_app.json = provider(bench_app)
+            headers = {'Accept-Encoding': encoding} if encoding else {}
+            response = client.get('/api/library/stories', headers=headers)  # warm-up
+            wire = len(response.data)
+            samples = timed(lambda: client.get('/api/library/stories', headers=headers), args.repeat)
+            print(f"{label}: {wire / 1024:.1f} KiB on the wire")
+            report('GET /api/library/stories', samples)
+        print(f"\nbrotli {'available' if compression.brotli else 'not installed'}, "
+              f"zstandard {'available' if compression.zstandard else 'not installed'}")
+
+
+def write_worker(url, tune, user_ids, writes, readers):
+    """
+    One 'gunicorn worker': a thread per user doing generate_story's counter update and
+    save_story's insert, while `readers` threads keep loading a library listing
+    """
+    bench_app = make_app(url, tune=tune)
+    latencies, errors, reads = [], [], []
+    done = threading.Event()
+
+    def write(user_id):
+        with bench_app.app_context():
+            for i in range(writes):
+                start = time.perf_counter()
+                try:
+                    user = db.session.get(User, user_id)
+                    user.stories_generated = (user.stories_generated or 0) + 1
+                    db.session.commit()
+                    db.session.add(Story(title=f'Story {i}', genre='Adventure', content='Once upon a time ' * 40,
+                                         age_group='children', questions=[], flashcards=[], user_id=user_id))
+                    db.session.commit()
+                    latencies.append((time.perf_counter() - start) * 1000)
+                except OperationalError as e:
+                    db.session.rollback()
+                    errors.append(str(e.orig))
+            db.session.remove()
+
+    def read(user_id):
+        with bench_app.app_context():
+            while not done.is_set():
+                start = time.perf_counter()
+                try:
+                    Story.query.filter_by(user_id=user_id).order_by(Story.created_at.desc()).all()
+                    reads.append((time.perf_counter() - start) * 1000)
+                except OperationalError as e:
+                    db.session.rollback()
+                    errors.append(str(e.orig))
+                db.session.remove()
+
+    writers = [threading.Thread(target=write, args=(user_id,)) for user_id in user_ids]
+    reader_threads = [threading.Thread(target=read, args=(user_ids[i % len(user_ids)],)) for i in range(readers)]
+    for thread in writers + reader_threads:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    done.set()
+    for thread in reader_threads:
+        thread.join()
+    return latencies, errors, reads
+
+
+def bench_writes(args):
+    """Concurrent commits from several processes: latency and "database is locked" errors"""
+    import multiprocessing
+    from database import SQLITE_BUSY_TIMEOUT
+
+    per_process = [list(range(p * args.threads + 1, (p + 1) * args.threads + 1)) for p in range(args.processes)]
+    total = args.processes * args.threads * args.writes
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.database_url:
+            targets = [(f'{args.database_url} (tuned)', args.database_url, True)]
+        else:
+            targets = [('SQLite, rollback journal (previous defaults)', os.path.join(tmp, 'default.db'), False),
+                       (f'SQLite, WAL + synchronous=NORMAL + busy_timeout={SQLITE_BUSY_TIMEOUT}ms',
+                        os.path.join(tmp, 'tuned.db'), True)]
+
+        print(f"{args.processes} processes x {args.threads} threads x {args.writes} "
+              f"(counter update + story insert) = {total} write pairs, "
+              f"{args.readers} reader threads per process\n")
+        for label, url, tune in targets:
+            setup_app = make_app(url, tune=tune)
+            with setup_app.app_context():
+                db.create_all()
+                db.session.execute(Story.__table__.delete())
+                db.session.execute(User.__table__.delete())
+                seed_stories(0, args.processes * args.threads)
+                db.engine.dispose()
+
+            started = time.perf_counter()
+            # spawn: each worker builds its own engine, like separate gunicorn workers
+            with multiprocessing.get_context('spawn').Pool(args.processes) as pool:
+                results = pool.starmap(write_worker, [(url, tune, user_ids, args.writes, args.readers)
+                                                     for user_ids in per_process])
+            elapsed = time.perf_counter() - started
+
+            latencies = [ms for result in results for ms in result[0]]
+            errors = [error for result in results for error in result[1]]
+            reads = [ms for result in results for ms in result[2]]
+            print(f"{label}:")
+            print(f"  {len(latencies)} ok, {len(errors)} failed, {len(latencies) / elapsed:.0f} write pairs/s")
+            if latencies:
+                report('update + insert', latencies)
+            if reads:
+                report(f'concurrent listing ({len(reads)} reads)', reads)
+            for message in sorted(set(errors)):
+                print(f"  error x{errors.count(message)}: {message}")
+            print()
+
+
+def import_storyloom():
+    """The full app (offline providers), bound to a throwaway SQLite database"""
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'storyloom.db')}"
+    os.environ.setdefault('GITHUB_TOKEN', 'offline-benchmark')
+    os.environ['JOB_WORKERS'] = '0'
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app as storyloom
+        with storyloom.app.app_context():
+            db.create_all()
+    return storyloom
+
+
+def bench_auth(args):
+    """Login throughput per bcrypt cost, and per-request auth overhead with and without the user cache"""
+    storyloom = import_storyloom()
+    app, bcrypt, user_cache = storyloom.app, storyloom.bcrypt, storyloom.user_cache
+
+    print("bcrypt cost (one check, single thread):")
+    for rounds in args.rounds:
+        password_hash = bcrypt.generate_password_hash('benchmark-password', rounds)
+        samples = timed(lambda: bcrypt.check_password_hash(password_hash, 'benchmark-password'), args.checks)
+        report(f'rounds={rounds} ({1000 / statistics.median(samples):.1f} logins/s per core)', samples)
+
+    print(f"\nPOST /api/auth/login, {args.threads} concurrent clients, {args.logins} logins:")
+    for rounds in args.rounds:
+        bcrypt._log_rounds = app.config['BCRYPT_LOG_ROUNDS'] = rounds
+        username = f'login{rounds}'
+        client = app.test_client()
+        client.post('/api/auth/register', json={'username': username, 'email': f'{username}@example.com',
+                                                 'password': 'benchmark-password'})
+
+        def login(_):
+            start = time.perf_counter()
+            app.test_client().post('/api/auth/login', json={'username': username, 'password': 'benchmark-password'})
+            return (time.perf_counter() - start) * 1000
+
+        started = time.perf_counter()
+        with storyloom.ThreadPoolExecutor(max_workers=args.threads) as pool:
+            samples = list(pool.map(login, range(args.logins)))
+        elapsed = time.perf_counter() - started
+        report(f'rounds={rounds} ({args.logins / elapsed:.1f} logins/s)', samples)
+
+    client = app.test_client()
+    client.post('/api/auth/register', json={'username': 'poller', 'email': 'poller@example.com',
+                                             'password': 'benchmark-password'})
+    print(f"\nAuthenticated requests ({args.requests} each):")
+    for label, ttl in (('no user cache', 0), (f'user cache (ttl {user_cache.ttl:g}s)', user_cache.ttl or 30)):
+        user_cache.ttl = ttl
+        user_cache.clear()
+        for endpoint in ('/api/auth/user', '/api/user/stats'):
+            client.get(endpoint)
+            report(f'GET {endpoint}, {label}', timed(lambda: client.get(endpoint), args.requests))
+
+
+SEARCH_VOCABULARY = (
+    'dragon castle forest river princess knight wizard robot rocket planet ocean pirate treasure '
+    'island garden rabbit fox owl bear moon star cloud storm mountain village baker friendship '
+    'courage kindness secret map lantern bridge train library puzzle music painter inventor'
+).split()
+
+
+def seed_search_stories(total, users, content_words, rng):
+    """Insert `total` stories of random vocabulary words; returns the heaviest user id"""
+    db.session.execute(User.__table__.insert(), [
+        {'id': i, 'username': f'user{i}', 'email': f'user{i}@example.com', 'password_hash': 'x'}
+        for i in range(1, users + 1)
+    ])
+    # A long tail of rare words next to the common vocabulary, like real story text
+    rare = [f'{word}{n}' for word in SEARCH_VOCABULARY for n in range(50)]
+    start = datetime(2024, 1, 1)
+    rows = []
+    for i in range(total):
+        words = [rng.choice(SEARCH_VOCABULARY) if rng.random() < 0.7 else rng.choice(rare)
+                 for _ in range(content_words)]
+        rows.append({
+            'title': f'The {rng.choice(SEARCH_VOCABULARY)} and the {rng.choice(SEARCH_VOCABULARY)}',
+            'genre': rng.choice(('Adventure', 'Fantasy', 'Mystery', 'Science Fiction')),
+            'content': ' '.join(words), 'age_group': 'children', 'read_time': '3 min read',
+            'questions': [], 'flashcards': [{'word': rng.choice(rare), 'definition': '...'}],
+            'created_at': start + timedelta(seconds=i),
+            'user_id': 1 if i % 3 == 0 else rng.randint(2, users)
+        })
+        if len(rows) == 5000:
+            db.session.execute(Story.__table__.insert(), rows)
+            rows = []
+    if rows:
+        db.session.execute(Story.__table__.insert(), rows)
+    db.session.commit()
+    return 1
+
+
+def bench_search(args):
+    """Library search latency: FTS5 + BM25 against the LIKE scan, on common, rare and prefix queries"""
+    import search
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_app = make_app(os.path.join(tmp, 'bench.db'))
+        with bench_app.app_context():
+            db.create_all()  # also creates the FTS index and its triggers
+            print(f"Seeding {args.stories} stories ({args.content_words} words each) across {args.users} users...")
+            started = time.perf_counter()
+            user_id = seed_search_stories(args.stories, args.users, args.content_words, rng)
+            print(f"Seeded and indexed in {time.perf_counter() - started:.1f} s; "
+                  f"heavy user owns {Story.query.filter_by(user_id=user_id).count()} stories\n")
+            db.session.execute(text('ANALYZE'))
+
+            queries = (('common word', 'dragon'), ('two common words', 'dragon castle'),
+                       ('rare word', 'lantern17'), ('prefix (search-as-you-type)', 'lant'),
+                       ('no match', 'zeppelin'))
+            for label, query in queries:
+                fts_results, _ = search._search_fts(user_id, query, args.limit, 0)
+                like_results, _ = search._search_like(user_id, query, args.limit, 0)
+                print(f"{label}: q={query!r} ({len(fts_results)} FTS / {len(like_results)} LIKE results on page 1)")
+                report('FTS5 MATCH + bm25 + snippet', timed(
+                    lambda: search._search_fts(user_id, query, args.limit, 0), args.repeat))
+                report('LIKE scan (previous / fallback)', timed(
+                    lambda: search._search_like(user_id, query, args.limit, 0), max(1, args.repeat // 5)))
+                report('FTS5, page 5', timed(
+                    lambda: search._search_fts(user_id, query, args.limit, args.limit * 4), args.repeat))
+                print()
+
+
+def bench_dedupe(args):
+    """Repeated saves of one story with a large cover: latency, rows stored and stats after a double-click burst"""
+    import base64
+    from PIL import Image
+    storyloom = import_storyloom()
+    app = storyloom.app
+
+    # Noise compresses badly, so the PNG is about as large as a generated cover
+    side = int((args.cover_kb * 1024 / 3) ** 0.5)
+    buffer = io.BytesIO()
+    Image.frombytes('RGB', (side, side), os.urandom(side * side * 3)).save(buffer, 'PNG')
+    cover = 'data:image/png;base64,' + base64.b64encode(buffer.getvalue()).decode()
+    story = {'title': 'The Lantern Bridge', 'genre': 'Fantasy', 'content': 'Once upon a time... ' * 200,
+             'ageGroup': 'children', 'readTime': '3 min read', 'questions': [], 'flashcards': [],
+             'coverImage': cover}
+    print(f"Story with a {len(buffer.getvalue()) // 1024} KB cover ({len(cover) // 1024} KB as sent)\n")
+
+    client = app.test_client()
+    client.post('/api/auth/register', json={'username': 'saver', 'email': 'saver@example.com',
+                                             'password': 'benchmark-password'})
+    session_cookie = client.get_cookie('session').value
+
+    report('first save (201)', timed(lambda: client.post('/api/library/stories', json=story), 1))
+    report(f'repeated save x{args.saves} (200, existing copy)', timed(
+        lambda: client.post('/api/library/stories', json=story), args.saves))
+    keyed = {**story, 'title': 'Keyed'}
+    client.post('/api/library/stories', json=keyed, headers={'Idempotency-Key': 'bench-key'})
+    report('retry with the same Idempotency-Key', timed(
+        lambda: client.post('/api/library/stories', json=keyed, headers={'Idempotency-Key': 'bench-key'}),
+        args.saves))
+
+    burst = {**story, 'title': 'Double-click'}
+    barrier = threading.Barrier(args.clients)
+
+    def click(_):
+        request_client = app.test_client()
+        request_client.set_cookie('session', session_cookie)
+        barrier.wait()
+        return request_client.post('/api/library/stories', json=burst).status_code
+
+    with storyloom.ThreadPoolExecutor(max_workers=args.clients) as pool:
+        burst_statuses = list(pool.map(click, range(args.clients)))
+
+    with app.app_context():
+        user_id = User.query.filter_by(username='saver').first().id
+        rows = Story.query.filter_by(user_id=user_id).count()
+        counted = storyloom.user_stats.get_user_stats(user_id).total_saved
+    print(f"\n{args.clients} simultaneous saves: {burst_statuses.count(201)} created, "
+          f"{burst_statuses.count(200)} returned the existing copy, "
+          f"{sum(1 for s in burst_statuses if s >= 400)} failed")
+    print(f"{1 + args.saves + 1 + args.saves + args.clients} save requests stored {rows} stories "
+          f"(previously one row each); stats count {counted}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    library = subparsers.add_parser('library', help=bench_library.__doc__)
+    library.add_argument('--stories', type=int, default=100000)
+    library.add_argument('--users', type=int, default=500)
+    library.add_argument('--repeat', type=int, default=50)
+    library.set_defaults(func=bench_library)
+
+    extract = subparsers.add_parser('extract', help=bench_extract.__doc__)
+    extract.add_argument('--samples', type=int, default=2000)
+    extract.add_argument('--seed', type=int, default=7)
+    extract.add_argument('--corpus', help='directory of recorded model outputs, one per file')
+    extract.set_defaults(func=bench_extract)
+
+    combined = subparsers.add_parser('combined', help=bench_combined.__doc__)
+    combined.add_argument('--runs', type=int, default=5)
+    combined.add_argument('--age-group', default='children')
+    combined.add_argument('--live', action='store_true', help='call the configured AI providers (costs tokens)')
+    combined.add_argument('--story-words', type=int, default=450)
+    combined.add_argument('--overhead', type=float, default=0.3, help='simulated seconds per call')
+    combined.add_argument('--prefill', type=float, default=0.0002, help='simulated seconds per input token')
+    combined.add_argument('--decode', type=float, default=0.004, help='simulated seconds per output token')
+    combined.set_defaults(func=bench_combined)
+
+    response = subparsers.add_parser('response', help=bench_response.__doc__)
+    response.add_argument('--stories', type=int, default=200, help='stories in the listed library')
+    response.add_argument('--content-size', type=int, default=3000)
+    response.add_argument('--repeat', type=int, default=50)
+    response.set_defaults(func=bench_response)
+
+    writes = subparsers.add_parser('writes', help=bench_writes.__doc__)
+    writes.add_argument('--processes', type=int, default=4)
+    writes.add_argument('--threads', type=int, default=4, help='threads (users) per process')
+    writes.add_argument('--writes', type=int, default=50, help='write pairs per thread')
+    writes.add_argument('--readers', type=int, default=2, help='listing threads per process')
+    writes.add_argument('--database-url', help='scratch database to test instead of temporary SQLite files '
+                                               '(its user and story tables are emptied)')
+    writes.set_defaults(func=bench_writes)
+
+    auth = subparsers.add_parser('auth', help=bench_auth.__doc__)
+    auth.add_argument('--rounds', type=int, nargs='+', default=[10, 11, 12])
+    auth.add_argument('--checks', type=int, default=10, help='bcrypt checks per cost')
+    auth.add_argument('--logins', type=int, default=40)
+    auth.add_argument('--threads', type=int, default=4)
+    auth.add_argument('--requests', type=int, default=500)
+    auth.set_defaults(func=bench_auth)
+
+    search = subparsers.add_parser('search', help=bench_search.__doc__)
+    search.add_argument('--stories', type=int, default=100000)
+    search.add_argument('--users', type=int, default=500)
+    search.add_argument('--content-words', type=int, default=120)
+    search.add_argument('--limit', type=int, default=20)
+    search.add_argument('--repeat', type=int, default=50)
+    search.add_argument('--seed', type=int, default=7)
+    search.set_defaults(func=bench_search)
+
+    dedupe = subparsers.add_parser('dedupe', help=bench_dedupe.__doc__)
+    dedupe.add_argument('--saves', type=int, default=20, help='repeated saves of the same story')
+    dedupe.add_argument('--cover-kb', type=int, default=2048, help='approximate cover PNG size')
+    dedupe.add_argument('--clients', type=int, default=8, help='simultaneous saves in the double-click burst')
+    dedupe.set_defaults(func=bench_dedupe)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
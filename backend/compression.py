@@ -0,0 +1,83 @@
+"""
+Response Compression
+Negotiates zstd, brotli or gzip (in that order of preference, subject to the
+client's Accept-Encoding weights) for API responses above a size threshold.
+brotli and zstandard are optional; gzip always works.
+"""
+
+import os
+import gzip
+from typing import Callable, Dict
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+# Cheap levels: this runs inline on every large response
+GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', 1))
+BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', 4))
+ZSTD_LEVEL = int(os.getenv('COMPRESS_ZSTD_LEVEL', 3))
+
+# Already-compressed payloads (cover images) are left alone
+COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/javascript', 'image/svg+xml')
+
+
+def _encoders() -> Dict[str, Callable[[bytes], bytes]]:
+    encoders = {}
+    if zstandard is not None:
+        # ZstdCompressor instances are not thread-safe, but cheap to create per response
+        encoders['zstd'] = lambda data: zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    if brotli is not None:
+        encoders['br'] = lambda data: brotli.compress(data, quality=BROTLI_QUALITY)
+    encoders['gzip'] = lambda data: gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    return encoders
+
+
+ENCODERS = _encoders()
+
+
+def choose_encoding(request) -> str:
+    """Best encoding both sides support, or '' for identity"""
+    return request.accept_encodings.best_match(list(ENCODERS)) or ''
+
+
+def compress_response(request, response, min_size: int = MIN_SIZE):
+    """Compress `response` in place if it is worth it and the client accepts it"""
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or 'Content-Encoding' in response.headers
+        or not 200 <= response.status_code < 300
+        or not (response.mimetype or '').startswith(COMPRESSIBLE_TYPES)
+    ):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request)
+    if not encoding:
+        return response
+    data = response.get_data()
+    if len(data) < min_size:
+        return response
+
+    response.set_data(ENCODERS[encoding](data))
+    response.headers['Content-Encoding'] = encoding
+    # A strong ETag names one exact byte sequence; tag the encoded variant separately
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(f'{etag}-{encoding}')
+    return response
+
+
+def init_compression(app, min_size: int = MIN_SIZE) -> None:
+    @app.after_request
+    def _compress(response):
+        from flask import request
+        return compress_response(request, response, min_size)
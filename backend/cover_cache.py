@@ -0,0 +1,199 @@
+"""
+Cover Prompt Cache
+Maps image prompts to covers already in the cover store so a repeated prompt
+skips the diffusion call. Exact matches use a hash of the normalized prompt;
+the optional near-duplicate tier compares MinHash signatures of word shingles,
+bucketed with LSH bands so lookups never scan the whole table.
+"""
+
+import os
+import re
+import time
+import random
+import sqlite3
+import hashlib
+import threading
+from array import array
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+NUM_PERM = 64
+BANDS = 16  # 16 bands x 4 rows: prompts ~0.8 similar almost always share a bucket
+_ROWS = NUM_PERM // BANDS
+_PRIME = (1 << 61) - 1
+_rng = random.Random(1337)  # fixed seed: signatures must be stable across restarts
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+_WORD = re.compile(r"[a-z0-9']+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    return ' '.join(_WORD.findall((prompt or '').lower()))
+
+
+def shingles(normalized: str) -> Set[str]:
+    """Word bigrams (single words for one-word prompts)"""
+    words = normalized.split()
+    if len(words) < 2:
+        return set(words)
+    return {f'{a} {b}' for a, b in zip(words, words[1:])}
+
+
+def minhash(tokens: Set[str]) -> List[int]:
+    hashes = [int.from_bytes(hashlib.blake2b(t.encode('utf-8'), digest_size=8).digest(), 'big') for t in tokens]
+    if not hashes:
+        return [_PRIME] * NUM_PERM
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def similarity(sig_a: List[int], sig_b: List[int]) -> float:
+    """Estimated Jaccard similarity of the two shingle sets"""
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / NUM_PERM
+
+
+def _band_keys(signature: List[int]) -> List[str]:
+    return [
+        hashlib.blake2b(repr(signature[i * _ROWS:(i + 1) * _ROWS]).encode(), digest_size=8).hexdigest()
+        for i in range(BANDS)
+    ]
+
+
+class CoverCache:
+    """prompt -> cover hash, in SQLite, bounded to the most recently used entries"""
+
+    def __init__(self, db_path: Optional[str] = None, max_entries: Optional[int] = None,
+                 min_similarity: Optional[float] = None):
+        default_path = Path(__file__).parent / 'instance' / 'cover_cache.db'
+        self.db_path = db_path or os.getenv('COVER_CACHE_DB', str(default_path))
+        self.max_entries = max_entries or int(os.getenv('COVER_CACHE_MAX_ENTRIES', 2000))
+        # 0 disables the near-duplicate tier
+        self.min_similarity = min_similarity if min_similarity is not None \
+            else float(os.getenv('COVER_CACHE_SIMILARITY', 0))
+        self._lock = threading.Lock()
+        self.stats = {'exact_hits': 0, 'similar_hits': 0, 'misses': 0, 'evictions': 0}
+
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cover_cache ('
+                'prompt_hash TEXT PRIMARY KEY, cover_hash TEXT NOT NULL, model TEXT, '
+                'signature BLOB NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_cover_cache_last_used ON cover_cache (last_used)')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cover_cache_band ('
+                'band_key TEXT NOT NULL, prompt_hash TEXT NOT NULL, PRIMARY KEY (band_key, prompt_hash))'
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def prompt_hash(prompt: str) -> str:
+        return hashlib.sha256(normalize_prompt(prompt).encode('utf-8')).hexdigest()
+
+    def lookup(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """{'coverHash', 'model', 'match': 'exact'|'similar', 'similarity', 'promptHash'} or None"""
+        key = self.prompt_hash(prompt)
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    'SELECT cover_hash, model FROM cover_cache WHERE prompt_hash = ?', (key,)
+                ).fetchone()
+                if row:
+                    conn.execute('UPDATE cover_cache SET last_used = ? WHERE prompt_hash = ?', (time.time(), key))
+                    self._count('exact_hits')
+                    return {'coverHash': row[0], 'model': row[1], 'match': 'exact', 'similarity': 1.0,
+                            'promptHash': key}
+
+                if self.min_similarity > 0:
+                    match = self._lookup_similar(conn, minhash(shingles(normalize_prompt(prompt))))
+                    if match:
+                        self._count('similar_hits')
+                        return match
+        except sqlite3.Error as e:
+            print(f"⚠️  Cover cache read failed: {e}")
+        self._count('misses')
+        return None
+
+    def _lookup_similar(self, conn, signature: List[int]) -> Optional[Dict[str, Any]]:
+        bands = _band_keys(signature)
+        candidates = conn.execute(
+            f"SELECT c.prompt_hash, c.cover_hash, c.model, c.signature FROM cover_cache c "
+            f"WHERE c.prompt_hash IN (SELECT prompt_hash FROM cover_cache_band "
+            f"WHERE band_key IN ({','.join('?' * len(bands))}))",
+            bands
+        ).fetchall()
+        best = None
+        for prompt_hash, cover_hash, model, blob in candidates:
+            score = similarity(signature, array('Q', blob).tolist())
+            if score >= self.min_similarity and (best is None or score > best[0]):
+                best = (score, prompt_hash, cover_hash, model)
+        if best is None:
+            return None
+        conn.execute('UPDATE cover_cache SET last_used = ? WHERE prompt_hash = ?', (time.time(), best[1]))
+        return {'coverHash': best[2], 'model': best[3], 'match': 'similar', 'similarity': round(best[0], 3),
+                'promptHash': best[1]}
+
+    def store(self, prompt: str, cover_hash: str, model: Optional[str] = None) -> None:
+        key = self.prompt_hash(prompt)
+        signature = minhash(shingles(normalize_prompt(prompt)))
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO cover_cache (prompt_hash, cover_hash, model, signature, created_at, last_used) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (key, cover_hash, model, array('Q', signature).tobytes(), now, now)
+                )
+                conn.execute('DELETE FROM cover_cache_band WHERE prompt_hash = ?', (key,))
+                conn.executemany(
+                    'INSERT OR IGNORE INTO cover_cache_band (band_key, prompt_hash) VALUES (?, ?)',
+                    [(band, key) for band in _band_keys(signature)]
+                )
+                self._evict(conn)
+        except sqlite3.Error as e:
+            print(f"⚠️  Cover cache write failed: {e}")
+
+    def forget(self, prompt_hash: str) -> None:
+        """Drop the entry a lookup matched (its 'promptHash'), e.g. when its cover blob has gone missing"""
+        try:
+            with self._connect() as conn:
+                conn.execute('DELETE FROM cover_cache WHERE prompt_hash = ?', (prompt_hash,))
+                conn.execute('DELETE FROM cover_cache_band WHERE prompt_hash = ?', (prompt_hash,))
+        except sqlite3.Error as e:
+            print(f"⚠️  Cover cache write failed: {e}")
+
+    def _evict(self, conn) -> None:
+        """Keep only the `max_entries` most recently used prompts (cover blobs stay in the store)"""
+        excess = conn.execute('SELECT COUNT(*) FROM cover_cache').fetchone()[0] - self.max_entries
+        if excess <= 0:
+            return
+        stale = [row[0] for row in conn.execute(
+            'SELECT prompt_hash FROM cover_cache ORDER BY last_used LIMIT ?', (excess,)
+        )]
+        conn.executemany('DELETE FROM cover_cache WHERE prompt_hash = ?', [(h,) for h in stale])
+        conn.executemany('DELETE FROM cover_cache_band WHERE prompt_hash = ?', [(h,) for h in stale])
+        self._count('evictions', len(stale))
+
+    def _count(self, stat: str, amount: int = 1) -> None:
+        with self._lock:
+            self.stats[stat] += amount
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+        try:
+            with self._connect() as conn:
+                stats['entries'] = conn.execute('SELECT COUNT(*) FROM cover_cache').fetchone()[0]
+        except sqlite3.Error:
+            stats['entries'] = None
+        stats['max_entries'] = self.max_entries
+        stats['min_similarity'] = self.min_similarity
+        return stats
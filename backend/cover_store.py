@@ -0,0 +1,133 @@
+"""
+Cover Image Blob Store
+Content-addressed filesystem storage for story cover images, keyed by SHA-256
+"""
+
+import os
+import re
+import base64
+import hashlib
+import tempfile
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+HASH_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+DATA_URI_PATTERN = re.compile(r'^data:(?P<mime>[\w/+.-]+)?(?:;[\w=-]+)*;base64,(?P<data>.*)$', re.DOTALL)
+COVER_URL_PATTERN = re.compile(r'/api/covers/(?P<hash>[0-9a-f]{64})(?:[/?#].*)?$')
+
+# Magic-number signatures used to serve the right Content-Type
+_SIGNATURES = [
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+]
+
+
+def sniff_mimetype(data: bytes) -> str:
+    """Detect the image type from its leading bytes"""
+    for signature, mimetype in _SIGNATURES:
+        if data.startswith(signature):
+            return mimetype
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    if data[4:12] in (b'ftypavif', b'ftypavis'):
+        return 'image/avif'
+    return 'application/octet-stream'
+
+
+class CoverStore:
+    """
+    Stores cover images on disk under <root>/<hash[:2]>/<hash>; resized
+    variants of a cover live next to it as <hash>.<size>
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        default_root = Path(__file__).parent / 'instance' / 'covers'
+        self.root = Path(root or os.getenv('COVER_STORAGE_DIR', default_root))
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, cover_hash: str, size: Optional[int] = None) -> Path:
+        name = f'{cover_hash}.{size}' if size else cover_hash
+        return self.root / cover_hash[:2] / name
+
+    def exists(self, cover_hash: str) -> bool:
+        return bool(HASH_PATTERN.match(cover_hash or '')) and self.path_for(cover_hash).is_file()
+
+    def put(self, data: bytes) -> str:
+        """Store image bytes and return their SHA-256 hex digest"""
+        cover_hash = hashlib.sha256(data).hexdigest()
+        path = self.path_for(cover_hash)
+        if not path.is_file():
+            self._write(path, data)
+        return cover_hash
+
+    def put_variant(self, cover_hash: str, size: int, data: bytes) -> None:
+        """Store a resized rendition of an existing cover"""
+        self._write(self.path_for(cover_hash, size), data)
+
+    def _write(self, path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temp file and rename so readers never see a partial blob
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def variant_sizes(self, cover_hash: str, sizes: Iterable[int]) -> List[int]:
+        """Which of `sizes` have a stored thumbnail for this cover"""
+        return [size for size in sizes if self.path_for(cover_hash, size).is_file()]
+
+    def get(self, cover_hash: str, size: Optional[int] = None) -> Optional[Tuple[bytes, str]]:
+        """
+        Return (bytes, mimetype) for a stored cover, or None. With `size`, the
+        thumbnail of that size if one was generated, else the original.
+        """
+        if not self.exists(cover_hash):
+            return None
+        path = self.path_for(cover_hash, size) if size else None
+        if path is None or not path.is_file():
+            path = self.path_for(cover_hash)
+        data = path.read_bytes()
+        return data, sniff_mimetype(data)
+
+    def ingest(self, value: Optional[str]) -> Optional[str]:
+        """
+        Accept whatever the client sends as `coverImage` and return a hash.
+        Handles base64 data-URIs, existing /api/covers/<hash> URLs and bare hashes.
+        """
+        if not value:
+            return None
+
+        if HASH_PATTERN.match(value):
+            return value if self.exists(value) else None
+
+        url_match = COVER_URL_PATTERN.search(value)
+        if url_match:
+            cover_hash = url_match.group('hash')
+            return cover_hash if self.exists(cover_hash) else None
+
+        data_match = DATA_URI_PATTERN.match(value)
+        if data_match:
+            try:
+                data = base64.b64decode(data_match.group('data'), validate=False)
+            except (ValueError, TypeError):
+                return None
+            return self.put(data) if data else None
+
+        return None
+
+
+def cover_url(cover_hash: Optional[str], size: Optional[int] = None) -> Optional[str]:
+    """Public URL for a stored cover (absolute when inside a request)"""
+    if not cover_hash:
+        return None
+    from flask import has_request_context, url_for
+    if has_request_context():
+        return url_for('get_cover', cover_hash=cover_hash, size=size, _external=True)
+    return f'/api/covers/{cover_hash}' + (f'?size={size}' if size else '')
@@ -0,0 +1,82 @@
+"""
+Database Engine Setup
+The database URL comes from DATABASE_URL (SQLite by default, PostgreSQL in
+production). SQLite connections run in WAL mode with synchronous=NORMAL and a
+busy timeout, so concurrent writers from several gunicorn workers wait for the
+write lock instead of failing with "database is locked". PostgreSQL gets a
+bounded, pre-pinged connection pool.
+"""
+
+import os
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from fast_json import dumps_text, loads
+from models import db
+
+DEFAULT_DATABASE_URL = 'sqlite:///storyloom.db'  # relative paths live in backend/instance/
+
+SQLITE_BUSY_TIMEOUT = int(os.getenv('SQLITE_BUSY_TIMEOUT', 10000))  # milliseconds
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+
+# Per process; with gunicorn the server-side total is workers * (size + overflow)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))  # below typical server/proxy idle cutoffs
+
+
+def database_url(url: Optional[str] = None) -> str:
+    """Configured URL; Heroku/Render-style postgres:// URLs are accepted too"""
+    url = url or os.getenv('DATABASE_URL') or DEFAULT_DATABASE_URL
+    # Pin the driver from requirements.txt (psycopg 3) rather than SQLAlchemy's version-dependent default
+    for prefix in ('postgres://', 'postgresql://'):
+        if url.startswith(prefix):
+            url = 'postgresql+psycopg://' + url[len(prefix):]
+    return url
+
+
+def engine_options(url: str, tune: bool = True) -> Dict[str, Any]:
+    """create_engine() keyword arguments for `url`"""
+    # Story quiz / flashcard JSON columns go through the same fast encoder as responses
+    options: Dict[str, Any] = {'json_serializer': dumps_text, 'json_deserializer': loads}
+    if not tune:
+        return options
+
+    # SQLite file databases already get a thread-shared QueuePool; pragmas are set per connection
+    if make_url(url).get_backend_name() == 'postgresql':
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=True,  # drops connections the server closed while idle
+        )
+    return options
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        # WAL lets readers proceed while one writer commits; it is a property of the
+        # database file, NORMAL sync is safe with it (a power cut can only lose the last commits)
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute(f'PRAGMA synchronous={SQLITE_SYNCHRONOUS}')
+        cursor.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT}')
+    finally:
+        cursor.close()
+
+
+def init_database(app, url: Optional[str] = None, tune: bool = True) -> None:
+    """Configure `app` for the database and bind the shared `db` to it"""
+    url = database_url(url)
+    app.config['SQLALCHEMY_DATABASE_URI'] = url
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(url, tune)
+    db.init_app(app)
+
+    with app.app_context():
+        engine = db.engine
+        if tune and engine.dialect.name == 'sqlite' and engine.url.database not in (None, '', ':memory:'):
+            event.listen(engine, 'connect', _set_sqlite_pragmas)
@@ -0,0 +1,60 @@
+"""
+Fast JSON Serialization
+Flask JSON provider backed by orjson when it is installed, falling back to the
+standard library encoder. Output stays compatible with jsonify (datetimes are
+still HTTP dates), but responses are built straight from bytes.
+"""
+
+import json
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+# Datetimes go through Flask's default hook so the format matches jsonify's
+_ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson else 0
+
+
+def dumps_bytes(obj: Any, default=None) -> bytes:
+    """Compact UTF-8 JSON"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=default, option=_ORJSON_OPTIONS)
+    return json.dumps(obj, default=default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def dumps_text(obj: Any) -> str:
+    """Compact JSON text, e.g. for the database's JSON columns"""
+    return dumps_bytes(obj).decode('utf-8')
+
+
+def loads(s) -> Any:
+    if orjson is not None:
+        return orjson.loads(s)
+    return json.loads(s)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """jsonify / request.json via orjson; keys keep insertion order instead of being sorted"""
+
+    sort_keys = False
+    ensure_ascii = False
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps_bytes(obj, default=self.default).decode('utf-8')
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        if orjson is None or (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj, default=self.default) + b'\n', mimetype=self.mimetype)
@@ -0,0 +1,55 @@
+"""
+Precomputed HTTP Responses
+JSON bodies that never change while the process runs (themes, age groups,
+languages) are serialized and compressed once, and served with strong ETags
+so clients can revalidate with a 304 instead of downloading them again.
+"""
+
+import gzip
+import hashlib
+from typing import Any
+
+from flask import Response
+
+from fast_json import dumps_bytes
+
+
+class PrecomputedJSON:
+    """One JSON document, pre-serialized and pre-gzipped, with an ETag per encoding"""
+
+    def __init__(self, payload: Any, max_age: int = 3600):
+        # Same serializer as FastJSONProvider, so the body matches jsonify's (insertion order, UTF-8)
+        self.body = dumps_bytes(payload)
+        self.gzipped = gzip.compress(self.body, compresslevel=9, mtime=0)
+        digest = hashlib.sha256(self.body).hexdigest()[:32]
+        # Strong ETags must differ between representations
+        self.etag = digest
+        self.gzip_etag = f'{digest}-gzip'
+        self.max_age = max_age
+
+    def response(self, request) -> Response:
+        use_gzip = request.accept_encodings['gzip'] > 0 and len(self.gzipped) < len(self.body)
+        etag = self.gzip_etag if use_gzip else self.etag
+
+        if self._revalidates(request.if_none_match):
+            response = Response(status=304)
+        else:
+            response = Response(self.gzipped if use_gzip else self.body, mimetype='application/json')
+            if use_gzip:
+                response.headers['Content-Encoding'] = 'gzip'
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = self.max_age
+        response.vary.add('Accept-Encoding')
+        return response
+
+    def _revalidates(self, if_none_match) -> bool:
+        """
+        Whether the client already has some encoding of this document. Besides the
+        identity and gzip tags, compress_response may have tagged a br/zstd copy of
+        the identity body as '<digest>-<encoding>'; the digest is hex, so the part
+        before any '-' names the document.
+        """
+        if if_none_match.star_tag:
+            return True
+        return any(tag.split('-', 1)[0] == self.etag for tag in if_none_match.as_set(include_weak=True))
@@ -0,0 +1,140 @@
+"""
+Pooled HTTP Client
+One shared, connection-pooled requests session for every outbound call
+(AI providers, image generation, translation) so TCP/TLS connections are
+kept alive and reused instead of being opened per request
+"""
+
+import os
+import threading
+from typing import Any, Dict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 5))
+READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 60))
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _build_session() -> requests.Session:
+    pool_size = int(os.getenv('HTTP_POOL_SIZE', 20))
+    retry = Retry(
+        total=int(os.getenv('HTTP_CONNECT_RETRIES', 3)),
+        connect=int(os.getenv('HTTP_CONNECT_RETRIES', 3)),
+        # Only connection failures are retried: the request never reached the
+        # server, so even POSTs are safe. Read errors and HTTP statuses are left
+        # to the provider fallback logic.
+        read=0,
+        status=0,
+        other=0,
+        allowed_methods=None,
+        backoff_factor=float(os.getenv('HTTP_RETRY_BACKOFF', 0.5)),
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(
+        pool_connections=int(os.getenv('HTTP_POOL_HOSTS', 10)),
+        pool_maxsize=pool_size,
+        max_retries=retry,
+        pool_block=False
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers['Connection'] = 'keep-alive'
+    return session
+
+
+def get_session() -> requests.Session:
+    """
+    The process-wide session. The underlying urllib3 pools are thread-safe;
+    nothing here relies on the session's cookie jar, which is the only part
+    of requests.Session that is not.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def request(method: str, url: str, read_timeout: float = None, **kwargs) -> requests.Response:
+    """session.request with separate connect/read timeouts unless `timeout` is given"""
+    kwargs.setdefault('timeout', (CONNECT_TIMEOUT, read_timeout or READ_TIMEOUT))
+    return get_session().request(method, url, **kwargs)
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request('GET', url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request('POST', url, **kwargs)
+
+
+def get_stats() -> Dict[str, Any]:
+    """Connection reuse counters summed over all host pools"""
+    session = get_session()
+    requests_sent = 0
+    connections_opened = 0
+    hosts = 0
+    for adapter in set(session.adapters.values()):
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            hosts += 1
+            requests_sent += pool.num_requests
+            connections_opened += pool.num_connections
+    return {
+        'hosts': hosts,
+        'requests': requests_sent,
+        'connections_opened': connections_opened,
+        'connections_reused': max(0, requests_sent - connections_opened),
+        'connect_timeout': CONNECT_TIMEOUT,
+        'read_timeout': READ_TIMEOUT
+    }
+
+
+class _PooledRequestsModule:
+    """Stand-in for the `requests` module inside libraries that call requests.get directly"""
+
+    @staticmethod
+    def get(url, **kwargs):
+        return get(url, **kwargs)
+
+    @staticmethod
+    def post(url, **kwargs):
+        return post(url, **kwargs)
+
+    def __getattr__(self, name):
+        # Everything else (exceptions, Session, ...) is the real module's
+        return getattr(requests, name)
+
+
+_translator_session_lock = threading.Lock()
+
+
+def install_translator_session() -> bool:
+    """
+    deep-translator's GoogleTranslator calls the module-level requests.get with no
+    timeout and no way to pass a session; point it at the shared pool instead.
+    Only done when deep_translator.google really uses `requests` that way, since
+    it is not a public hook; returns whether the pool is in use.
+    """
+    import deep_translator.google
+    with _translator_session_lock:
+        current = getattr(deep_translator.google, 'requests', None)
+        if isinstance(current, _PooledRequestsModule):
+            return True
+        if current is not requests:
+            print("⚠️  deep_translator.google has no module-level requests; "
+                  "Google translations will not use the pooled session")
+            return False
+        deep_translator.google.requests = _PooledRequestsModule()
+        return True
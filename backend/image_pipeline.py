@@ -0,0 +1,93 @@
+"""
+Cover Image Pipeline
+Detects the real format of generated images and re-encodes them into a
+size-capped master plus thumbnails. Encoding runs in a process pool so the
+CPU-bound work does not hold the GIL in web workers.
+"""
+
+import io
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Tuple
+
+from PIL import Image, UnidentifiedImageError, features
+
+MASTER_MAX_SIZE = int(os.getenv('COVER_MAX_SIZE', 768))
+THUMBNAIL_SIZES = (128, 256, 512)
+QUALITY = int(os.getenv('COVER_QUALITY', 80))
+# AVIF is used only when asked for and Pillow was built with libavif
+OUTPUT_FORMAT = 'AVIF' if os.getenv('COVER_FORMAT', 'webp').lower() == 'avif' and features.check('avif') else 'WEBP'
+OUTPUT_MIMETYPE = f'image/{OUTPUT_FORMAT.lower()}'
+
+# Refuse absurd images before decoding them (decompression bombs)
+MAX_PIXELS = int(os.getenv('COVER_MAX_PIXELS', 40_000_000))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class ImageTooLargeError(Exception):
+    """The image's header declares more than MAX_PIXELS pixels"""
+    pass
+
+
+def _encode(image: Image.Image, max_size: int) -> Tuple[bytes, Tuple[int, int]]:
+    """Encode a copy of `image` fitted into max_size; returns the bytes and the encoded size"""
+    copy = image.copy()
+    copy.thumbnail((max_size, max_size), Image.LANCZOS)
+    buffer = io.BytesIO()
+    options = {'quality': QUALITY}
+    if OUTPUT_FORMAT == 'WEBP':
+        options['method'] = 4
+    copy.save(buffer, format=OUTPUT_FORMAT, **options)
+    return buffer.getvalue(), copy.size
+
+
+def process_cover(data: bytes) -> Dict[str, Any]:
+    """
+    Decode `data`, whatever format it really is, and return
+    {'sourceFormat', 'width', 'height', 'master', 'thumbnails': {size: bytes}},
+    where width and height are the stored master's.
+    Runs inside the process pool, so it must only touch its arguments.
+    """
+    try:
+        opened = Image.open(io.BytesIO(data))
+    except Image.DecompressionBombError as e:
+        raise ImageTooLargeError(str(e)) from None
+    with opened as image:
+        source_format = image.format
+        # The size comes from the header; check it before any pixels are decoded
+        width, height = image.size
+        if width * height > MAX_PIXELS:
+            raise ImageTooLargeError(f'{width}x{height} image exceeds {MAX_PIXELS} pixels')
+        image.load()
+        # WebP/AVIF have no palette or CMYK modes worth keeping for covers
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+        master, (master_width, master_height) = _encode(image, MASTER_MAX_SIZE)
+        return {
+            'sourceFormat': source_format,
+            'width': master_width,
+            'height': master_height,
+            'master': master,
+            'thumbnails': {size: _encode(image, size)[0] for size in THUMBNAIL_SIZES if size < max(width, height)}
+        }
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Lazily created pool; spawn (not fork) because web workers are multi-threaded"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(
+                    max_workers=int(os.getenv('IMAGE_WORKERS', 2)),
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+    return _pool
+
+
+def process_cover_in_pool(data: bytes, timeout: float = 30) -> Dict[str, Any]:
+    return get_pool().submit(process_cover, data).result(timeout=timeout)
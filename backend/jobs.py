@@ -0,0 +1,192 @@
+"""
+Background Job Queue
+SQLite-backed queue (the `job` table) drained by a local pool of worker
+threads, so slow generation work runs outside the web request. Several
+processes can share one database: jobs are claimed with a conditional UPDATE.
+Workers start with the app, so jobs left queued by a restart are picked up
+without waiting for a new enqueue. JOB_WORKERS=0 turns them off, which the CLI
+scripts that import the app do so they never claim (and strand) a job.
+"""
+
+import os
+import json
+import uuid
+import socket
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import update
+from models import db, Job
+
+
+class JobContext:
+    """Handed to job handlers: the job input plus a way to publish partial results"""
+
+    def __init__(self, job_id: str, params: Dict[str, Any], user_id: Optional[int] = None):
+        self.job_id = job_id
+        self.params = params
+        self.user_id = user_id
+        self.result: Dict[str, Any] = {}
+        self.progress = 0
+
+    def update(self, progress: Optional[int] = None, **partial) -> None:
+        """Merge partial results into the job row so pollers see them right away"""
+        self.result.update(partial)
+        if progress is not None:
+            self.progress = progress
+        db.session.execute(
+            update(Job).where(Job.id == self.job_id).values(
+                result=json.dumps(self.result),
+                progress=self.progress,
+                updated_at=datetime.utcnow()
+            )
+        )
+        db.session.commit()
+
+
+class JobQueue:
+    """Registry of job handlers plus the worker threads that run them"""
+
+    def __init__(self, app=None, workers: Optional[int] = None, poll_interval: Optional[float] = None,
+                 stale_after: Optional[int] = None):
+        self.workers = workers if workers is not None else int(os.getenv('JOB_WORKERS', 2))
+        self.poll_interval = poll_interval or float(os.getenv('JOB_POLL_INTERVAL', 1.0))
+        # A running job not updated for this long is assumed lost with its process
+        self.stale_after = timedelta(seconds=stale_after or int(os.getenv('JOB_STALE_AFTER', 600)))
+        # The stale sweep is a write, so it runs on its own, slower schedule shared by all threads
+        self.sweep_interval = self.stale_after / 10
+        self._next_sweep = datetime.min
+        self._sweep_lock = threading.Lock()
+        self.handlers: Dict[str, Callable[[JobContext], None]] = {}
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._wakeup = threading.Event()
+        self._started = False
+        self._start_lock = threading.Lock()
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        self.app = app
+        self.start()
+        # Threads don't survive fork (e.g. gunicorn --preload), so each child starts its own
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._restart_after_fork)
+
+    def _restart_after_fork(self) -> None:
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._wakeup = threading.Event()
+        self._start_lock = threading.Lock()
+        self._sweep_lock = threading.Lock()
+        self._started = False
+        self.start()
+
+    def register(self, kind: str, handler: Callable[[JobContext], None]) -> None:
+        self.handlers[kind] = handler
+
+    def enqueue(self, kind: str, user_id: int, params: Dict[str, Any]) -> Job:
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job = Job(
+            id=uuid.uuid4().hex,
+            kind=kind,
+            status='queued',
+            progress=0,
+            params=json.dumps(params),
+            result=json.dumps({}),
+            user_id=user_id
+        )
+        db.session.add(job)
+        db.session.commit()
+        self.start()
+        self._wakeup.set()
+        return job
+
+    def start(self) -> None:
+        """Start the worker threads once per process; a no-op with zero workers"""
+        if self._started or self.workers <= 0:
+            return
+        with self._start_lock:
+            if self._started:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker_loop, name=f'job-worker-{i}', daemon=True)
+                thread.start()
+            self._started = True
+            print(f"🧵 Job workers started ({self.workers} threads)")
+
+    def _worker_loop(self) -> None:
+        while True:
+            try:
+                with self.app.app_context():
+                    job_id = self._claim_next()
+                    if job_id:
+                        self._run(job_id)
+                    db.session.remove()
+                if job_id:
+                    continue
+            except Exception as e:
+                print(f"❌ Job worker error: {e}")
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _sweep_stale(self, now: datetime) -> None:
+        """Requeue running jobs whose process went away; at most once per sweep_interval"""
+        with self._sweep_lock:
+            if now < self._next_sweep:
+                return
+            self._next_sweep = now + self.sweep_interval
+        stale = (Job.status == 'running', Job.updated_at < now - self.stale_after)
+        # Read first: the write (and SQLite's write lock) is only taken when there is something to requeue
+        if db.session.query(Job.id).filter(*stale).limit(1).scalar() is None:
+            return
+        db.session.execute(update(Job).where(*stale).values(status='queued', worker=None))
+        db.session.commit()
+
+    def _claim_next(self) -> Optional[str]:
+        now = datetime.utcnow()
+        self._sweep_stale(now)
+
+        # Workers start before handlers are registered; leave unknown kinds for a process that has them
+        candidate = db.session.query(Job.id) \
+            .filter(Job.status == 'queued', Job.kind.in_(list(self.handlers))) \
+            .order_by(Job.created_at).limit(1).scalar()
+        if not candidate:
+            return None
+
+        # Only one worker (in any process) wins the conditional update
+        claimed = db.session.execute(
+            update(Job)
+            .where(Job.id == candidate, Job.status == 'queued')
+            .values(status='running', worker=self.worker_id, updated_at=now)
+        ).rowcount
+        db.session.commit()
+        return candidate if claimed == 1 else None
+
+    def _run(self, job_id: str) -> None:
+        job = db.session.get(Job, job_id)
+        ctx = JobContext(job_id, json.loads(job.params or '{}'), job.user_id)
+        ctx.result = json.loads(job.result or '{}')
+        handler = self.handlers.get(job.kind)
+        print(f"⚙️  Running job {job_id} ({job.kind})")
+        try:
+            if handler is None:
+                raise ValueError(f"No handler registered for job kind: {job.kind}")
+            handler(ctx)
+            status, error = 'done', None
+            print(f"✅ Job {job_id} done")
+        except Exception as e:
+            db.session.rollback()
+            status, error = 'failed', str(e)
+            print(f"❌ Job {job_id} failed: {e}")
+        db.session.execute(
+            update(Job).where(Job.id == job_id).values(
+                status=status,
+                error=error,
+                progress=100 if status == 'done' else ctx.progress,
+                result=json.dumps(ctx.result),
+                updated_at=datetime.utcnow()
+            )
+        )
+        db.session.commit()
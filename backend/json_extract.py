@@ -0,0 +1,182 @@
+"""
+JSON Extraction From Model Output
+Finds the JSON object in a model response (code fences, prose before or after,
+several objects) without regex backtracking, and repairs the usual generation
+defects: trailing commas, smart quotes, unescaped quotes and truncated output.
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+_decoder = json.JSONDecoder(strict=False)  # strict=False: literal newlines inside strings
+
+_SMART_OPEN = '“„'      # “ „
+_SMART_CLOSE = '”“'     # ” (and “ used as a closer)
+_SMART = _SMART_OPEN + _SMART_CLOSE
+_WHITESPACE = ' \t\r\n'
+_CLOSERS = {'{': '}', '[': ']'}
+
+
+def extract_json(text: str, repair: bool = True) -> Dict[str, Any]:
+    """
+    Return the first JSON object in `text`. Each top-level '{' is tried with the
+    C decoder first; only when that fails is the repairing scanner run over it.
+    Raises json.JSONDecodeError when nothing can be recovered.
+    """
+    return extract_json_report(text, repair)[0]
+
+
+def extract_json_report(text: str, repair: bool = True) -> Tuple[Dict[str, Any], bool]:
+    """Like extract_json(), also saying whether the object had to be repaired"""
+    start = text.find('{')
+    while start != -1:
+        try:
+            value, _ = _decoder.raw_decode(text, start)
+            if isinstance(value, dict):
+                return value, False
+        except json.JSONDecodeError:
+            pass
+
+        end = len(text)
+        if repair:
+            repaired, end = repair_json(text, start)
+            if repaired is not None:
+                try:
+                    value = _decoder.decode(repaired)
+                    if isinstance(value, dict):
+                        return value, True
+                except json.JSONDecodeError:
+                    pass
+        else:
+            end = _span_end(text, start)
+
+        # Not recoverable: skip this whole {...} span (never retry its inner objects)
+        start = text.find('{', max(end, start + 1))
+
+    raise json.JSONDecodeError('No JSON object found in model output', text, 0)
+
+
+def _span_end(text: str, start: int) -> int:
+    """Index just past the balanced {...} starting at `start` (len(text) if unbalanced)"""
+    depth = 0
+    in_string = escape = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in '{[':
+            depth += 1
+        elif ch in '}]':
+            depth -= 1
+            if depth == 0:
+                return i + 1
+    return len(text)
+
+
+def _next_significant(text: str, i: int) -> str:
+    n = len(text)
+    while i < n and text[i] in _WHITESPACE:
+        i += 1
+    return text[i] if i < n else ''
+
+
+def repair_json(text: str, start: int = 0) -> Tuple[Optional[str], int]:
+    """
+    Single pass over the value starting at text[start] producing repaired JSON
+    text. Returns (repaired, end index); repaired is None if there was no
+    usable content.
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    # (len(out), stack) just before each separator comma: the last complete element
+    safe_point: Optional[Tuple[int, Tuple[str, ...]]] = None
+    in_string = escape = False
+    smart_string = False
+    n = len(text)
+    i = start
+
+    while i < n:
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+                out.append(ch)
+            elif ch == '\\':
+                escape = True
+                out.append(ch)
+            elif (ch == '"' and not smart_string) or (smart_string and ch in _SMART_CLOSE):
+                if _next_significant(text, i + 1) in (',', ':', '}', ']', ''):
+                    in_string = False
+                    out.append('"')
+                else:
+                    # A quote inside the text, not the end of the string
+                    out.append('\\"' if ch == '"' else ch)
+            elif ch == '"':
+                out.append('\\"')
+            elif ch == '\n':
+                out.append('\\n')
+            elif ch == '\r':
+                pass
+            elif ch == '\t':
+                out.append('\\t')
+            else:
+                out.append(ch)
+        elif ch == '"' or ch in _SMART:
+            in_string = True
+            smart_string = ch != '"'
+            out.append('"')
+        elif ch in _CLOSERS:
+            stack.append(_CLOSERS[ch])
+            out.append(ch)
+        elif ch in '}]':
+            _drop_trailing_comma(out)
+            if stack:
+                out.append(stack.pop())
+            if not stack:
+                return ''.join(out), i + 1
+        elif ch == ',':
+            safe_point = (len(out), tuple(stack))
+            out.append(ch)
+        else:
+            out.append(ch)
+        i += 1
+
+    # Truncated output: close what is open, backing off to the last complete element if needed
+    if escape:
+        out.pop()
+    if in_string:
+        out.append('"')
+    closed = _close(out, stack)
+    try:
+        _decoder.decode(closed)
+        return closed, n
+    except json.JSONDecodeError:
+        pass
+    if safe_point is None:
+        return None, n
+    length, safe_stack = safe_point
+    return _close(out[:length], list(safe_stack)), n
+
+
+def _drop_trailing_comma(out: List[str]) -> None:
+    j = len(out) - 1
+    while j >= 0 and out[j] in _WHITESPACE:
+        j -= 1
+    if j >= 0 and out[j] == ',':
+        del out[j]
+
+
+def _close(out: List[str], stack: List[str]) -> str:
+    out = list(out)
+    _drop_trailing_comma(out)
+    text = ''.join(out).rstrip()
+    if text.endswith(':'):
+        text += ' null'
+    return text + ''.join(reversed(stack))
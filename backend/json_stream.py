@@ -0,0 +1,215 @@
+"""
+Incremental JSON Object Parser
+Parses a flat JSON object out of a streamed model response chunk by chunk,
+emitting fields as soon as they are complete instead of waiting for the
+whole document like json_extract.extract_json
+"""
+
+import json
+from typing import Any, Dict, List, Tuple
+
+# Parser states
+_SEEK_OBJECT = 0    # skipping prose / code fences before the opening brace
+_SEEK_KEY = 1       # inside the object, waiting for a key or the closing brace
+_IN_KEY = 2
+_SEEK_COLON = 3
+_SEEK_VALUE = 4
+_IN_STRING = 5      # string value, decoded incrementally
+_IN_RAW = 6         # number / literal / nested array or object, kept raw
+_DONE = 7
+_OPENED = 8         # just past a '{', not yet known to start the document
+
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+class IncrementalJSONParser:
+    """
+    Feed text chunks with feed(); each call returns the events completed so far.
+
+    Events are tuples:
+      ('field', key, value)          - a top-level field finished
+      ('paragraph', key, index, text) - a paragraph of a streamed string field
+                                        finished (fields listed in paragraph_fields)
+
+    Unescaped newlines inside strings are tolerated, since models emit them.
+    """
+
+    def __init__(self, paragraph_fields=('content',), paragraph_separator='\n\n'):
+        self.paragraph_fields = set(paragraph_fields)
+        self.paragraph_separator = paragraph_separator
+        self.result: Dict[str, Any] = {}
+        self._state = _SEEK_OBJECT
+        self._key: List[str] = []
+        self._current_key = None
+        self._value: List[str] = []
+        self._paragraph_start = 0
+        self._paragraph_index = 0
+        self._escape = None         # None, '' after a backslash, or collected \u hex digits
+        self._high_surrogate = None
+        self._raw_depth = 0
+        self._raw_in_string = False
+        self._raw_escape = False
+
+    @property
+    def done(self) -> bool:
+        return self._state == _DONE
+
+    def feed(self, chunk: str) -> List[Tuple]:
+        events: List[Tuple] = []
+        for ch in chunk:
+            if self._state == _DONE:
+                break
+            self._step(ch, events)
+        return events
+
+    def close(self) -> List[Tuple]:
+        """Flush whatever is pending when the stream ends early (truncated output)"""
+        events: List[Tuple] = []
+        if self._state == _IN_STRING:
+            self._finish_string(events)
+        elif self._state == _IN_RAW:
+            self._finish_raw(events)
+        self._state = _DONE
+        return events
+
+    def _step(self, ch: str, events: List[Tuple]) -> None:
+        state = self._state
+        if state == _SEEK_OBJECT:
+            if ch == '{':
+                self._state = _OPENED
+        elif state == _OPENED:
+            # Prose like "{as requested}" is not the document: only '"' or '}' commits to the object
+            if ch == '"':
+                self._key = []
+                self._state = _IN_KEY
+            elif ch == '}':
+                self._state = _DONE
+            elif not ch.isspace():
+                self._state = _SEEK_OBJECT
+                self._step(ch, events)
+        elif state == _SEEK_KEY:
+            if ch == '"':
+                self._key = []
+                self._state = _IN_KEY
+            elif ch == '}':
+                self._state = _DONE
+        elif state == _IN_KEY:
+            if self._escape is not None:
+                self._key.append(_ESCAPES.get(ch, ch))
+                self._escape = None
+            elif ch == '\\':
+                self._escape = ''
+            elif ch == '"':
+                self._current_key = ''.join(self._key)
+                self._state = _SEEK_COLON
+            else:
+                self._key.append(ch)
+        elif state == _SEEK_COLON:
+            if ch == ':':
+                self._state = _SEEK_VALUE
+        elif state == _SEEK_VALUE:
+            if ch == '"':
+                self._value = []
+                self._paragraph_start = 0
+                self._paragraph_index = 0
+                self._state = _IN_STRING
+            elif not ch.isspace():
+                self._value = [ch]
+                self._raw_depth = 1 if ch in '[{' else 0
+                self._raw_in_string = False
+                self._raw_escape = False
+                self._state = _IN_RAW
+        elif state == _IN_STRING:
+            self._step_string(ch, events)
+        elif state == _IN_RAW:
+            self._step_raw(ch, events)
+
+    def _step_string(self, ch: str, events: List[Tuple]) -> None:
+        if self._escape is not None:
+            if self._escape == '' and ch != 'u':
+                self._append(_ESCAPES.get(ch, ch), events)
+                self._escape = None
+            elif self._escape == '' and ch == 'u':
+                self._escape = 'u'
+            else:
+                self._escape += ch
+                if len(self._escape) == 5:
+                    self._append_codepoint(int(self._escape[1:], 16), events)
+                    self._escape = None
+            return
+        if ch == '\\':
+            self._escape = ''
+        elif ch == '"':
+            self._finish_string(events)
+            self._state = _SEEK_KEY
+        else:
+            self._append(ch, events)
+
+    def _append_codepoint(self, codepoint: int, events: List[Tuple]) -> None:
+        if 0xD800 <= codepoint <= 0xDBFF:
+            self._high_surrogate = codepoint
+            return
+        if 0xDC00 <= codepoint <= 0xDFFF and self._high_surrogate is not None:
+            codepoint = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (codepoint - 0xDC00)
+        self._high_surrogate = None
+        self._append(chr(codepoint), events)
+
+    def _append(self, text: str, events: List[Tuple]) -> None:
+        self._value.append(text)
+        if self._current_key not in self.paragraph_fields:
+            return
+        # Only the tail can complete a separator, so check just that
+        sep = self.paragraph_separator
+        tail = ''.join(self._value[-len(sep):])
+        if tail == sep:
+            paragraph = ''.join(self._value[self._paragraph_start:-len(sep)])
+            self._paragraph_start = len(self._value)
+            self._emit_paragraph(paragraph, events)
+
+    def _emit_paragraph(self, paragraph: str, events: List[Tuple]) -> None:
+        paragraph = paragraph.strip()
+        if paragraph:
+            events.append(('paragraph', self._current_key, self._paragraph_index, paragraph))
+            self._paragraph_index += 1
+
+    def _finish_string(self, events: List[Tuple]) -> None:
+        value = ''.join(self._value)
+        if self._current_key in self.paragraph_fields:
+            self._emit_paragraph(''.join(self._value[self._paragraph_start:]), events)
+        self.result[self._current_key] = value
+        events.append(('field', self._current_key, value))
+
+    def _step_raw(self, ch: str, events: List[Tuple]) -> None:
+        if self._raw_in_string:
+            self._value.append(ch)
+            if self._raw_escape:
+                self._raw_escape = False
+            elif ch == '\\':
+                self._raw_escape = True
+            elif ch == '"':
+                self._raw_in_string = False
+            return
+        if self._raw_depth == 0 and (ch in ',}' or ch.isspace()):
+            self._finish_raw(events)
+            self._state = _DONE if ch == '}' else _SEEK_KEY
+            return
+        self._value.append(ch)
+        if ch == '"':
+            self._raw_in_string = True
+        elif ch in '[{':
+            self._raw_depth += 1
+        elif ch in ']}':
+            self._raw_depth -= 1
+            if self._raw_depth == 0:
+                self._finish_raw(events)
+                self._state = _SEEK_KEY
+
+    def _finish_raw(self, events: List[Tuple]) -> None:
+        raw = ''.join(self._value)
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            value = raw
+        self.result[self._current_key] = value
+        events.append(('field', self._current_key, value))
+
@@ -1,33 +1,274 @@
 """
-Database migration script to add new columns for activity tracking.
-Run this script if you're upgrading from an older version.
+Versioned database migrations.
+Run this script after upgrading: it applies every pending migration in order
+and records it in the schema_migrations table, so running it again is a no-op.
+Each migration also checks the live schema before changing it, which keeps
+databases created by db.create_all() (already up to date) safe to migrate.
 """
-from app import app, db
-from models import User
-
-def migrate_database():
-    """Add new columns to existing database"""
-    with app.app_context():
-        try:
-            # Check if migration is needed by trying to query new columns
-            test_user = User.query.first()
-            if test_user:
-                # Try accessing new attributes - if they don't exist, migration is needed
-                _ = test_user.stories_generated
-                _ = test_user.current_streak
-                _ = test_user.longest_streak
-                _ = test_user.last_activity
-                print("✓ Database is already up to date!")
-                return
-        except Exception as e:
-            print(f"Migration needed: {e}")
-            print("Creating new columns...")
-            
-            # SQLAlchemy will handle the migration automatically when you restart the app
-            # Just recreate the tables with the new schema
-            db.create_all()
-            print("✓ Database migration completed!")
-            print("Note: Existing users will have default values for new columns.")
+import os
+import json
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import bindparam, func, inspect, select, text
+# Short-lived script: no job workers, which could claim a job and exit with it
+os.environ['JOB_WORKERS'] = '0'
+from app import app, db, cover_store
+import search
+from models import User, Story, UserStats
+
+
+def column_names(conn, table):
+    return {c['name'] for c in inspect(conn).get_columns(table)}
+
+
+def column_type(conn, table, column):
+    for c in inspect(conn).get_columns(table):
+        if c['name'] == column:
+            return type(c['type']).__name__.upper()
+    return None
+
+
+def add_column(conn, table, column, ddl):
+    """Add a column unless it already exists"""
+    if column not in column_names(conn, table):
+        conn.execute(text(f'ALTER TABLE "{table}" ADD COLUMN {column} {ddl}'))
+
+
+def add_activity_columns(conn):
+    """Usage tracking columns on user"""
+    add_column(conn, 'user', 'stories_generated', 'INTEGER DEFAULT 0')
+    add_column(conn, 'user', 'last_activity', 'TIMESTAMP')
+    add_column(conn, 'user', 'current_streak', 'INTEGER DEFAULT 0')
+    add_column(conn, 'user', 'longest_streak', 'INTEGER DEFAULT 0')
+
+
+def add_cover_hash_column(conn):
+    """Key into the cover blob store"""
+    add_column(conn, 'story', 'cover_hash', 'VARCHAR(64)')
+
+
+def backfill_cover_images(conn, batch_size=50):
+    """Move base64 cover images out of the story table into the cover store"""
+    moved = 0
+    skipped = 0
+    while True:
+        # Blobs are read one batch at a time
+        rows = conn.execute(text(
+            'SELECT id, cover_image FROM story '
+            'WHERE cover_image IS NOT NULL AND cover_hash IS NULL '
+            'ORDER BY id LIMIT :limit'
+        ), {'limit': batch_size}).all()
+        if not rows:
+            break
+
+        for story_id, cover_image in rows:
+            cover_hash = cover_store.ingest(cover_image)
+            if cover_hash:
+                moved += 1
+            else:
+                skipped += 1
+            # Unreadable covers are dropped too so the loop always makes progress
+            conn.execute(
+                text('UPDATE story SET cover_hash = :hash, cover_image = NULL WHERE id = :id'),
+                {'hash': cover_hash, 'id': story_id}
+            )
+
+    print(f"  {moved} covers moved, {skipped} unreadable covers dropped")
+
+
+def add_story_user_created_index(conn):
+    """Composite index for per-user listings and counts"""
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_story_user_id_created_at '
+        'ON story (user_id, created_at DESC)'
+    ))
+
+
+def convert_quiz_columns_to_json(conn):
+    """Story.questions / Story.flashcards hold JSON arrays instead of free text"""
+    if conn.dialect.name == 'sqlite':
+        # SQLite keeps JSON as text: blank or unparsable values become [], the rest
+        # is re-encoded compactly by JSON1
+        for column in ('questions', 'flashcards'):
+            conn.execute(text(
+                f"UPDATE story SET {column} = CASE "
+                f"WHEN {column} IS NULL OR trim({column}) = '' OR NOT json_valid({column}) THEN '[]' "
+                f"ELSE json({column}) END"
+            ))
+    elif conn.dialect.name == 'postgresql':
+        for column in ('questions', 'flashcards'):
+            if column_type(conn, 'story', column) != 'JSON':
+                # Before PostgreSQL 16 there is no IS JSON test: unparsable text is found here
+                blank_invalid_json(conn, column)
+                conn.execute(text(
+                    f"ALTER TABLE story ALTER COLUMN {column} TYPE JSON "
+                    f"USING COALESCE(NULLIF(trim({column}), ''), '[]')::json"
+                ))
+
+
+def blank_invalid_json(conn, column, batch_size=1000):
+    """Set text values of story.<column> that are not valid JSON to '[]'"""
+    last_id = 0
+    while True:
+        rows = conn.execute(text(
+            f'SELECT id, {column} FROM story WHERE id > :last_id ORDER BY id LIMIT :limit'
+        ), {'last_id': last_id, 'limit': batch_size}).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        invalid = []
+        for story_id, value in rows:
+            try:
+                if value and value.strip():
+                    json.loads(value)
+            except ValueError:
+                invalid.append({'id': story_id})
+        if invalid:
+            conn.execute(text(f"UPDATE story SET {column} = '[]' WHERE id = :id"), invalid)
+
+
+def add_quota_columns(conn):
+    """Daily generation quota, separate from the activity counters"""
+    add_column(conn, 'user', 'quota_day', 'DATE')
+    add_column(conn, 'user', 'quota_used', 'INTEGER DEFAULT 0')
+
+
+def backfill_user_stats(conn, batch_size=1000):
+    """Materialized per-user stats, counted from the story table and seeded from the activity columns"""
+    users, stories, stats = User.__table__, Story.__table__, UserStats.__table__
+    existing = {row[0] for row in conn.execute(select(stats.c.user_id))}
+
+    genre_counts, age_group_counts = defaultdict(dict), defaultdict(dict)
+    for column, counts in ((stories.c.genre, genre_counts), (stories.c.age_group, age_group_counts)):
+        for user_id, key, count in conn.execute(
+                select(stories.c.user_id, column, func.count()).group_by(stories.c.user_id, column)):
+            counts[user_id][str(key)] = count
+
+    rows = []
+    now = datetime.utcnow()
+    for user in conn.execute(select(users.c.id, users.c.stories_generated, users.c.current_streak,
+                                    users.c.longest_streak, users.c.last_activity)):
+        if user.id in existing:
+            continue
+        rows.append({
+            'user_id': user.id,
+            'total_saved': sum(genre_counts[user.id].values()),
+            'genre_counts': genre_counts[user.id],
+            'age_group_counts': age_group_counts[user.id],
+            'stories_generated': user.stories_generated or 0,
+            'current_streak': user.current_streak or 0,
+            'longest_streak': user.longest_streak or 0,
+            'last_active_on': user.last_activity.date() if user.last_activity else None,
+            'updated_at': now
+        })
+    for start in range(0, len(rows), batch_size):
+        conn.execute(stats.insert(), rows[start:start + batch_size])
+    print(f"  {len(rows)} users backfilled")
+
+
+def add_story_search(conn):
+    """FTS5 index over story title, genre, flashcard words and text (SQLite only)"""
+    if conn.dialect.name != 'sqlite':
+        print(f"  skipped on {conn.dialect.name}: search uses LIKE there")
+        return
+    if search.install(conn):
+        count = conn.execute(text(f'SELECT count(*) FROM {search.FTS_TABLE}')).scalar()
+        print(f"  {count} stories indexed")
+    else:
+        print("  skipped: this SQLite has no FTS5, search uses LIKE")
+
+
+def add_story_content_hash(conn, batch_size=1000):
+    """Per-user unique content hash and idempotency key on story"""
+    add_column(conn, 'story', 'content_hash', 'VARCHAR(64)')
+    add_column(conn, 'story', 'idempotency_key', 'VARCHAR(64)')
+
+    stories = Story.__table__
+    seen = set(conn.execute(select(stories.c.user_id, stories.c.content_hash)
+                            .where(stories.c.content_hash.is_not(None))).all())
+    hashed, duplicates, last_id = 0, 0, 0
+    while True:
+        # Story text is read one batch at a time, oldest first: the oldest copy keeps
+        # the hash, later duplicates stay NULL (nothing is deleted)
+        rows = conn.execute(select(stories.c.id, stories.c.user_id, stories.c.title, stories.c.content,
+                                   stories.c.age_group)
+                            .where(stories.c.content_hash.is_(None), stories.c.id > last_id)
+                            .order_by(stories.c.id).limit(batch_size)).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        updates = []
+        for row in rows:
+            key = (row.user_id, Story.compute_content_hash(row.title, row.content, row.age_group))
+            if key in seen:
+                duplicates += 1
+                continue
+            seen.add(key)
+            updates.append({'story_id': row.id, 'hash': key[1]})
+        if updates:
+            conn.execute(stories.update().where(stories.c.id == bindparam('story_id'))
+                         .values(content_hash=bindparam('hash')), updates)
+            hashed += len(updates)
+
+    conn.execute(text('CREATE UNIQUE INDEX IF NOT EXISTS uq_story_user_id_content_hash '
+                      'ON story (user_id, content_hash)'))
+    conn.execute(text('CREATE UNIQUE INDEX IF NOT EXISTS uq_story_user_id_idempotency_key '
+                      'ON story (user_id, idempotency_key)'))
+    print(f"  {hashed} stories hashed, {duplicates} duplicate copies left unhashed")
+
+
+# (version, name, function) - append new migrations, never renumber old ones.
+# Every migration runs on SQLite and PostgreSQL; SQLite-only steps (JSON1,
+# FTS5) check conn.dialect themselves and record a no-op elsewhere.
+MIGRATIONS = [
+    (1, 'add_activity_columns', add_activity_columns),
+    (2, 'add_cover_hash_column', add_cover_hash_column),
+    (3, 'backfill_cover_images', backfill_cover_images),
+    (4, 'add_story_user_created_index', add_story_user_created_index),
+    (5, 'convert_quiz_columns_to_json', convert_quiz_columns_to_json),
+    (6, 'add_quota_columns', add_quota_columns),
+    (7, 'backfill_user_stats', backfill_user_stats),
+    (8, 'add_story_search', add_story_search),
+    (9, 'add_story_content_hash', add_story_content_hash),
+]
+
+
+def applied_versions(conn):
+    conn.execute(text(
+        'CREATE TABLE IF NOT EXISTS schema_migrations ('
+        'version INTEGER PRIMARY KEY, '
+        'name VARCHAR(100) NOT NULL, '
+        'applied_at TIMESTAMP NOT NULL)'
+    ))
+    return {row[0] for row in conn.execute(text('SELECT version FROM schema_migrations'))}
+
+
+def migrate_database(flask_app=None):
+    """Apply all pending migrations, each in its own transaction"""
+    with (flask_app or app).app_context():
+        # Creates missing tables only; existing tables are handled by MIGRATIONS
+        db.create_all()
+
+        with db.engine.begin() as conn:
+            done = applied_versions(conn)
+
+        pending = [m for m in MIGRATIONS if m[0] not in done]
+        if not pending:
+            print("✓ Database is already up to date!")
+            return
+
+        for version, name, migration in pending:
+            print(f"→ Applying migration {version}: {name}")
+            with db.engine.begin() as conn:
+                migration(conn)
+                conn.execute(
+                    text('INSERT INTO schema_migrations (version, name, applied_at) VALUES (:v, :n, :t)'),
+                    {'v': version, 'n': name, 't': datetime.utcnow()}
+                )
+
+        print(f"✓ Database migration completed! ({len(pending)} applied)")
+
 
 if __name__ == '__main__':
     migrate_database()
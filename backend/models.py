@@ -1,7 +1,13 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from datetime import datetime
+from sqlalchemy import event, func, inspect
+import hashlib
 import json
+from cover_store import cover_url
+
+# Thumbnail size served in library listings (one of image_pipeline.THUMBNAIL_SIZES)
+LISTING_COVER_SIZE = 512
 
 db = SQLAlchemy()
 
@@ -13,25 +19,33 @@ class User(UserMixin, db.Model):
     password_hash = db.Column(db.String(128), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    # Usage tracking
+    # Usage tracking; superseded by UserStats, which is seeded from these for old databases
     stories_generated = db.Column(db.Integer, default=0)
     last_activity = db.Column(db.DateTime, default=datetime.utcnow)
     current_streak = db.Column(db.Integer, default=0)
     longest_streak = db.Column(db.Integer, default=0)
     
+    # Daily generation quota (see quota.py): UTC day and generations used on it
+    quota_day = db.Column(db.Date)
+    quota_used = db.Column(db.Integer, default=0)
+    
     # Relationship with stories
     stories = db.relationship('Story', backref='author', lazy=True, cascade='all, delete-orphan')
     
+    # Materialized dashboard numbers (see user_stats.py)
+    stats = db.relationship('UserStats', uselist=False, lazy=True, cascade='all, delete-orphan')
+    
     def to_dict(self):
         """Convert user to dictionary"""
+        stats = self.stats
         return {
             'id': self.id,
             'username': self.username,
             'email': self.email,
-            'storiesGenerated': self.stories_generated,
-            'currentStreak': self.current_streak,
-            'longestStreak': self.longest_streak,
-            'lastActivity': self.last_activity.isoformat() if self.last_activity else None
+            'storiesGenerated': stats.stories_generated if stats else 0,
+            'currentStreak': stats.current_streak if stats else 0,
+            'longestStreak': stats.longest_streak if stats else 0,
+            'lastActivity': stats.last_active_on.isoformat() if stats and stats.last_active_on else None
         }
     
     def __repr__(self):
@@ -40,19 +54,32 @@ class User(UserMixin, db.Model):
 
 class Story(db.Model):
     """Story model for saving user's generated stories"""
+
+    # Lightweight shape used by library listings
+    SUMMARY_FIELDS = ('id', 'title', 'genre', 'ageGroup', 'readTime', 'coverImage', 'excerpt', 'createdAt')
+
+    # Characters of story text shown on library cards
+    EXCERPT_LENGTH = 100
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     genre = db.Column(db.String(50), nullable=False)
     content = db.Column(db.Text, nullable=False)
     age_group = db.Column(db.String(20), nullable=False)
     read_time = db.Column(db.String(20))
-    cover_image = db.Column(db.Text)  # Base64 encoded image
+    cover_image = db.Column(db.Text)  # Legacy base64 image, moved to the cover store by migrate_db.py
+    cover_hash = db.Column(db.String(64))  # SHA-256 key into the cover blob store
     
-    # Quiz data stored as JSON
-    questions = db.Column(db.Text)  # JSON string of quiz questions
+    # Duplicate detection: SHA-256 of (title, content, age group), unique per user;
+    # NULL only on copies saved before deduplication (see migrate_db.py)
+    content_hash = db.Column(db.String(64))
+    idempotency_key = db.Column(db.String(64))  # client's Idempotency-Key for the save request
     
-    # Flashcards stored as JSON
-    flashcards = db.Column(db.Text)  # JSON string of flashcards
+    # Quiz questions, as a JSON array (SQLite JSON1 / PostgreSQL json)
+    questions = db.Column(db.JSON, default=list)
+    
+    # Flashcards, as a JSON array
+    flashcards = db.Column(db.JSON, default=list)
     
     # Metadata
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -65,13 +92,169 @@ class Story(db.Model):
             'title': self.title,
             'genre': self.genre,
             'content': self.content,
+            'excerpt': (self.content or '')[:self.EXCERPT_LENGTH],
             'ageGroup': self.age_group,
             'readTime': self.read_time,
-            'coverImage': self.cover_image,
-            'questions': json.loads(self.questions) if self.questions else [],
-            'flashcards': json.loads(self.flashcards) if self.flashcards else [],
+            'coverImage': cover_url(self.cover_hash) or self.cover_image,
+            'questions': self.questions or [],
+            'flashcards': self.flashcards or [],
             'createdAt': self.created_at.isoformat()
         }
     
+    @classmethod
+    def api_columns(cls):
+        """Map API field names to the columns backing them, for projection queries"""
+        return {
+            'id': cls.id,
+            'title': cls.title,
+            'genre': cls.genre,
+            'content': cls.content,
+            # Cut by the database, so listings never read whole stories
+            'excerpt': func.substr(cls.content, 1, cls.EXCERPT_LENGTH),
+            'ageGroup': cls.age_group,
+            'readTime': cls.read_time,
+            'coverImage': cls.cover_hash,
+            'questions': cls.questions,
+            'flashcards': cls.flashcards,
+            # Counted by the database, without sending the arrays over
+            'questionCount': func.json_array_length(cls.questions),
+            'flashcardCount': func.json_array_length(cls.flashcards),
+            'createdAt': cls.created_at
+        }
+
+    @staticmethod
+    def compute_content_hash(title, content, age_group):
+        """Hex SHA-256 identifying a story's text; NUL-separated so fields cannot run together"""
+        parts = (title or '', content or '', age_group or '')
+        return hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def format_field(field, value):
+        """Convert a raw column value into its API representation"""
+        if field == 'coverImage':
+            # Listings only need the grid-sized thumbnail (falls back to the original)
+            return cover_url(value, size=LISTING_COVER_SIZE)
+        if field in ('questions', 'flashcards'):
+            return value or []
+        if field == 'excerpt':
+            return value or ''
+        if field in ('questionCount', 'flashcardCount'):
+            return value or 0
+        if field == 'createdAt':
+            return value.isoformat() if value else None
+        return value
+    
     def __repr__(self):
         return f'<Story {self.title}>'
+
+
+class UserStats(db.Model):
+    """
+    Per-user dashboard numbers, kept up to date as stories are saved, edited and
+    deleted and as activity is recorded, so reading them is one primary-key lookup
+    """
+    __tablename__ = 'user_stats'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    total_saved = db.Column(db.Integer, nullable=False, default=0)
+    genre_counts = db.Column(db.JSON, nullable=False, default=dict)  # {genre: saved stories}
+    age_group_counts = db.Column(db.JSON, nullable=False, default=dict)  # {age group: saved stories}
+    
+    # Activity and streaks (UTC days)
+    stories_generated = db.Column(db.Integer, nullable=False, default=0)
+    current_streak = db.Column(db.Integer, nullable=False, default=0)
+    longest_streak = db.Column(db.Integer, nullable=False, default=0)
+    last_active_on = db.Column(db.Date)
+    
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        """Convert stats to dictionary"""
+        return {
+            'storiesGenerated': self.stories_generated,
+            'currentStreak': self.current_streak,
+            'longestStreak': self.longest_streak,
+            'totalStoriesSaved': self.total_saved,
+            'storiesByGenre': self.genre_counts or {},
+            'storiesByAgeGroup': self.age_group_counts or {}
+        }
+
+
+class StoryTranslation(db.Model):
+    """Translated variant of a saved story (text, quiz and flashcards) for one language"""
+    __table_args__ = (db.UniqueConstraint('story_id', 'language', name='uq_story_translation_language'),)
+    
+    id = db.Column(db.Integer, primary_key=True)
+    story_id = db.Column(db.Integer, db.ForeignKey('story.id'), nullable=False)
+    language = db.Column(db.String(10), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON string: title, content, questions, flashcards
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    story = db.relationship('Story', backref=db.backref('translations', lazy=True, cascade='all, delete-orphan'))
+    
+    def to_dict(self):
+        """Convert translation to dictionary"""
+        return {
+            'storyId': self.story_id,
+            'language': self.language,
+            **json.loads(self.payload),
+            'createdAt': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class Job(db.Model):
+    """Background generation job; the table doubles as the work queue"""
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    kind = db.Column(db.String(30), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    progress = db.Column(db.Integer, default=0)  # 0-100
+    params = db.Column(db.Text)  # JSON string of job input
+    result = db.Column(db.Text)  # JSON string of (partial) results
+    error = db.Column(db.Text)
+    worker = db.Column(db.String(64))  # claiming worker, for debugging stuck jobs
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    
+    def to_dict(self):
+        """Convert job to dictionary"""
+        result = json.loads(self.result) if self.result else {}
+        if result.get('coverHash'):
+            result['coverImage'] = cover_url(result['coverHash'])
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'progress': self.progress,
+            'result': result,
+            'error': self.error,
+            'createdAt': self.created_at.isoformat() if self.created_at else None,
+            'updatedAt': self.updated_at.isoformat() if self.updated_at else None
+        }
+    
+    def __repr__(self):
+        return f'<Job {self.id} {self.kind} {self.status}>'
+
+
+# Library listings and counts filter on user_id and sort newest-first
+db.Index('ix_story_user_id_created_at', Story.user_id, Story.created_at.desc())
+
+# One copy of a story per user, and one story per idempotency key (NULLs are not compared)
+db.Index('uq_story_user_id_content_hash', Story.user_id, Story.content_hash, unique=True)
+db.Index('uq_story_user_id_idempotency_key', Story.user_id, Story.idempotency_key, unique=True)
+
+# Workers claim the oldest queued job
+db.Index('ix_job_status_created_at', Job.status, Job.created_at)
+
+
+@event.listens_for(Story, 'before_insert')
+def _hash_new_story(mapper, connection, target):
+    target.content_hash = Story.compute_content_hash(target.title, target.content, target.age_group)
+
+
+@event.listens_for(Story, 'before_update')
+def _rehash_edited_story(mapper, connection, target):
+    # Only text edits rehash, so a legacy duplicate (NULL hash) can still change genre
+    state = inspect(target)
+    if any(state.attrs[key].history.has_changes() for key in ('title', 'content', 'age_group')):
+        target.content_hash = Story.compute_content_hash(target.title, target.content, target.age_group)
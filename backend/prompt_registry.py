@@ -0,0 +1,94 @@
+"""
+Prompt Template Registry
+Prompt builders are compiled once per combination of their static arguments
+(theme, age group, ...) into fixed text with slots for the per-request values,
+and versioned by a hash of their output so cache keys change with the prompts.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+_MARK = '\x00'
+
+
+class CompiledPrompt:
+    """Static text with named slots; parts alternate text, slot, text, ..."""
+
+    __slots__ = ('parts',)
+
+    def __init__(self, text: str):
+        self.parts = text.split(_MARK)
+
+    def render(self, values: Dict[str, Any]) -> str:
+        parts = self.parts
+        out = list(parts)
+        for i in range(1, len(parts), 2):
+            out[i] = values[parts[i]]
+        return ''.join(out)
+
+
+class PromptRegistry:
+    """Named prompt builders, compiled on first use; the oldest compilations are dropped past max_compiled"""
+
+    def __init__(self, max_compiled: int = 512):
+        self.max_compiled = max_compiled
+        self._builders: Dict[str, Tuple[Callable[..., str], Tuple[str, ...]]] = {}
+        self._versions: Dict[str, str] = {}
+        self._compiled: 'OrderedDict[tuple, CompiledPrompt]' = OrderedDict()  # insertion order
+        self._lock = threading.Lock()
+
+    def register(self, name: str, builder: Callable[..., str], dynamic: Sequence[str],
+                 variants: Iterable[Dict[str, Any]]) -> None:
+        """
+        `dynamic` names the builder arguments that change per request (story text,
+        custom prompt). `variants` are representative static arguments; the version
+        hash covers the builder's output for each of them.
+        """
+        self._builders[name] = (builder, tuple(dynamic))
+        digest = hashlib.sha256()
+        for static in variants:
+            for text in self._variant_texts(builder, dynamic, static):
+                digest.update(text.encode('utf-8'))
+        self._versions[name] = digest.hexdigest()[:12]
+
+    @staticmethod
+    def _variant_texts(builder, dynamic, static) -> List[str]:
+        # Builders may branch on whether an input is empty, so hash both shapes
+        slots = {arg: f'{_MARK}{arg}{_MARK}' for arg in dynamic}
+        empty = {arg: '' for arg in dynamic}
+        return [builder(**static, **slots), builder(**static, **empty)]
+
+    def version(self, name: str) -> str:
+        return self._versions[name]
+
+    def render(self, name: str, **kwargs) -> str:
+        builder, dynamic = self._builders[name]
+        # Empty dynamic inputs are baked into the compiled text (builders branch on them).
+        # Call sites pass keywords in a fixed order, so the items need no sorting.
+        key = (name, *((k, bool(v)) if k in dynamic else (k, v) for k, v in kwargs.items()))
+
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            compiled = self._compile(key, builder, dynamic, kwargs)
+        return compiled.render(kwargs)
+
+    def _compile(self, key, builder, dynamic, kwargs) -> CompiledPrompt:
+        args = {}
+        for k, v in kwargs.items():
+            if k in dynamic:
+                args[k] = f'{_MARK}{k}{_MARK}' if v else v
+            else:
+                args[k] = v.replace(_MARK, '') if isinstance(v, str) else v
+        compiled = CompiledPrompt(builder(**args))
+        with self._lock:
+            self._compiled[key] = compiled
+            while len(self._compiled) > self.max_compiled:
+                self._compiled.popitem(last=False)
+        return compiled
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            compiled = len(self._compiled)
+        return {'versions': dict(self._versions), 'compiled': compiled}
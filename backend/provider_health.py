@@ -0,0 +1,143 @@
+"""
+Provider Health Tracking
+Rolling success rate and latency per AI provider, 429 cooldowns and a
+circuit breaker (closed -> open -> half-open) used to order and skip providers
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class ProviderError(Exception):
+    """Provider failure carrying the HTTP status and Retry-After hint when known"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After is either delay-seconds or an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        from email.utils import parsedate_to_datetime
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_rate_limit(error: Exception) -> bool:
+    if getattr(error, 'status_code', None) == 429:
+        return True
+    message = str(error)
+    return '429' in message or 'Too Many Requests' in message or 'ResourceExhausted' in type(error).__name__
+
+
+def percentile(sorted_values, fraction: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class ProviderHealth:
+    """Health state for one provider; all methods are thread-safe"""
+
+    def __init__(self, name: str, window: Optional[int] = None, failure_threshold: Optional[int] = None,
+                 reset_timeout: Optional[float] = None, default_cooldown: Optional[float] = None):
+        self.name = name
+        self.failure_threshold = failure_threshold or int(os.getenv('AI_BREAKER_FAILURES', 5))
+        self.reset_timeout = reset_timeout or float(os.getenv('AI_BREAKER_RESET', 30))
+        self.default_cooldown = default_cooldown or float(os.getenv('AI_RATE_LIMIT_COOLDOWN', 60))
+        self._outcomes = deque(maxlen=window or int(os.getenv('AI_HEALTH_WINDOW', 50)))
+        self._latencies = deque(maxlen=window or int(os.getenv('AI_HEALTH_WINDOW', 50)))
+        # Time to first streamed chunk is far shorter than a full completion, so it must not
+        # feed the completion percentiles that ordering and the hedge delay use
+        self._first_chunk_latencies = deque(maxlen=window or int(os.getenv('AI_HEALTH_WINDOW', 50)))
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.cooldown_until = 0.0
+
+    def allow_request(self) -> bool:
+        """Whether a call may be sent now; an open breaker turns half-open after reset_timeout"""
+        now = time.time()
+        with self._lock:
+            if now < self.cooldown_until:
+                return False
+            if self.state == OPEN:
+                if now - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = HALF_OPEN
+            return True
+
+    def record_success(self, latency: float, first_chunk: bool = False) -> None:
+        """`first_chunk`: latency is a stream's time to first chunk, not a full completion"""
+        with self._lock:
+            self._outcomes.append(True)
+            (self._first_chunk_latencies if first_chunk else self._latencies).append(latency)
+            self.consecutive_failures = 0
+            self.state = CLOSED
+
+    def record_failure(self, error: Exception) -> None:
+        now = time.time()
+        with self._lock:
+            self._outcomes.append(False)
+            self.consecutive_failures += 1
+            if is_rate_limit(error):
+                retry_after = getattr(error, 'retry_after', None)
+                self.cooldown_until = now + (retry_after if retry_after is not None else self.default_cooldown)
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = now
+
+    def latency(self, fraction: float) -> Optional[float]:
+        with self._lock:
+            return percentile(sorted(self._latencies), fraction)
+
+    def sample_count(self) -> int:
+        with self._lock:
+            return len(self._latencies)
+
+    def sort_key(self):
+        """Healthy providers first, then by p50 latency (untried providers keep their configured order)"""
+        now = time.time()
+        with self._lock:
+            cooling = now < self.cooldown_until
+            rank = 2 if (self.state == OPEN or cooling) else (1 if self.state == HALF_OPEN else 0)
+            p50 = percentile(sorted(self._latencies), 0.5)
+        return (rank, p50 if p50 is not None else float('inf'))
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            outcomes = list(self._outcomes)
+            latencies = sorted(self._latencies)
+            first_chunk = sorted(self._first_chunk_latencies)
+            state = self.state
+            if state == OPEN and now - self.opened_at >= self.reset_timeout:
+                state = HALF_OPEN
+            return {
+                'state': state,
+                'success_rate': round(sum(outcomes) / len(outcomes), 3) if outcomes else None,
+                'p50_latency': round(percentile(latencies, 0.5), 3) if latencies else None,
+                'p95_latency': round(percentile(latencies, 0.95), 3) if latencies else None,
+                'p50_first_chunk': round(percentile(first_chunk, 0.5), 3) if first_chunk else None,
+                'samples': len(outcomes),
+                'consecutive_failures': self.consecutive_failures,
+                'cooldown_remaining': round(max(0.0, self.cooldown_until - now), 1)
+            }
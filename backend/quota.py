@@ -0,0 +1,64 @@
+"""
+Daily Story Quota
+Per-user daily generation limits enforced by the database. A single
+conditional UPDATE both checks and counts, so concurrent requests (from any
+thread or process) can never go past the limit, and nothing is held while the
+slow AI call runs. Generations that fail are refunded.
+"""
+
+import os
+from datetime import date, datetime
+from typing import Optional
+
+from sqlalchemy import case, or_, update
+from models import db, User
+from user_cache import user_cache
+
+DAILY_STORY_LIMIT = int(os.getenv('DAILY_STORY_LIMIT', 5))
+
+
+def consume_story_quota(user_id: int, limit: int = DAILY_STORY_LIMIT) -> Optional[date]:
+    """
+    Count one story generation against today's (UTC) limit. Returns the quota day
+    to hand to refund_story_quota(), or None if the limit is reached.
+    """
+    today = datetime.utcnow().date()
+    granted = db.session.execute(
+        update(User)
+        .where(User.id == user_id,
+               or_(User.quota_day.is_(None), User.quota_day != today, User.quota_used < limit))
+        # SET sees the old row, so a new day starts over at 1
+        .values(quota_used=case((User.quota_day == today, User.quota_used + 1), else_=1),
+                quota_day=today)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    # Core UPDATEs skip the ORM events that normally invalidate cached users
+    user_cache.invalidate(user_id)
+    return today if granted == 1 else None
+
+
+def refund_story_quota(user_id: int, quota_day: Optional[date]) -> None:
+    """Give back a generation that failed; no-op once that day's counter has been reset"""
+    if quota_day is None:
+        return
+    try:
+        db.session.execute(
+            update(User)
+            .where(User.id == user_id, User.quota_day == quota_day, User.quota_used > 0)
+            .values(quota_used=User.quota_used - 1)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        user_cache.invalidate(user_id)
+    except Exception as e:
+        # Losing a refund costs the user one generation; it must not mask the original error
+        db.session.rollback()
+        print(f"⚠️ Quota refund failed for user {user_id}: {e}")
+
+
+def remaining_story_quota(user: User, limit: int = DAILY_STORY_LIMIT) -> int:
+    """Generations left today, from an already loaded user"""
+    if user.quota_day != datetime.utcnow().date():
+        return limit
+    return max(0, limit - (user.quota_used or 0))
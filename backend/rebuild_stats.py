@@ -0,0 +1,53 @@
+"""
+Rebuild or check the materialized user_stats rows.
+The library numbers (saved stories per genre and age group) are recounted from
+the story table; activity and streaks have no other source and are kept.
+
+    python rebuild_stats.py             # recount every user
+    python rebuild_stats.py --check     # only report users whose row disagrees
+    python rebuild_stats.py --user 42
+"""
+import argparse
+import os
+import sys
+
+# Short-lived script: no job workers, which could claim a job and exit with it
+os.environ['JOB_WORKERS'] = '0'
+from app import app, db
+from models import User, UserStats
+from user_stats import compute_library_counts, rebuild_user_stats
+
+
+def rebuild_stats(user_ids=None, check=False, batch_size=200):
+    """Returns the number of users whose stats were missing or wrong"""
+    with app.app_context():
+        if not user_ids:
+            user_ids = [row[0] for row in db.session.query(User.id).order_by(User.id)]
+
+        mismatched = 0
+        for i, user_id in enumerate(user_ids, 1):
+            stats = db.session.get(UserStats, user_id)
+            expected = compute_library_counts(user_id)
+            actual = {name: getattr(stats, name) for name in expected} if stats else None
+            if actual != expected:
+                mismatched += 1
+                print(f"✗ user {user_id}: stored {actual}, counted {expected}")
+                if not check:
+                    rebuild_user_stats(user_id)
+            if not check and i % batch_size == 0:
+                db.session.commit()
+        if not check:
+            db.session.commit()
+
+        verb = 'found' if check else 'fixed'
+        print(f"✓ {len(user_ids)} users checked, {mismatched} {verb} out of date")
+        return mismatched
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--check', action='store_true', help='report only; exit with status 1 on mismatches')
+    parser.add_argument('--user', type=int, action='append', help='limit to this user id (repeatable)')
+    args = parser.parse_args()
+    mismatched = rebuild_stats(args.user, check=args.check)
+    sys.exit(1 if args.check and mismatched else 0)
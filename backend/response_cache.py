@@ -0,0 +1,126 @@
+"""
+AI Response Cache
+Two-tier cache for parsed AI generations: an in-process LRU in front of an
+optional SQLite table that survives restarts and is shared between workers
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so cosmetic differences don't miss the cache"""
+    return ' '.join((text or '').split())
+
+
+class ResponseCache:
+    """LRU + TTL cache keyed on a hash of the generation inputs"""
+
+    def __init__(self, max_entries: Optional[int] = None, ttl: Optional[int] = None,
+                 db_path: Optional[str] = None, disk_max_entries: Optional[int] = None):
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv('AI_CACHE_MAX_ENTRIES', 256))
+        self.ttl = ttl if ttl is not None else int(os.getenv('AI_CACHE_TTL', 7 * 24 * 3600))
+        self.db_path = db_path if db_path is not None else os.getenv('AI_CACHE_DB')
+        self.disk_max_entries = disk_max_entries if disk_max_entries is not None else int(os.getenv('AI_CACHE_DB_MAX_ENTRIES', 10000))
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+
+        if self.db_path:
+            with self._connect() as conn:
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS ai_response_cache ('
+                    'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)'
+                )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_key(kind: str, content: str, age_group: str, version: Any) -> str:
+        """Hash of (endpoint kind, normalized story content, age group, prompt template version)"""
+        raw = json.dumps([kind, normalize_text(content), age_group, str(version)])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return value
+                del self._entries[key]
+
+        if self.db_path:
+            try:
+                with self._connect() as conn:
+                    row = conn.execute(
+                        'SELECT value, expires_at FROM ai_response_cache WHERE key = ?', (key,)
+                    ).fetchone()
+            except sqlite3.Error as e:
+                print(f"⚠️  Response cache read failed: {e}")
+                row = None
+            if row and row[1] > now:
+                value = json.loads(row[0])
+                self._remember(key, value, row[1])
+                with self._lock:
+                    self.stats['disk_hits'] += 1
+                return value
+
+        with self._lock:
+            self.stats['misses'] += 1
+        return None
+
+    def set(self, key: str, value: Any) -> None:
+        expires_at = time.time() + self.ttl
+        self._remember(key, value, expires_at)
+        if self.db_path:
+            try:
+                with self._connect() as conn:
+                    conn.execute(
+                        'INSERT OR REPLACE INTO ai_response_cache (key, value, expires_at) VALUES (?, ?, ?)',
+                        (key, json.dumps(value), expires_at)
+                    )
+                    conn.execute('DELETE FROM ai_response_cache WHERE expires_at <= ?', (time.time(),))
+                    # Entries closest to expiry go first once the table is full
+                    conn.execute(
+                        'DELETE FROM ai_response_cache WHERE key IN ('
+                        'SELECT key FROM ai_response_cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)',
+                        (self.disk_max_entries,)
+                    )
+            except sqlite3.Error as e:
+                print(f"⚠️  Response cache write failed: {e}")
+
+    def _remember(self, key: str, value: Any, expires_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self.stats,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'disk_tier': bool(self.db_path)
+            }
@@ -0,0 +1,96 @@
+"""
+Generation Schemas
+Checks the documents the AI providers return (story, quiz, flashcards) before
+they reach the client, so malformed output can be repaired instead of served.
+"""
+
+from typing import Any, Callable, Dict, List
+
+QUIZ_QUESTIONS = 5
+QUIZ_OPTIONS = 4
+
+
+class SchemaError(ValueError):
+    """A generated document does not match its schema; `problems` lists why"""
+
+    def __init__(self, kind: str, problems: List[str]):
+        self.kind = kind
+        self.problems = problems
+        super().__init__(f"Invalid {kind}: " + '; '.join(problems[:5]))
+
+
+def _require_text(data: Dict[str, Any], fields, where: str, problems: List[str]) -> None:
+    for field in fields:
+        value = data.get(field)
+        if not isinstance(value, str) or not value.strip():
+            problems.append(f"{where}.{field} must be a non-empty string")
+
+
+def _check_story(data: Dict[str, Any], problems: List[str]) -> None:
+    _require_text(data, ('title', 'genre', 'content', 'readTime'), 'story', problems)
+    if 'imageDescription' in data and not isinstance(data['imageDescription'], str):
+        problems.append("story.imageDescription must be a string")
+
+
+def _check_quiz(data: Dict[str, Any], problems: List[str]) -> None:
+    questions = data.get('questions')
+    if not isinstance(questions, list):
+        problems.append("questions must be a list")
+        return
+    if len(questions) != QUIZ_QUESTIONS:
+        problems.append(f"questions must have exactly {QUIZ_QUESTIONS} items (got {len(questions)})")
+    for i, question in enumerate(questions):
+        where = f"questions[{i}]"
+        if not isinstance(question, dict):
+            problems.append(f"{where} must be an object")
+            continue
+        _require_text(question, ('question',), where, problems)
+        options = question.get('options')
+        if not isinstance(options, list) or len(options) != QUIZ_OPTIONS \
+                or not all(isinstance(o, str) and o.strip() for o in options):
+            problems.append(f"{where}.options must be {QUIZ_OPTIONS} non-empty strings")
+        # Models sometimes quote the index; that much is safe to fix in place
+        correct = question.get('correct')
+        if isinstance(correct, str) and correct.strip().isdigit():
+            correct = question['correct'] = int(correct)
+        if isinstance(correct, bool) or not isinstance(correct, int) or not 0 <= correct < QUIZ_OPTIONS:
+            problems.append(f"{where}.correct must be an integer from 0 to {QUIZ_OPTIONS - 1}")
+
+
+def _check_flashcards(data: Dict[str, Any], problems: List[str]) -> None:
+    cards = data.get('flashcards')
+    if not isinstance(cards, list) or not cards:
+        problems.append("flashcards must be a non-empty list")
+        return
+    for i, card in enumerate(cards):
+        if not isinstance(card, dict):
+            problems.append(f"flashcards[{i}] must be an object")
+            continue
+        _require_text(card, ('word', 'definition', 'example'), f"flashcards[{i}]", problems)
+
+
+_CHECKS: Dict[str, Callable[[Dict[str, Any], List[str]], None]] = {
+    'story': _check_story,
+    'quiz': _check_quiz,
+    'flashcards': _check_flashcards,
+}
+
+# Shapes quoted back to the model in repair prompts
+SHAPES = {
+    'story': '{"title": str, "genre": str, "content": str (paragraphs separated by \\n\\n), '
+             '"readTime": str, "imageDescription": str}',
+    'quiz': f'{{"questions": [exactly {QUIZ_QUESTIONS} x {{"question": str, '
+            f'"options": [{QUIZ_OPTIONS} x str], "correct": int 0-{QUIZ_OPTIONS - 1}}}]}}',
+    'flashcards': '{"flashcards": [{"word": str, "definition": str, "example": str}, ...]}',
+}
+
+
+def validate(kind: str, data: Any) -> Dict[str, Any]:
+    """Return `data` if it matches the `kind` schema, else raise SchemaError"""
+    if not isinstance(data, dict):
+        raise SchemaError(kind, ["top level must be a JSON object"])
+    problems: List[str] = []
+    _CHECKS[kind](data, problems)
+    if problems:
+        raise SchemaError(kind, problems)
+    return data
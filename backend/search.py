@@ -0,0 +1,190 @@
+"""
+Story Library Search
+SQLite FTS5 index over each story's title, genre, flashcard words and text,
+kept in sync by triggers on the story table and ranked with BM25. Every row
+also carries an `owner` token, so a search intersects the user's own postings
+instead of filtering everyone's matches afterwards.
+Databases without FTS5 (or PostgreSQL) fall back to an unranked LIKE scan.
+"""
+
+import re
+import html
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event, or_, text
+from sqlalchemy.exc import OperationalError
+from models import db, Story
+
+FTS_TABLE = 'story_fts'
+
+# BM25 weights, in column order: owner, title, genre, words, content
+BM25_WEIGHTS = (0.0, 10.0, 2.0, 4.0, 1.0)
+SNIPPET_TOKENS = 16
+
+# Private-use delimiters, swapped for <mark> after the story text is HTML-escaped
+_OPEN, _CLOSE = '\ue000', '\ue001'
+_TERM = re.compile(r'\w+', re.UNICODE)
+_SUMMARY_COLUMNS = (Story.id, Story.title, Story.genre, Story.age_group, Story.read_time,
+                    Story.cover_hash, Story.created_at)
+
+_FLASHCARD_WORDS = (
+    "(SELECT group_concat(json_extract(value, '$.word'), ' ') "
+    "FROM json_each(CASE WHEN json_valid({row}.flashcards) THEN {row}.flashcards ELSE '[]' END) "
+    "WHERE type = 'object')"
+)
+_INSERT_ROW = (
+    f"INSERT INTO {FTS_TABLE} (rowid, owner, title, genre, words, content) "
+    "VALUES ({row}.id, 'u' || {row}.user_id, {row}.title, {row}.genre, " + _FLASHCARD_WORDS + ", {row}.content);"
+)
+
+SCHEMA = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "owner, title, genre, words, content, tokenize = 'porter unicode61 remove_diacritics 2')",
+
+    "CREATE TRIGGER IF NOT EXISTS story_fts_insert AFTER INSERT ON story BEGIN "
+    + _INSERT_ROW.format(row='new') + " END",
+
+    "CREATE TRIGGER IF NOT EXISTS story_fts_delete AFTER DELETE ON story BEGIN "
+    f"DELETE FROM {FTS_TABLE} WHERE rowid = old.id; END",
+
+    "CREATE TRIGGER IF NOT EXISTS story_fts_update AFTER UPDATE OF title, genre, content, flashcards, user_id "
+    f"ON story BEGIN DELETE FROM {FTS_TABLE} WHERE rowid = old.id; " + _INSERT_ROW.format(row='new') + " END",
+]
+
+BACKFILL = (
+    f"INSERT INTO {FTS_TABLE} (rowid, owner, title, genre, words, content) "
+    "SELECT story.id, 'u' || story.user_id, story.title, story.genre, "
+    + _FLASHCARD_WORDS.format(row='story') + ", story.content FROM story"
+)
+
+
+def install(conn, backfill: bool = True) -> bool:
+    """Create the index and its triggers (SQLite with FTS5 only); True if search is indexed"""
+    if conn.dialect.name != 'sqlite':
+        return False
+    exists = conn.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': FTS_TABLE}).first()
+    try:
+        for statement in SCHEMA:
+            conn.execute(text(statement))
+    except OperationalError as e:
+        print(f"⚠️ Full-text search unavailable (SQLite built without FTS5?): {e}")
+        return False
+    if backfill and not exists:
+        conn.execute(text(BACKFILL))
+    return True
+
+
+@event.listens_for(Story.__table__, 'after_create')
+def _install_on_create(target, connection, **kw):
+    # New databases (db.create_all) get the index with the story table; old ones via migrate_db.py
+    install(connection, backfill=False)
+
+
+_indexed = False
+
+
+def is_indexed() -> bool:
+    global _indexed
+    if not _indexed and db.engine.dialect.name == 'sqlite':
+        _indexed = db.session.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': FTS_TABLE}).first() is not None
+    return _indexed
+
+
+def match_expression(user_id: int, query: str) -> Optional[str]:
+    """
+    FTS5 query for free text: every word must match (the last one as a prefix,
+    for search-as-you-type), restricted to the user's stories. Words are quoted,
+    so FTS5 operators in the input are treated as plain text.
+    """
+    terms = _TERM.findall(query)
+    if not terms:
+        return None
+    phrases = [f'"{term}"' for term in terms]
+    phrases[-1] += '*'
+    return f'owner:"u{int(user_id)}" AND {{title genre words content}} : ({" ".join(phrases)})'
+
+
+def _render_snippet(snippet: Optional[str]) -> str:
+    """Escape story text and turn the match delimiters into <mark> tags"""
+    escaped = html.escape(snippet or '')
+    return escaped.replace(_OPEN, '<mark>').replace(_CLOSE, '</mark>')
+
+
+def search_stories(user_id: int, query: str, limit: int, offset: int) -> Tuple[List[Dict[str, Any]], bool]:
+    """One page of the user's stories matching `query`, best first; also whether more exist"""
+    if is_indexed():
+        return _search_fts(user_id, query, limit, offset)
+    return _search_like(user_id, query, limit, offset)
+
+
+def _search_fts(user_id, query, limit, offset):
+    expression = match_expression(user_id, query)
+    if expression is None:
+        return [], False
+    weights = ', '.join(str(w) for w in BM25_WEIGHTS)
+    # Rank and snippet inside the index only, then load the page's stories by id:
+    # joining the story table here would read every matching story before the sort
+    hits = db.session.execute(text(
+        f"SELECT rowid, snippet({FTS_TABLE}, 4, :open, :close, '…', :tokens) AS snippet, "
+        f"bm25({FTS_TABLE}, {weights}) AS score "
+        f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match "
+        f"ORDER BY score LIMIT :limit OFFSET :offset"
+    ), {
+        'open': _OPEN, 'close': _CLOSE, 'tokens': SNIPPET_TOKENS,
+        'match': expression, 'limit': limit + 1, 'offset': offset
+    }).all()
+    page = hits[:limit]
+    stories = {row.id: row for row in db.session.query(*_SUMMARY_COLUMNS)
+               .filter(Story.id.in_([hit.rowid for hit in page])).all()} if page else {}
+    results = [_result(stories[hit.rowid], _render_snippet(hit.snippet), -hit.score)
+               for hit in page if hit.rowid in stories]
+    return results, len(hits) > limit
+
+
+def _search_like(user_id, query, limit, offset):
+    terms = _TERM.findall(query)
+    if not terms:
+        return [], False
+    filters = []
+    for term in terms:
+        # \w+ terms can contain '_', which LIKE would read as a wildcard
+        pattern = f'%{_escape_like(term)}%'
+        filters.append(or_(*(column.ilike(pattern, escape='\\')
+                             for column in (Story.title, Story.genre, Story.content))))
+    rows = db.session.query(*_SUMMARY_COLUMNS, Story.content).filter(Story.user_id == user_id, *filters) \
+        .order_by(Story.created_at.desc(), Story.id.desc()).offset(offset).limit(limit + 1).all()
+    results = [_result(row, _like_snippet(row.content, terms), None) for row in rows[:limit]]
+    return results, len(rows) > limit
+
+
+def _escape_like(term: str) -> str:
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _like_snippet(content: str, terms: List[str]) -> str:
+    """Words around the first match, marked like FTS5 snippets"""
+    words = (content or '').split()
+    lowered = [t.lower() for t in terms]
+    hit = next((i for i, w in enumerate(words) if any(t in w.lower() for t in lowered)), 0)
+    start = max(0, hit - SNIPPET_TOKENS // 2)
+    window = words[start:start + SNIPPET_TOKENS]
+    marked = [f'{_OPEN}{w}{_CLOSE}' if any(t in w.lower() for t in lowered) else w for w in window]
+    prefix = '…' if start else ''
+    suffix = '…' if start + SNIPPET_TOKENS < len(words) else ''
+    return _render_snippet(prefix + ' '.join(marked) + suffix)
+
+
+def _result(row, snippet: str, score: Optional[float]) -> Dict[str, Any]:
+    return {
+        'id': row.id,
+        'title': row.title,
+        'genre': row.genre,
+        'ageGroup': row.age_group,
+        'readTime': row.read_time,
+        'coverImage': Story.format_field('coverImage', row.cover_hash),
+        'createdAt': Story.format_field('createdAt', row.created_at),
+        'snippet': snippet,
+        'score': round(score, 4) if score is not None else None
+    }
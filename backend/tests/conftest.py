@@ -0,0 +1,86 @@
+"""
+Shared fixtures: the full app bound to a throwaway SQLite database, with
+offline stand-ins for the AI providers.
+"""
+
+import contextlib
+import io
+import json
+import os
+import threading
+
+import pytest
+
+
+@pytest.fixture(scope='session')
+def storyloom(tmp_path_factory):
+    """The app module, imported once against a temporary database, cover store and caches"""
+    tmp = tmp_path_factory.mktemp('storyloom')
+    os.environ['DATABASE_URL'] = f"sqlite:///{tmp / 'storyloom.db'}"
+    os.environ['COVER_STORAGE_DIR'] = str(tmp / 'covers')
+    os.environ['COVER_CACHE_DB'] = str(tmp / 'cover_cache.db')
+    os.environ['TRANSLATION_MEMORY_DB'] = str(tmp / 'translation_memory.db')
+    os.environ.setdefault('GITHUB_TOKEN', 'offline-tests')
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app as storyloom
+        from models import db
+        with storyloom.app.app_context():
+            db.create_all()
+    return storyloom
+
+
+class FakeProvider:
+    """Answers every prompt with a valid story document; every `fail_every`-th call raises"""
+    name = 'Fake'
+
+    def __init__(self, fail_every=0):
+        self.fail_every = fail_every
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def is_available(self):
+        return True
+
+    def generate_content(self, prompt, json_mode=False):
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        if self.fail_every and call % self.fail_every == 0:
+            raise RuntimeError('simulated provider failure')
+        return json.dumps({
+            'title': f'The Door {call}', 'genre': 'Fantasy', 'readTime': '3 min read',
+            'content': 'The fox ran over a hill and found a small door in an old tree. ' * 20,
+            'imageDescription': 'A fox at a door in a tree'
+        })
+
+    def stream_content(self, prompt):
+        yield self.generate_content(prompt)
+
+
+@pytest.fixture
+def use_provider(storyloom, monkeypatch):
+    """Route all AI calls to the given stand-in provider for one test"""
+    from provider_health import ProviderHealth
+
+    def install(provider):
+        manager = storyloom.ai_manager
+        monkeypatch.setattr(manager, 'hedged', False)
+        monkeypatch.setattr(manager, 'available_providers', [provider])
+        monkeypatch.setattr(manager, '_configured_order', [provider])
+        monkeypatch.setattr(manager, 'health', {provider.name: ProviderHealth(provider.name)})
+        return provider
+
+    return install
+
+
+@pytest.fixture
+def register(storyloom):
+    """Create a user and return a logged-in test client"""
+    def create(username):
+        client = storyloom.app.test_client()
+        response = client.post('/api/auth/register', json={
+            'username': username, 'email': f'{username}@example.com', 'password': 'test-password'})
+        assert response.status_code == 201, response.get_json()
+        return client
+
+    return create
@@ -0,0 +1,106 @@
+"""
+Cover prompt cache: exact and near-duplicate hits, LRU eviction, and how cover
+generation uses it (regenerate bypass, entries whose blob has gone missing).
+"""
+
+import pytest
+
+from cover_cache import CoverCache, minhash, normalize_prompt, shingles, similarity
+
+PROMPT = 'A red fox stands at a small wooden door in the trunk of an old oak tree at night'
+NEAR = 'A red fox stands at a small wooden door in the trunk of an old oak tree at dawn'
+MISSING_COVER = 'f' * 64
+
+
+def estimated_similarity(a, b):
+    return similarity(minhash(shingles(normalize_prompt(a))), minhash(shingles(normalize_prompt(b))))
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / 'cover_cache.db')
+
+
+def test_exact_hit_ignores_case_and_punctuation(cache_path):
+    cache = CoverCache(cache_path)
+    cache.store(PROMPT, 'a' * 64, 'model-x')
+
+    hit = cache.lookup(PROMPT.upper() + '!')
+    assert (hit['coverHash'], hit['model'], hit['match']) == ('a' * 64, 'model-x', 'exact')
+    assert hit['promptHash'] == CoverCache.prompt_hash(PROMPT)
+    assert cache.lookup('A blue whale') is None
+
+
+def test_similar_hit_at_the_threshold_and_miss_below_it(cache_path):
+    score = estimated_similarity(PROMPT, NEAR)
+    assert 0 < score < 1
+
+    at_threshold = CoverCache(cache_path, min_similarity=score)
+    at_threshold.store(PROMPT, 'a' * 64)
+    hit = at_threshold.lookup(NEAR)
+    assert (hit['match'], hit['similarity']) == ('similar', round(score, 3))
+    assert hit['promptHash'] == CoverCache.prompt_hash(PROMPT)
+
+    above = CoverCache(cache_path, min_similarity=score + 1 / 64)
+    assert above.lookup(NEAR) is None
+    assert CoverCache(cache_path, min_similarity=0).lookup(NEAR) is None
+
+
+def test_least_recently_used_entries_are_evicted(cache_path):
+    cache = CoverCache(cache_path, max_entries=2)
+    cache.store('first prompt', 'a' * 64)
+    cache.store('second prompt', 'b' * 64)
+    cache.lookup('first prompt')
+    cache.store('third prompt', 'c' * 64)
+
+    assert cache.lookup('second prompt') is None
+    assert cache.lookup('first prompt')['coverHash'] == 'a' * 64
+    assert cache.get_stats()['evictions'] == 1
+    assert cache.get_stats()['entries'] == 2
+
+
+def test_forget_survives_an_unreadable_database(tmp_path):
+    cache = CoverCache(str(tmp_path / 'cover_cache.db'))
+    cache.db_path = str(tmp_path / 'missing-dir' / 'cover_cache.db')
+    cache.forget(CoverCache.prompt_hash(PROMPT))
+
+
+@pytest.fixture
+def covers(storyloom, monkeypatch, cache_path):
+    """generate_cover against a fresh cache (near-duplicates on), with renders counted"""
+    full = [storyloom.build_cover_prompt('The Door', 'Fantasy', summary) for summary in (PROMPT, NEAR)]
+    cache = CoverCache(cache_path, min_similarity=estimated_similarity(*full))
+    rendered = []
+
+    def render(title, genre, story_summary=''):
+        rendered.append(story_summary)
+        return {'imageBytes': f'cover {len(rendered)}'.encode(), 'prompt': story_summary, 'model': 'fake'}
+
+    monkeypatch.setattr(storyloom, 'cover_cache', cache)
+    monkeypatch.setattr(storyloom, 'render_cover_image', render)
+    monkeypatch.setattr(storyloom, 'store_cover_image', lambda data: (storyloom.cover_store.put(data), None))
+    return cache, rendered
+
+
+def test_repeated_prompt_reuses_the_cover_unless_regenerating(storyloom, covers):
+    cache, rendered = covers
+    first = storyloom.generate_cover('The Door', 'Fantasy', PROMPT)
+    again = storyloom.generate_cover('The Door', 'Fantasy', PROMPT)
+    fresh = storyloom.generate_cover('The Door', 'Fantasy', PROMPT, regenerate=True)
+
+    assert again['coverHash'] == first['coverHash'] and again['cached'] == 'exact'
+    assert fresh['cached'] is None and fresh['coverHash'] != first['coverHash']
+    assert len(rendered) == 2
+
+
+def test_similar_entry_with_a_missing_blob_is_forgotten(storyloom, covers):
+    cache, rendered = covers
+    full_prompt = storyloom.build_cover_prompt('The Door', 'Fantasy', PROMPT)
+    cache.store(full_prompt, MISSING_COVER)
+
+    cover = storyloom.generate_cover('The Door', 'Fantasy', NEAR)
+    assert cover['cached'] is None and len(rendered) == 1
+
+    # The stale near-duplicate is gone, so the original prompt no longer finds the missing blob
+    hit = cache.lookup(full_prompt)
+    assert hit['coverHash'] == cover['coverHash'] and hit['match'] == 'similar'
@@ -0,0 +1,39 @@
+"""
+Precomputed metadata responses: ETag revalidation for every representation,
+including ones the compression hook encoded on the way out.
+"""
+
+import pytest
+
+import compression
+
+
+@pytest.fixture
+def client(storyloom):
+    return storyloom.app.test_client()
+
+
+def test_identity_and_gzip_etags_revalidate(client):
+    for encoding in ('identity', 'gzip'):
+        first = client.get('/api/age-groups', headers={'Accept-Encoding': encoding})
+        etag = first.headers['ETag']
+        again = client.get('/api/age-groups', headers={'Accept-Encoding': encoding, 'If-None-Match': etag})
+        assert (first.status_code, again.status_code) == (200, 304)
+
+
+def test_etag_of_a_hook_compressed_copy_revalidates(client, monkeypatch):
+    # Stand-in for brotli, which is optional
+    monkeypatch.setitem(compression.ENCODERS, 'br', lambda data: b'br:' + data)
+
+    first = client.get('/api/age-groups', headers={'Accept-Encoding': 'br'})
+    assert first.headers['Content-Encoding'] == 'br'
+    etag = first.headers['ETag']
+    assert etag.endswith('-br"')
+
+    again = client.get('/api/age-groups', headers={'Accept-Encoding': 'br', 'If-None-Match': etag})
+    assert again.status_code == 304
+
+
+def test_other_etags_get_the_document(client):
+    response = client.get('/api/age-groups', headers={'If-None-Match': '"0123abcd-br"'})
+    assert response.status_code == 200
@@ -0,0 +1,73 @@
+"""
+Cover pipeline: oversized images are refused from their header, before any
+pixels are decoded, without changing Pillow's process-wide limit.
+"""
+
+import io
+import struct
+import zlib
+
+import pytest
+from PIL import Image
+
+import image_pipeline
+
+
+def png_header(width, height):
+    """A PNG that declares `width` x `height` but carries a single row's worth of pixel data"""
+    def chunk(kind, body):
+        return struct.pack('>I', len(body)) + kind + body + struct.pack('>I', zlib.crc32(kind + body))
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)) +
+            chunk(b'IDAT', zlib.compress(b'\x00' * 4)) + chunk(b'IEND', b''))
+
+
+def png(width, height):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), 'orange').save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def test_pillow_limit_is_left_alone():
+    # Pillow's default (about a quarter gigabyte of 24-bit pixels)
+    assert Image.MAX_IMAGE_PIXELS == 1024 * 1024 * 1024 // 4 // 3
+
+
+def test_cover_is_reencoded():
+    processed = image_pipeline.process_cover(png(600, 400))
+    assert (processed['sourceFormat'], processed['width'], processed['height']) == ('PNG', 600, 400)
+    assert sorted(processed['thumbnails']) == [128, 256, 512]
+
+
+def test_reported_size_is_the_stored_masters():
+    processed = image_pipeline.process_cover(png(1600, 1000))
+    master = Image.open(io.BytesIO(processed['master']))
+    assert (processed['width'], processed['height']) == master.size == (768, 480)
+
+
+@pytest.mark.parametrize('width, height', ((8000, 8000), (200000, 200000)))
+def test_oversized_image_is_refused_from_its_header(width, height):
+    # Almost no pixel data follows the header: decoding it would fail differently
+    with pytest.raises(image_pipeline.ImageTooLargeError):
+        image_pipeline.process_cover(png_header(width, height))
+
+
+def test_limit_is_configurable(monkeypatch):
+    monkeypatch.setattr(image_pipeline, 'MAX_PIXELS', 100 * 100)
+    image_pipeline.process_cover(png(100, 100))
+    with pytest.raises(image_pipeline.ImageTooLargeError):
+        image_pipeline.process_cover(png(101, 100))
+
+
+def test_oversized_cover_is_not_stored(storyloom, monkeypatch, capsys):
+    monkeypatch.setattr(image_pipeline, 'process_cover_in_pool', image_pipeline.process_cover)
+    assert storyloom.store_cover_image(png_header(8000, 8000)) == (None, None)
+    assert 'too large' in capsys.readouterr().out
+
+
+@pytest.mark.parametrize('size', ('abc', '', '100', '-128'))
+def test_cover_endpoint_rejects_sizes_that_are_not_thumbnails(storyloom, size):
+    cover_hash = storyloom.cover_store.put(png(64, 64))
+    client = storyloom.app.test_client()
+
+    assert client.get(f'/api/covers/{cover_hash}', query_string={'size': size}).status_code == 400
+    assert client.get(f'/api/covers/{cover_hash}').status_code == 200
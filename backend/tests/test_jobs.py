@@ -0,0 +1,92 @@
+"""
+Job queue restarts: workers start with the app, so jobs left queued (or
+stranded as running) by a previous process are processed without a new enqueue,
+and processes started with no workers (CLI scripts) never claim any.
+"""
+
+import contextlib
+import io
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from jobs import JobQueue
+from models import db, Job, User
+
+
+def seed_job(storyloom, kind, status='queued', updated_at=None):
+    with storyloom.app.app_context():
+        user = User.query.filter_by(username='jobs_restart').first()
+        if user is None:
+            user = User(username='jobs_restart', email='jobs_restart@example.com', password_hash='-')
+            db.session.add(user)
+            db.session.commit()
+        job = Job(id=uuid.uuid4().hex, kind=kind, status=status, params=json.dumps({'n': 1}),
+                  result=json.dumps({}), user_id=user.id, updated_at=updated_at or datetime.utcnow())
+        db.session.add(job)
+        db.session.commit()
+        return job.id
+
+
+def wait_for_status(storyloom, job_id, status, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with storyloom.app.app_context():
+            job = db.session.get(Job, job_id)
+            if job.status == status:
+                return job.to_dict()
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} never reached {status}")
+
+
+def test_fresh_queue_processes_jobs_left_by_a_previous_process(storyloom):
+    queued = seed_job(storyloom, 'restart_probe')
+    stranded = seed_job(storyloom, 'restart_probe', status='running',
+                        updated_at=datetime.utcnow() - timedelta(hours=1))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Same order as app.py: the queue is bound to the app before handlers are registered
+        queue = JobQueue(storyloom.app, workers=1, poll_interval=0.05)
+        queue.register('restart_probe', lambda ctx: ctx.update(progress=50, doubled=ctx.params['n'] * 2))
+
+        for job_id in (queued, stranded):
+            job = wait_for_status(storyloom, job_id, 'done')
+            assert job['progress'] == 100
+
+
+def test_queue_without_workers_leaves_jobs_for_the_server(storyloom):
+    queued = seed_job(storyloom, 'cli_probe')
+
+    queue = JobQueue(storyloom.app, workers=0, poll_interval=0.05)
+    queue.register('cli_probe', lambda ctx: None)
+    with storyloom.app.app_context():
+        queue.enqueue('cli_probe', db.session.get(Job, queued).user_id, {})
+    time.sleep(0.3)
+
+    with storyloom.app.app_context():
+        assert db.session.get(Job, queued).status == 'queued'
+
+
+def test_idle_workers_do_not_write(storyloom):
+    from sqlalchemy import event
+
+    queue = JobQueue(storyloom.app, workers=0, poll_interval=0.05)
+    queue.register('idle_probe', lambda ctx: None)
+    writes = []
+
+    def record(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith(('UPDATE', 'INSERT', 'DELETE')):
+            writes.append(statement)
+
+    with storyloom.app.app_context():
+        engine = db.engine
+        event.listen(engine, 'before_cursor_execute', record)
+        try:
+            for _ in range(5):
+                assert queue._claim_next() is None
+                db.session.remove()
+        finally:
+            event.remove(engine, 'before_cursor_execute', record)
+
+    assert writes == []
@@ -0,0 +1,196 @@
+"""
+Fuzz tests for json_extract: randomly generated documents, serialized the way
+models write them and then damaged with the defects seen in practice, must
+come back as the original structure (or, when truncated, a consistent prefix).
+"""
+
+import json
+import random
+import re
+
+import pytest
+
+from json_extract import extract_json, extract_json_report, repair_json
+
+SEEDS = range(200)
+WORDS = ('the fox ran over a hill and found a small door in an old tree near the river '
+         "it's Ana's café: naïve, bright; (really) 100% — fine").split()
+
+
+def random_text(rng):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 12)))
+
+
+def random_value(rng, depth=0):
+    kind = rng.choice(('str', 'str', 'int', 'bool', 'null', 'list', 'dict') if depth < 3 else ('str', 'int'))
+    if kind == 'str':
+        return random_text(rng)
+    if kind == 'int':
+        return rng.randint(-1000, 100000)
+    if kind == 'bool':
+        return rng.random() < 0.5
+    if kind == 'null':
+        return None
+    if kind == 'list':
+        return [random_value(rng, depth + 1) for _ in range(rng.randint(0, 4))]
+    return random_document(rng, depth + 1)
+
+
+def random_document(rng, depth=0):
+    keys = rng.sample(('title', 'genre', 'content', 'readTime', 'questions', 'options', 'word',
+                       'definition', 'example', 'correctAnswer', 'imageDescription'), rng.randint(1, 6))
+    return {key: random_value(rng, depth) for key in keys}
+
+
+def serialize(document, rng):
+    """Pretty or compact, like different providers"""
+    return json.dumps(document, ensure_ascii=False, indent=rng.choice((None, 2)))
+
+
+def is_prefix_of(recovered, original):
+    """True if `recovered` is what a clean cut of `original` can leave behind"""
+    if recovered == original:
+        return True
+    if isinstance(original, str):
+        return isinstance(recovered, str) and original.startswith(recovered)
+    if isinstance(original, int) and not isinstance(original, bool):
+        return isinstance(recovered, int) and str(original).startswith(str(recovered))
+    if isinstance(original, list):
+        if not isinstance(recovered, list) or len(recovered) > len(original):
+            return False
+        return all(r == o for r, o in zip(recovered[:-1], original)) and \
+            (not recovered or is_prefix_of(recovered[-1], original[len(recovered) - 1]))
+    if isinstance(original, dict):
+        if not isinstance(recovered, dict):
+            return False
+        keys, original_keys = list(recovered), list(original)
+        if keys != original_keys[:len(keys)]:
+            return False
+        if any(recovered[k] != original[k] for k in keys[:-1]):
+            return False
+        # A key whose value was cut off entirely is closed with null
+        return not keys or recovered[keys[-1]] is None or is_prefix_of(recovered[keys[-1]], original[keys[-1]])
+    return False
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_clean_output_is_returned_unrepaired(seed):
+    rng = random.Random(seed)
+    document = random_document(rng)
+    assert extract_json_report(serialize(document, rng)) == (document, False)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_wrapped_output(seed):
+    rng = random.Random(seed)
+    document = random_document(rng)
+    text = serialize(document, rng)
+    wrappers = (
+        '```json\n{}\n```',
+        '```\n{}\n```',
+        'Here is the story {{as requested}}:\n{}\nWant changes? Reply with {{edits}}.',
+        'Sure! {}',
+    )
+    assert extract_json(rng.choice(wrappers).format(text)) == document
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_first_of_several_objects(seed):
+    rng = random.Random(seed)
+    first, second = random_document(rng), random_document(rng)
+    assert extract_json(f'{serialize(first, rng)}\n\nOr, alternatively:\n{serialize(second, rng)}') == first
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_trailing_commas(seed):
+    rng = random.Random(seed)
+    document = random_document(rng)
+    text = serialize(document, rng)
+    # A comma before some of the closing brackets (never inside strings: generated text has none)
+    damaged = re.sub(r'(?<=["\de\]}l])(\s*)([}\]])', lambda m: (',' if rng.random() < 0.7 else '') + m.group(1) +
+                     m.group(2), text)
+    value, repaired = extract_json_report(damaged)
+    assert value == document
+    assert repaired == (damaged != text)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_smart_quotes(seed):
+    rng = random.Random(seed)
+    document = random_document(rng)
+    parts = serialize(document, rng).split('"')
+    # Word processors turn every straight quote into an opening or closing curly one
+    damaged = parts[0] + ''.join(('”' if i % 2 else '“') + part for i, part in enumerate(parts[1:]))
+    assert extract_json(damaged) == document
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_literal_newlines_in_strings(seed):
+    rng = random.Random(seed)
+    document = {'title': random_text(rng),
+                'content': '\n\n'.join(random_text(rng) for _ in range(rng.randint(2, 5)))}
+    damaged = serialize(document, rng).replace('\\n', '\n')
+    assert extract_json(damaged) == document
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_truncated_output_keeps_a_consistent_prefix(seed):
+    rng = random.Random(seed)
+    document = random_document(rng)
+    text = serialize(document, rng)
+    cut = text[:rng.randint(2, len(text) - 1)]
+    if rng.random() < 0.3:
+        cut = '```json\n' + cut
+    try:
+        value = extract_json(cut)
+    except json.JSONDecodeError:
+        # Nothing complete yet (cut inside the first key or value)
+        return
+    assert isinstance(value, dict)
+    assert is_prefix_of(value, document), (cut, value)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_every_cut_of_one_document(seed):
+    rng = random.Random(seed)
+    document = {'title': random_text(rng), 'questions': [
+        {'question': random_text(rng), 'options': [random_text(rng) for _ in range(4)], 'correctAnswer': 2}]}
+    text = serialize(document, rng)
+    for end in range(len(text) - len(text) // 4, len(text) + 1):
+        try:
+            value = extract_json(text[:end])
+        except json.JSONDecodeError:
+            continue
+        assert is_prefix_of(value, document), text[:end]
+
+
+def test_unescaped_quotes_inside_strings():
+    text = '{"title": "The "Old" Tree", "content": "She said "hello" and left.", "readTime": "3 min"}'
+    assert extract_json(text) == {'title': 'The "Old" Tree', 'content': 'She said "hello" and left.',
+                                  'readTime': '3 min'}
+
+
+def test_key_without_value_is_closed_with_null():
+    assert extract_json('{"title": "A", "genre":') == {'title': 'A', 'genre': None}
+
+
+def test_repair_json_returns_end_of_value():
+    text = 'prefix {"a": [1, 2,], } suffix'
+    repaired, end = repair_json(text, text.index('{'))
+    assert json.loads(repaired) == {'a': [1, 2]}
+    assert text[end:] == ' suffix'
+
+
+def test_output_cut_right_after_the_opening_brace():
+    assert extract_json('Here it is: {') == {}
+
+
+@pytest.mark.parametrize('text', ('', 'no json here', '{{{', '{"', '[1, 2, 3]', '{as requested}'))
+def test_unrecoverable_output_raises(text):
+    with pytest.raises(json.JSONDecodeError):
+        extract_json(text)
+
+
+def test_extract_json_does_not_print(capsys):
+    extract_json('```json\n{"title": "A",}\n```')
+    assert capsys.readouterr().out == ''
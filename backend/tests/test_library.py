@@ -0,0 +1,84 @@
+"""
+Library endpoints: keyset-paginated, projected listings, and saving stories
+(repeated saves return the stored copy; an Idempotency-Key reused for a
+different story is refused).
+"""
+
+
+def story(title, content='A fox.\n\nA door.', genre='Fantasy'):
+    return {'title': title, 'genre': genre, 'content': content, 'ageGroup': 'children'}
+
+
+def save_stories(client, count):
+    """Save `count` distinct stories; returns their ids, oldest first"""
+    ids = []
+    for i in range(count):
+        response = client.post('/api/library/stories', json=story(f'Story {i}', f'Text of story {i}. ' * 20))
+        assert response.status_code == 201
+        ids.append(response.get_json()['story']['id'])
+    return ids
+
+
+def test_cursor_pages_cover_the_library_newest_first(register):
+    client = register('library_pages')
+    ids = save_stories(client, 5)
+
+    seen, pages, params = [], 0, {'limit': 2}
+    while params:
+        response = client.get('/api/library/stories', query_string=params)
+        assert response.status_code == 200
+        page = response.get_json()
+        seen += [s['id'] for s in page['stories']]
+        pages += 1
+        params = {'limit': 2, 'cursor': page['nextCursor']} if page['nextCursor'] else None
+
+    assert pages == 3
+    assert seen == ids[::-1]
+
+
+def test_summary_projection_is_the_default(register):
+    client = register('library_summary')
+    save_stories(client, 1)
+
+    listed = client.get('/api/library/stories', query_string={'limit': 10}).get_json()['stories'][0]
+    assert set(listed) == {'id', 'title', 'genre', 'ageGroup', 'readTime', 'coverImage', 'excerpt', 'createdAt'}
+    assert listed['excerpt'] == ('Text of story 0. ' * 20)[:100]
+
+
+def test_fields_select_only_the_requested_columns(register):
+    client = register('library_fields')
+    save_stories(client, 1)
+
+    listed = client.get('/api/library/stories', query_string={'fields': 'title, genre'}).get_json()['stories']
+    assert listed == [{'title': 'Story 0', 'genre': 'Fantasy'}]
+
+
+def test_unknown_fields_and_bad_cursors_are_rejected(register):
+    client = register('library_rejects')
+
+    response = client.get('/api/library/stories', query_string={'fields': 'title,password_hash'})
+    assert response.status_code == 400
+    assert 'password_hash' in response.get_json()['error']
+    assert client.get('/api/library/stories', query_string={'cursor': 'not-a-cursor'}).status_code == 400
+
+
+def test_repeated_idempotency_key_returns_the_saved_story(register):
+    client = register('library_retry')
+    headers = {'Idempotency-Key': 'save-1'}
+
+    first = client.post('/api/library/stories', json=story('The Door'), headers=headers)
+    retry = client.post('/api/library/stories', json=story('The Door'), headers=headers)
+
+    assert (first.status_code, retry.status_code) == (201, 200)
+    assert retry.get_json()['story']['id'] == first.get_json()['story']['id']
+
+
+def test_idempotency_key_reused_for_a_different_story_is_a_conflict(register):
+    client = register('library_key_reuse')
+    headers = {'Idempotency-Key': 'save-1'}
+
+    assert client.post('/api/library/stories', json=story('The Door'), headers=headers).status_code == 201
+    response = client.post('/api/library/stories', json=story('The Window'), headers=headers)
+
+    assert response.status_code == 409
+    assert len(client.get('/api/library/stories').get_json()['stories']) == 1
@@ -0,0 +1,204 @@
+"""
+PostgreSQL path: every migration on a pre-migration (baseline) schema, and the
+conditional UPDATEs behind the quota and the materialized stats under
+concurrency. Skipped unless TEST_POSTGRES_URL points at a server; a scratch
+database is created there and dropped afterwards.
+
+    TEST_POSTGRES_URL=postgresql://postgres@localhost:5432/postgres python -m pytest tests/test_postgres.py
+"""
+
+import base64
+import contextlib
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import make_url
+
+POSTGRES_URL = os.getenv('TEST_POSTGRES_URL')
+
+pytestmark = pytest.mark.skipif(not POSTGRES_URL, reason='TEST_POSTGRES_URL is not set')
+
+# The schema as it was before migrate_db.py's first migration
+LEGACY_SCHEMA = [
+    'CREATE TABLE "user" ('
+    'id SERIAL PRIMARY KEY, username VARCHAR(80) NOT NULL UNIQUE, email VARCHAR(120) NOT NULL UNIQUE, '
+    'password_hash VARCHAR(128) NOT NULL, created_at TIMESTAMP)',
+    'CREATE TABLE story ('
+    'id SERIAL PRIMARY KEY, title VARCHAR(200) NOT NULL, genre VARCHAR(50) NOT NULL, content TEXT NOT NULL, '
+    'age_group VARCHAR(20) NOT NULL, read_time VARCHAR(20), cover_image TEXT, questions TEXT, flashcards TEXT, '
+    'created_at TIMESTAMP, user_id INTEGER NOT NULL REFERENCES "user" (id))',
+]
+
+# Smallest valid PNG (1x1), as the frontend used to send covers
+PNG = base64.b64decode('iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg==')
+
+
+@pytest.fixture(scope='module')
+def pg_app(storyloom):
+    """A minimal app bound to a fresh PostgreSQL database"""
+    from database import database_url, init_database
+    from models import db
+
+    server_url = make_url(database_url(POSTGRES_URL))
+    name = f'storyloom_test_{os.getpid()}'
+    admin = create_engine(server_url, isolation_level='AUTOCOMMIT')
+    with admin.connect() as conn:
+        conn.execute(text(f'DROP DATABASE IF EXISTS {name}'))
+        conn.execute(text(f'CREATE DATABASE {name}'))
+
+    flask_app = Flask(__name__)
+    flask_app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    init_database(flask_app, server_url.set(database=name).render_as_string(hide_password=False))
+    yield flask_app
+
+    with flask_app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+    with admin.connect() as conn:
+        conn.execute(text(f'DROP DATABASE IF EXISTS {name}'))
+    admin.dispose()
+
+
+@pytest.fixture(scope='module')
+def migrated(pg_app):
+    """The legacy schema with a few rows, upgraded by migrate_db.py; returns the migration output"""
+    import migrate_db
+    from models import db
+
+    cover = 'data:image/png;base64,' + base64.b64encode(PNG).decode()
+    with pg_app.app_context(), db.engine.begin() as conn:
+        for statement in LEGACY_SCHEMA:
+            conn.execute(text(statement))
+        conn.execute(text(
+            'INSERT INTO "user" (username, email, password_hash, created_at) VALUES '
+            "('ana', 'ana@example.com', 'x', now()), ('ben', 'ben@example.com', 'x', now())"))
+        conn.execute(text(
+            'INSERT INTO story (title, genre, content, age_group, read_time, cover_image, questions, flashcards, '
+            'created_at, user_id) VALUES '
+            "('The Door', 'Fantasy', 'A fox found a door.', 'children', '1 min', :cover, "
+            """'[{"question": "What?", "options": ["a", "b", "c", "d"], "correct": 0}]', '', now(), 1), """
+            "('The Door', 'Fantasy', 'A fox found a door.', 'children', '1 min', NULL, 'not json', NULL, now(), 1), "
+            "('The Boat', 'Adventure', 'A bear built a boat.', 'teens', '2 min', NULL, '[]', '[]', now(), 2)"
+        ), {'cover': cover})
+
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        migrate_db.migrate_database(pg_app)
+    return output.getvalue()
+
+
+def test_all_migrations_apply_on_postgres(pg_app, migrated):
+    import migrate_db
+    from models import db
+
+    for version, name, _ in migrate_db.MIGRATIONS:
+        assert f'Applying migration {version}: {name}' in migrated
+    assert 'skipped on postgresql' in migrated  # FTS5 search index
+
+    with pg_app.app_context():
+        applied = {row[0] for row in db.session.execute(text('SELECT version FROM schema_migrations'))}
+        assert applied == {version for version, _, _ in migrate_db.MIGRATIONS}
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            migrate_db.migrate_database(pg_app)
+        assert 'already up to date' in output.getvalue()
+
+
+def test_migrated_schema_and_data(pg_app, migrated):
+    from models import db, Story, UserStats
+
+    with pg_app.app_context():
+        inspector = inspect(db.engine)
+        columns = {c['name']: type(c['type']).__name__.upper() for c in inspector.get_columns('story')}
+        assert columns['questions'] == columns['flashcards'] == 'JSON'
+        assert {'cover_hash', 'content_hash', 'idempotency_key'} <= set(columns)
+        assert {'quota_day', 'quota_used', 'stories_generated'} <= {c['name'] for c in inspector.get_columns('user')}
+        indexes = {index['name']: index for index in inspector.get_indexes('story')}
+        assert indexes['uq_story_user_id_content_hash']['unique']
+        assert 'ix_story_user_id_created_at' in indexes
+
+        first, duplicate, other = Story.query.order_by(Story.id).all()
+        assert first.questions[0]['question'] == 'What?'
+        assert first.flashcards == [] and duplicate.questions == [] and duplicate.flashcards == []
+        assert first.cover_image is None and first.cover_hash
+        # The oldest copy keeps the hash, the duplicate is left unhashed
+        assert first.content_hash and duplicate.content_hash is None and other.content_hash
+
+        stats = db.session.get(UserStats, first.user_id)
+        assert stats.total_saved == 2 and stats.genre_counts == {'Fantasy': 2}
+
+
+def test_search_falls_back_to_like_on_postgres(pg_app, migrated):
+    import search
+
+    with pg_app.app_context():
+        assert not search.is_indexed()
+        results, has_more = search.search_stories(2, 'bear boat', 10, 0)
+        assert [r['title'] for r in results] == ['The Boat'] and not has_more
+        assert results[0]['score'] is None and '<mark>' in results[0]['snippet']
+
+
+def run_in_threads(pg_app, fn, count):
+    """Call fn(i) from `count` threads at once, each in its own app context (own session)"""
+    barrier = threading.Barrier(count)
+
+    def worker(i):
+        with pg_app.app_context():
+            barrier.wait()
+            return fn(i)
+
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        return list(pool.map(worker, range(count)))
+
+
+def test_quota_update_is_atomic_on_postgres(pg_app, migrated):
+    from models import db, User
+    from quota import consume_story_quota, refund_story_quota
+
+    with pg_app.app_context():
+        user_id = User.query.filter_by(username='ana').first().id
+
+    granted = [day for day in run_in_threads(pg_app, lambda _: consume_story_quota(user_id, limit=5), 20) if day]
+
+    with pg_app.app_context():
+        assert len(granted) == 5
+        assert db.session.get(User, user_id).quota_used == 5
+        refund_story_quota(user_id, granted[0])
+        assert db.session.get(User, user_id, populate_existing=True).quota_used == 4
+        assert consume_story_quota(user_id, limit=5) is not None
+        assert consume_story_quota(user_id, limit=5) is None
+
+
+def test_stats_updates_are_atomic_on_postgres(pg_app, migrated):
+    import user_stats
+    from models import db, Story, User, UserStats
+
+    with pg_app.app_context():
+        user_id = User.query.filter_by(username='ben').first().id
+        before = db.session.get(UserStats, user_id).stories_generated
+
+    genres = ('Fantasy', 'Mystery', 'Adventure')
+
+    def save(i):
+        genre = genres[i % len(genres)]
+        db.session.add(Story(title=f'Story {i}', genre=genre, content=f'Text {i}', age_group='teens',
+                             read_time='1 min', user_id=user_id))
+        user_stats.story_added(user_id, genre, 'teens')
+        user_stats.record_activity(user_id)
+        db.session.commit()
+
+    run_in_threads(pg_app, save, 20)
+
+    with pg_app.app_context():
+        stats = db.session.get(UserStats, user_id)
+        assert stats.stories_generated == before + 20
+        counted = user_stats.compute_library_counts(user_id)
+        assert stats.total_saved == counted['total_saved'] == 21
+        assert stats.genre_counts == counted['genre_counts']
+        assert stats.age_group_counts == counted['age_group_counts'] == {'teens': 21}
@@ -0,0 +1,79 @@
+"""
+Daily story quota under concurrency: parallel generations from one user never
+go past the limit, and failed generations are refunded.
+"""
+
+import contextlib
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from conftest import FakeProvider
+from models import db, User
+
+PARALLEL_REQUESTS = 50
+
+
+def fire_in_parallel(storyloom, client, path, requests=PARALLEL_REQUESTS):
+    """POST `path` from `requests` threads at once, all as the client's user; returns the status codes"""
+    session_cookie = client.get_cookie('session').value
+    barrier = threading.Barrier(requests)
+
+    def fire(_):
+        request_client = storyloom.app.test_client()
+        request_client.set_cookie('session', session_cookie)
+        barrier.wait()
+        response = request_client.post(path, json={'theme': 'Fantasy'})
+        response.get_data()  # drains streamed responses, so their refunds have run
+        return response.status_code
+
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        with ThreadPoolExecutor(max_workers=requests) as pool:
+            return list(pool.map(fire, range(requests)))
+
+
+def quota_used(storyloom, username):
+    with storyloom.app.app_context():
+        return db.session.query(User.quota_used).filter_by(username=username).scalar()
+
+
+@pytest.mark.parametrize('fail_every', (0, 5, 2))
+def test_parallel_generations_respect_the_daily_limit(storyloom, use_provider, register, fail_every):
+    username = f'quota{fail_every}'
+    client = register(username)
+    use_provider(FakeProvider(fail_every=fail_every))
+
+    statuses = fire_in_parallel(storyloom, client, '/api/generate-story')
+
+    succeeded = statuses.count(200)
+    assert succeeded <= storyloom.DAILY_STORY_LIMIT
+    assert set(statuses) <= {200, 429, 500}
+    # Every failed generation was refunded: the counter is exactly the stories delivered
+    assert quota_used(storyloom, username) == succeeded
+    if not fail_every:
+        assert succeeded == storyloom.DAILY_STORY_LIMIT
+
+
+def test_limit_holds_across_endpoints(storyloom, use_provider, register):
+    client = register('quota_mixed')
+    use_provider(FakeProvider(fail_every=3))
+
+    statuses = fire_in_parallel(storyloom, client, '/api/generate-story', requests=25)
+    statuses += fire_in_parallel(storyloom, client, '/api/generate-story/stream', requests=25)
+
+    used = quota_used(storyloom, 'quota_mixed')
+    assert used <= storyloom.DAILY_STORY_LIMIT
+    assert statuses[:25].count(200) <= used
+
+
+def test_rejected_request_does_not_consume_quota(storyloom, use_provider, register):
+    client = register('quota_full')
+    use_provider(FakeProvider())
+    for _ in range(storyloom.DAILY_STORY_LIMIT):
+        assert client.post('/api/generate-story', json={'theme': 'Fantasy'}).status_code == 200
+
+    assert client.post('/api/generate-story', json={'theme': 'Fantasy'}).status_code == 429
+    assert quota_used(storyloom, 'quota_full') == storyloom.DAILY_STORY_LIMIT
+    assert client.get('/api/user/stats').get_json()['storiesRemainingToday'] == 0
@@ -0,0 +1,89 @@
+"""
+Library search: FTS5 prefix matching and BM25 ranking, results limited to the
+user's own stories, and the LIKE fallback for databases without FTS5.
+"""
+
+import pytest
+
+import search
+
+
+def save(client, title, content, genre='Fantasy'):
+    response = client.post('/api/library/stories', json={
+        'title': title, 'genre': genre, 'content': content, 'ageGroup': 'children'})
+    assert response.status_code == 201
+    return response.get_json()['story']['id']
+
+
+def save_fillers(client, count=8):
+    """Unrelated stories, so BM25's document frequencies are meaningful in a small library"""
+    for i in range(count):
+        save(client, f'Filler {i}', f'Ordinary day number {i} at the market with apples and pears.')
+
+
+def find(client, query):
+    response = client.get('/api/library/search', query_string={'q': query})
+    assert response.status_code == 200
+    return response.get_json()['results']
+
+
+@pytest.fixture
+def like_fallback(monkeypatch):
+    monkeypatch.setattr(search, 'is_indexed', lambda: False)
+
+
+def test_fts_matches_the_last_word_as_a_prefix(storyloom, register):
+    client = register('search_prefix')
+    save_fillers(client)
+    lighthouse = save(client, 'The Keeper', 'A lighthouse keeper watched the storm roll in.')
+    save(client, 'The Baker', 'A baker made bread before sunrise.')
+
+    results = find(client, 'keeper light')
+    assert [r['id'] for r in results] == [lighthouse]
+    assert '<mark>' in results[0]['snippet']
+    assert results[0]['score'] > 0
+
+
+def test_fts_ranks_title_matches_first(storyloom, register):
+    client = register('search_rank')
+    save_fillers(client)
+    in_text = save(client, 'A Quiet Night', 'Far away a dragon slept while the village was quiet all night long.')
+    in_title = save(client, 'The Dragon', 'Nobody in the valley had seen anything like it before that night.')
+
+    results = find(client, 'dragon')
+    assert [r['id'] for r in results] == [in_title, in_text]
+    assert results[0]['score'] > results[1]['score']
+
+
+def test_search_only_returns_the_users_own_stories(storyloom, register):
+    owner = register('search_owner')
+    other = register('search_other')
+    mine = save(owner, 'Moonlit Harbor', 'Boats rocked gently in the moonlit harbor.')
+    save(other, 'Moonlit Harbor Too', 'More boats rocked in another moonlit harbor.')
+
+    assert [r['id'] for r in find(owner, 'moonlit harbor')] == [mine]
+
+
+def test_query_is_required(storyloom, register):
+    client = register('search_required')
+    assert client.get('/api/library/search', query_string={'q': '  '}).status_code == 400
+
+
+def test_like_fallback_searches_the_users_stories(storyloom, register, like_fallback):
+    owner = register('search_like')
+    other = register('search_like_other')
+    mine = save(owner, 'Copper Kettle', 'The copper kettle whistled on the stove.')
+    save(other, 'Copper Kettle Too', 'Another copper kettle whistled.')
+
+    results = find(owner, 'kettle whistled')
+    assert [r['id'] for r in results] == [mine]
+    assert results[0]['score'] is None
+    assert '<mark>whistled</mark>' in results[0]['snippet']
+
+
+def test_like_fallback_treats_underscores_literally(storyloom, register, like_fallback):
+    client = register('search_like_escape')
+    literal = save(client, 'Variables', 'The robot named snake_case blinked twice.')
+    save(client, 'Lookalike', 'The robot named snakeXcase blinked twice.')
+
+    assert [r['id'] for r in find(client, 'snake_case')] == [literal]
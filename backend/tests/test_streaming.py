@@ -0,0 +1,153 @@
+"""
+Streaming generation: once the story object is complete, the provider's stream
+(and the HTTP response behind it) is closed right away, not at garbage collection.
+"""
+
+import json
+
+import pytest
+
+import ai_providers
+from conftest import FakeProvider
+
+
+class TrailingChatterProvider(FakeProvider):
+    """Streams the story in small chunks, then keeps talking; records whether each stream was closed"""
+
+    def __init__(self):
+        super().__init__()
+        self.streams = []  # keeps the generators referenced, so only an explicit close() can finish them
+        self.closed = []
+        self.chatter_sent = 0
+
+    def stream_content(self, prompt):
+        stream = self._stream(prompt, len(self.streams))
+        self.streams.append(stream)
+        self.closed.append(False)
+        return stream
+
+    def _stream(self, prompt, index):
+        text = self.generate_content(prompt)
+        try:
+            for start in range(0, len(text), 50):
+                yield text[start:start + 50]
+            for _ in range(100):
+                self.chatter_sent += 1
+                yield '\nHope you enjoyed the story!'
+        finally:
+            self.closed[index] = True
+
+
+def test_provider_stream_is_closed_when_the_story_is_complete(use_provider, register):
+    client = register('stream_close')
+    provider = use_provider(TrailingChatterProvider())
+
+    response = client.post('/api/generate-story/stream', json={'theme': 'Fantasy'})
+    body = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert 'The fox ran over a hill' in body
+    assert provider.closed == [True]
+    assert provider.chatter_sent <= 1
+
+
+class FakeStreamResponse:
+    """A stream=True requests.Response stand-in serving server-sent events"""
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.closed = True
+
+    def raise_for_status(self):
+        pass
+
+    def iter_lines(self, decode_unicode=False):
+        return iter(self.lines)
+
+
+def test_github_response_is_released_when_the_stream_is_closed(monkeypatch):
+    events = [f'data: {json.dumps({"choices": [{"delta": {"content": word}}]})}' for word in ('{"a":', ' 1}', ' more')]
+    response = FakeStreamResponse(events + ['data: [DONE]'])
+    monkeypatch.setattr(ai_providers.http_client, 'post', lambda *args, **kwargs: response)
+    monkeypatch.setenv('GITHUB_TOKEN', 'offline-tests')
+    provider = ai_providers.GitHubModelProvider('openai/gpt-4o-mini', 'GPT-4o mini')
+
+    stream = provider.stream_content('prompt')
+    assert next(stream) == '{"a":'
+    assert not response.closed
+    stream.close()
+    assert response.closed
+
+
+def test_parser_skips_braced_prose_before_the_document():
+    from json_stream import IncrementalJSONParser
+
+    text = 'Sure {as requested}: {"title": "The Door", "pages": 3}'
+    parser = IncrementalJSONParser()
+    events = []
+    for start in range(0, len(text), 7):
+        events.extend(parser.feed(text[start:start + 7]))
+
+    assert parser.done
+    assert parser.result == {'title': 'The Door', 'pages': 3}
+    assert ('field', 'title', 'The Door') in events
+
+
+class BracedPreambleProvider(FakeProvider):
+    """Opens with prose containing braces before the story document, in small chunks"""
+
+    def stream_content(self, prompt):
+        text = 'Sure {as requested}: ' + self.generate_content(prompt)
+        for start in range(0, len(text), 16):
+            yield text[start:start + 16]
+
+
+def test_stream_reads_past_a_braced_preamble(use_provider, register):
+    client = register('stream_preamble')
+    provider = use_provider(BracedPreambleProvider())
+
+    response = client.post('/api/generate-story/stream', json={'theme': 'Fantasy'})
+    body = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert 'event: error' not in body
+    done = body.split('event: done\ndata: ', 1)[1].split('\n', 1)[0]
+    assert json.loads(done)['title'] == 'The Door 1'
+    assert provider.calls == 1
+
+
+class MidStreamFailureProvider(FakeProvider):
+    def stream_content(self, prompt):
+        yield '{"title": "The Door",'
+        raise RuntimeError('connection reset mid-stream')
+
+
+def test_streaming_keeps_first_chunk_latency_out_of_the_hedge_window(storyloom, use_provider):
+    provider = use_provider(FakeProvider())
+    manager = storyloom.ai_manager
+
+    assert ''.join(manager.stream_content('prompt'))
+    health = manager.health[provider.name]
+    assert health.sample_count() == 0
+    assert health.snapshot()['p50_first_chunk'] is not None
+    assert manager.current_hedge_delay(provider) == manager.hedge_delay
+
+
+def test_mid_stream_failure_reaches_the_circuit_breaker(storyloom, use_provider):
+    provider = use_provider(MidStreamFailureProvider())
+    manager = storyloom.ai_manager
+
+    stream = manager.stream_content('prompt')
+    assert next(stream) == '{"title": "The Door",'
+    with pytest.raises(RuntimeError):
+        next(stream)
+    assert manager.health[provider.name].consecutive_failures == 1
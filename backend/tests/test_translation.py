@@ -0,0 +1,204 @@
+"""
+Translation service: pluggable backends, batching by the backend's own limits,
+and the translation memory's hit / miss paths (in-process LRU and SQLite).
+"""
+
+import pytest
+
+from translation import (GoogleTranslateBackend, LocalTranslatorBackend, TranslationMemory, TranslationService,
+                         TranslatorBackend, create_backend)
+
+
+class RecordingBackend(LocalTranslatorBackend):
+    """Local backend that records every batch it is sent"""
+
+    def __init__(self, max_chars=4500, separator='\n\n'):
+        super().__init__(max_chars, separator)
+        self.batches = []
+
+    def translate_batch(self, texts, target, source='en'):
+        self.batches.append(list(texts))
+        return super().translate_batch(texts, target, source)
+
+
+@pytest.fixture
+def memory_path(tmp_path):
+    return str(tmp_path / 'translation_memory.db')
+
+
+@pytest.fixture
+def service(memory_path):
+    backend = RecordingBackend()
+    return TranslationService(backend, TranslationMemory(memory_path), max_workers=2)
+
+
+def test_backend_must_implement_translate_batch():
+    with pytest.raises(TypeError):
+        TranslatorBackend()
+
+    class Incomplete(TranslatorBackend):
+        name = 'incomplete'
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+@pytest.fixture
+def google_module(monkeypatch):
+    """deep_translator.google, restored afterwards: GoogleTranslateBackend() swaps its `requests`"""
+    import deep_translator.google
+    monkeypatch.setattr(deep_translator.google, 'requests', deep_translator.google.requests)
+    return deep_translator.google
+
+
+def test_create_backend(monkeypatch, google_module):
+    assert isinstance(create_backend('local'), LocalTranslatorBackend)
+    monkeypatch.setenv('TRANSLATOR_BACKEND', 'google')
+    assert isinstance(create_backend(), GoogleTranslateBackend)
+    with pytest.raises(ValueError):
+        create_backend('babelfish')
+
+
+def test_misses_go_to_the_backend_once_and_keep_order(service):
+    texts = ['Once upon a time', 'The end', 'Once upon a time', '']
+    assert service.translate_texts(texts, 'de') == [
+        '[de] Once upon a time', '[de] The end', '[de] Once upon a time', '[de] ']
+    # Duplicates are sent once
+    assert service.backend.batches == [['Once upon a time', 'The end', '']]
+    assert service.get_stats() == {'hits': 0, 'disk_hits': 0, 'misses': 3}
+
+
+def test_repeats_are_served_from_memory(service):
+    service.translate_texts(['Once upon a time', 'The end'], 'de')
+    service.backend.batches.clear()
+
+    assert service.translate_texts(['The end', 'A new line'], 'de') == ['[de] The end', '[de] A new line']
+    assert service.backend.batches == [['A new line']]
+    assert service.get_stats()['hits'] == 1
+
+    # Another target language is a separate entry
+    service.translate_texts(['The end'], 'fr')
+    assert service.backend.batches[-1] == ['The end']
+
+
+def test_memory_survives_a_restart(service, memory_path):
+    service.translate_texts(['Once upon a time', 'The end'], 'es')
+
+    # A new process: empty LRU, same SQLite file
+    restarted = TranslationService(RecordingBackend(), TranslationMemory(memory_path), max_workers=2)
+    assert restarted.translate_texts(['The end', 'Once upon a time'], 'es') == [
+        '[es] The end', '[es] Once upon a time']
+    assert restarted.backend.batches == []
+    assert restarted.get_stats() == {'hits': 0, 'disk_hits': 2, 'misses': 0}
+
+
+def test_lru_evicts_but_disk_still_answers(memory_path):
+    memory = TranslationMemory(memory_path, max_entries=2)
+    service = TranslationService(RecordingBackend(), memory, max_workers=1)
+    service.translate_texts(['one', 'two', 'three'], 'it')
+    assert len(memory._entries) == 2
+
+    assert service.translate_texts(['one'], 'it') == ['[it] one']
+    assert service.backend.batches == [['one', 'two', 'three']]
+    assert service.get_stats()['disk_hits'] == 1
+
+
+def test_same_language_is_returned_untouched(service):
+    assert service.translate_texts(['Hello'], 'en', source='en') == ['Hello']
+    assert service.backend.batches == []
+
+
+def test_batches_follow_the_backends_own_limits(memory_path):
+    texts = [f'Paragraph {i} ' + 'x' * 40 for i in range(10)]  # 53 characters each
+
+    narrow = TranslationService(RecordingBackend(max_chars=120, separator='\n#\n'), TranslationMemory(memory_path))
+    assert narrow.translate_texts(texts, 'de') == [f'[de] {text}' for text in texts]
+    assert [len(batch) for batch in narrow.backend.batches] == [2] * 5
+    assert all(sum(len(t) + 3 for t in batch) <= 120 for batch in narrow.backend.batches)
+
+    wide = TranslationService(RecordingBackend(max_chars=10000, separator='\n\n'),
+                              TranslationMemory(memory_path + '.wide'))
+    wide.translate_texts(texts, 'de')
+    assert len(wide.backend.batches) == 1
+
+
+class FakeGoogleTranslator:
+    """Stands in for deep_translator.GoogleTranslator: uppercases, optionally losing the marker"""
+    requests = []
+    keep_marker = True
+
+    def __init__(self, source, target):
+        pass
+
+    def translate(self, text):
+        FakeGoogleTranslator.requests.append(text)
+        return text.upper() if self.keep_marker else text.upper().replace('|||', '')
+
+
+@pytest.fixture
+def fake_google(monkeypatch, google_module):
+    import deep_translator
+    monkeypatch.setattr(deep_translator, 'GoogleTranslator', FakeGoogleTranslator)
+    FakeGoogleTranslator.requests = []
+    FakeGoogleTranslator.keep_marker = True
+    return FakeGoogleTranslator
+
+
+def test_google_backend_packs_texts_with_its_separator(fake_google):
+    backend = GoogleTranslateBackend()
+    assert backend.translate_batch(['one', 'two', 'three'], 'de') == ['ONE', 'TWO', 'THREE']
+    assert fake_google.requests == ['one\n\n|||\n\ntwo\n\n|||\n\nthree']
+
+
+def test_google_backend_routes_deep_translator_through_the_pool(monkeypatch):
+    import deep_translator.google
+    import requests
+    monkeypatch.setattr(deep_translator.google, 'requests', requests)
+
+    GoogleTranslateBackend()
+    assert deep_translator.google.requests is not requests
+    assert deep_translator.google.requests.exceptions is requests.exceptions
+
+
+def test_google_backend_leaves_an_unexpected_deep_translator_alone(monkeypatch):
+    import deep_translator.google
+    monkeypatch.delattr(deep_translator.google, 'requests')
+
+    GoogleTranslateBackend()
+    assert not hasattr(deep_translator.google, 'requests')
+
+
+def test_google_backend_retries_individually_when_the_marker_is_lost(fake_google):
+    fake_google.keep_marker = False
+    assert GoogleTranslateBackend().translate_batch(['one', 'two'], 'de') == ['ONE', 'TWO']
+    assert fake_google.requests[1:] == ['one', 'two']
+
+
+def test_google_backend_custom_separator(fake_google):
+    backend = GoogleTranslateBackend(max_chars=1000, separator='\n@@\n')
+    assert backend.translate_batch(['one', 'two'], 'de') == ['ONE', 'TWO']
+    assert fake_google.requests == ['one\n@@\ntwo']
+
+
+def test_concurrent_first_translation_returns_the_stored_row(storyloom, register, monkeypatch):
+    import json
+    from models import db, StoryTranslation
+
+    client = register('translate_race')
+    story = client.post('/api/library/stories', json={
+        'title': 'The Door', 'genre': 'Fantasy', 'content': 'A fox.\n\nA door.', 'ageGroup': 'children'
+    }).get_json()['story']
+
+    def translated_elsewhere_first(story_row, language):
+        # The competing request commits its row while this one is still translating
+        with storyloom.app.app_context():
+            db.session.add(StoryTranslation(story_id=story_row.id, language=language,
+                                            payload=json.dumps({'title': 'La Puerta'})))
+            db.session.commit()
+        return {'title': 'Ignored'}
+
+    monkeypatch.setattr(storyloom, 'translate_story_payload', translated_elsewhere_first)
+    response = client.post(f"/api/library/stories/{story['id']}/translate/es")
+
+    assert response.status_code == 200
+    assert response.get_json()['translation']['title'] == 'La Puerta'
@@ -0,0 +1,66 @@
+"""
+Materialized user statistics: the stored counters follow saves, deletes and
+genre edits, and always agree with a recount of the story table.
+"""
+
+from models import db, User
+from user_stats import compute_library_counts
+
+
+def save(client, title, genre, age_group='children'):
+    response = client.post('/api/library/stories', json={
+        'title': title, 'genre': genre, 'content': f'{title} happened. ' * 10, 'ageGroup': age_group})
+    assert response.status_code == 201
+    return response.get_json()['story']['id']
+
+
+def stats(client):
+    response = client.get('/api/user/stats')
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def recount(storyloom, username):
+    with storyloom.app.app_context():
+        user_id = db.session.query(User.id).filter_by(username=username).scalar()
+        return compute_library_counts(user_id)
+
+
+def assert_matches_recount(storyloom, client, username):
+    counted = recount(storyloom, username)
+    current = stats(client)
+    assert current['totalStoriesSaved'] == counted['total_saved']
+    assert current['storiesByGenre'] == counted['genre_counts']
+    assert current['storiesByAgeGroup'] == counted['age_group_counts']
+    return current
+
+
+def test_stats_follow_saves_deletes_and_genre_edits(storyloom, register):
+    client = register('stats_follow')
+
+    fox = save(client, 'The Fox', 'Fantasy')
+    save(client, 'The Owl', 'Fantasy', 'teens')
+    moon = save(client, 'The Moon', 'Mystery')
+    current = assert_matches_recount(storyloom, client, 'stats_follow')
+    assert current['storiesByGenre'] == {'Fantasy': 2, 'Mystery': 1}
+    assert current['storiesByAgeGroup'] == {'children': 2, 'teens': 1}
+
+    assert client.delete(f'/api/library/stories/{moon}').status_code == 200
+    current = assert_matches_recount(storyloom, client, 'stats_follow')
+    assert current['totalStoriesSaved'] == 2
+    assert 'Mystery' not in current['storiesByGenre']
+
+    assert client.put(f'/api/library/stories/{fox}', json={'genre': 'Comedy'}).status_code == 200
+    current = assert_matches_recount(storyloom, client, 'stats_follow')
+    assert current['storiesByGenre'] == {'Fantasy': 1, 'Comedy': 1}
+
+
+def test_duplicate_save_is_not_counted_twice(storyloom, register):
+    client = register('stats_duplicate')
+
+    save(client, 'The Fox', 'Fantasy')
+    repeat = client.post('/api/library/stories', json={
+        'title': 'The Fox', 'genre': 'Fantasy', 'content': 'The Fox happened. ' * 10, 'ageGroup': 'children'})
+    assert repeat.status_code == 200
+
+    assert assert_matches_recount(storyloom, client, 'stats_duplicate')['totalStoriesSaved'] == 1
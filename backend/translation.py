@@ -0,0 +1,245 @@
+"""
+Translation Service
+Translation memory (LRU in front of SQLite) plus batched, concurrent
+translation of cache misses through a pluggable translator backend
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import http_client
+
+
+class TranslatorBackend(ABC):
+    """
+    Translates a list of texts in one go; implementations must preserve order.
+    `max_chars` is the largest request the backend accepts and `separator` what
+    it puts between packed texts, so batches are sized for the backend in use.
+    """
+
+    def __init__(self, max_chars: int = 4500, separator: str = '\n\n'):
+        self.max_chars = max_chars
+        self.separator = separator
+
+    @abstractmethod
+    def translate_batch(self, texts: List[str], target: str, source: str = 'en') -> List[str]:
+        pass
+
+    @property
+    @abstractmethod
+    def name(self) -> str:
+        pass
+
+
+class GoogleTranslateBackend(TranslatorBackend):
+    """
+    deep-translator's GoogleTranslator. Several texts are packed into one request
+    separated by a marker line; if the marker does not survive translation the
+    batch is retried one text per request.
+    """
+
+    def __init__(self, max_chars: int = 4500, separator: str = '\n\n|||\n\n'):
+        # GoogleTranslator rejects input over 5000 characters
+        super().__init__(max_chars, separator)
+        self.marker = separator.strip()
+        # Only the Google backend needs deep-translator routed through the shared pool
+        http_client.install_translator_session()
+
+    @property
+    def name(self) -> str:
+        return 'google'
+
+    def translate_batch(self, texts: List[str], target: str, source: str = 'en') -> List[str]:
+        from deep_translator import GoogleTranslator
+        # GoogleTranslator mutates per-request state, so never share an instance between threads
+        translator = GoogleTranslator(source=source, target=target)
+        if len(texts) == 1:
+            return [translator.translate(texts[0])]
+
+        joined = translator.translate(self.separator.join(texts))
+        parts = [p.strip() for p in (joined or '').split(self.marker)]
+        if len(parts) == len(texts):
+            return parts
+
+        print(f"⚠️  Batch separator lost in translation, retrying {len(texts)} texts individually")
+        return [translator.translate(text) for text in texts]
+
+
+class LocalTranslatorBackend(TranslatorBackend):
+    """
+    Offline stand-in for development and tests: tags each text with the target
+    language ("[de] Once upon a time") instead of translating it
+    """
+
+    @property
+    def name(self) -> str:
+        return 'local'
+
+    def translate_batch(self, texts: List[str], target: str, source: str = 'en') -> List[str]:
+        return [f'[{target}] {text}' for text in texts]
+
+
+BACKENDS = {'google': GoogleTranslateBackend, 'local': LocalTranslatorBackend}
+
+
+def create_backend(name: Optional[str] = None) -> TranslatorBackend:
+    """Backend named by `name` or TRANSLATOR_BACKEND (default: google)"""
+    name = (name or os.getenv('TRANSLATOR_BACKEND', 'google')).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown translator backend '{name}' (expected one of: {', '.join(BACKENDS)})")
+    return BACKENDS[name]()
+
+
+class TranslationMemory:
+    """(source hash, target language) -> translation, LRU in memory over a SQLite table"""
+
+    def __init__(self, db_path: Optional[str] = None, max_entries: Optional[int] = None):
+        default_path = Path(__file__).parent / 'instance' / 'translation_memory.db'
+        self.db_path = db_path or os.getenv('TRANSLATION_MEMORY_DB', str(default_path))
+        self.max_entries = max_entries or int(os.getenv('TRANSLATION_MEMORY_LRU_SIZE', 5000))
+        self._entries: 'OrderedDict[tuple, str]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'disk_hits': 0, 'misses': 0}
+
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS translation_memory ('
+                'source_hash TEXT NOT NULL, target TEXT NOT NULL, translated TEXT NOT NULL, '
+                'created_at REAL NOT NULL, PRIMARY KEY (source_hash, target))'
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def source_hash(text: str, source: str = 'en') -> str:
+        return hashlib.sha256(f"{source}\x00{text}".encode('utf-8')).hexdigest()
+
+    def get_many(self, hashes: Sequence[str], target: str) -> Dict[str, str]:
+        found: Dict[str, str] = {}
+        missing = []
+        with self._lock:
+            for h in hashes:
+                value = self._entries.get((h, target))
+                if value is not None:
+                    self._entries.move_to_end((h, target))
+                    found[h] = value
+                    self.stats['hits'] += 1
+                else:
+                    missing.append(h)
+
+        if missing:
+            try:
+                with self._connect() as conn:
+                    # Stay well below SQLite's bound-parameter limit
+                    for i in range(0, len(missing), 500):
+                        chunk = missing[i:i + 500]
+                        rows = conn.execute(
+                            f"SELECT source_hash, translated FROM translation_memory "
+                            f"WHERE target = ? AND source_hash IN ({','.join('?' * len(chunk))})",
+                            [target, *chunk]
+                        ).fetchall()
+                        for h, translated in rows:
+                            found[h] = translated
+                            self._remember(h, target, translated)
+            except sqlite3.Error as e:
+                print(f"⚠️  Translation memory read failed: {e}")
+
+        with self._lock:
+            self.stats['disk_hits'] += sum(1 for h in missing if h in found)
+            self.stats['misses'] += sum(1 for h in missing if h not in found)
+        return found
+
+    def put_many(self, items: Dict[str, str], target: str) -> None:
+        for h, translated in items.items():
+            self._remember(h, target, translated)
+        try:
+            with self._connect() as conn:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO translation_memory (source_hash, target, translated, created_at) '
+                    'VALUES (?, ?, ?, ?)',
+                    [(h, target, translated, time.time()) for h, translated in items.items()]
+                )
+        except sqlite3.Error as e:
+            print(f"⚠️  Translation memory write failed: {e}")
+
+    def _remember(self, source_hash: str, target: str, translated: str) -> None:
+        with self._lock:
+            self._entries[(source_hash, target)] = translated
+            self._entries.move_to_end((source_hash, target))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class TranslationService:
+    """Translate many texts with as few backend calls as possible"""
+
+    def __init__(self, backend: Optional[TranslatorBackend] = None, memory: Optional[TranslationMemory] = None,
+                 max_workers: Optional[int] = None):
+        self.backend = backend or create_backend()
+        self.memory = memory or TranslationMemory()
+        self.max_workers = max_workers or int(os.getenv('TRANSLATION_WORKERS', 4))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='translate')
+
+    def translate_texts(self, texts: Sequence[str], target: str, source: str = 'en') -> List[str]:
+        """Translations of `texts` in the same order; duplicates are translated once"""
+        if source == target:
+            return list(texts)
+
+        hashes = [TranslationMemory.source_hash(text, source) for text in texts]
+        unique: Dict[str, str] = {}
+        for h, text in zip(hashes, texts):
+            unique.setdefault(h, text)
+
+        translated = self.memory.get_many(list(unique), target)
+        misses = [(h, text) for h, text in unique.items() if h not in translated]
+
+        if misses:
+            batches = self._batches(misses)
+            print(f"🌍 Translating {len(misses)} new texts to {target} in {len(batches)} request(s)")
+            futures = [
+                self._executor.submit(self.backend.translate_batch, [text for _, text in batch], target, source)
+                for batch in batches
+            ]
+            fresh: Dict[str, str] = {}
+            for batch, future in zip(batches, futures):
+                for (h, _), result in zip(batch, future.result()):
+                    fresh[h] = result
+            self.memory.put_many(fresh, target)
+            translated.update(fresh)
+
+        return [translated[h] for h in hashes]
+
+    def _batches(self, items):
+        """Group texts into requests under the backend's size limit"""
+        batches, current, size = [], [], 0
+        for item in items:
+            length = len(item[1]) + len(self.backend.separator)
+            if current and size + length > self.backend.max_chars:
+                batches.append(current)
+                current, size = [], 0
+            current.append(item)
+            size += length
+        if current:
+            batches.append(current)
+        return batches
+
+    def get_stats(self):
+        with self.memory._lock:
+            return dict(self.memory.stats)
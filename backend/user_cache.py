@@ -0,0 +1,99 @@
+"""
+Authenticated User Cache
+Short-TTL, per-process cache behind Flask-Login's user_loader, so requests
+from a logged-in user (stats polling, library calls) skip the user SELECT.
+Entries hold column values, not ORM objects: each hit rebuilds a User and
+attaches it to the request's session without a query, so changes made to
+current_user are still flushed normally. ORM writes to a user drop its entry;
+statements that bypass the ORM (quota.py) call invalidate() themselves.
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import make_transient_to_detached
+from models import db, User
+
+
+class UserCache:
+    """LRU + TTL map of user id to column values"""
+
+    def __init__(self, ttl: Optional[float] = None, max_entries: Optional[int] = None):
+        self.ttl = ttl if ttl is not None else float(os.getenv('USER_CACHE_TTL', 30))
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv('USER_CACHE_MAX_ENTRIES', 10000))
+        self._entries: 'OrderedDict[int, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0  # bumped by every invalidation, so a slow miss cannot store stale values
+        self._columns = [c.key for c in User.__mapper__.column_attrs]
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+        # Any ORM flush that changes a user (profile, streaks, admin edits) drops it here
+        event.listen(User, 'after_update', self._on_write)
+        event.listen(User, 'after_delete', self._on_write)
+
+    def _on_write(self, mapper, connection, target) -> None:
+        self.invalidate(target.id)
+
+    def get(self, user_id: int) -> Optional[User]:
+        """The user, attached to the current session; None if it does not exist"""
+        if self.ttl <= 0:
+            return db.session.get(User, user_id)
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.stats['hits'] += 1
+                values = entry[1]
+            else:
+                values = None
+                generation = self._generation
+                self.stats['misses'] += 1
+
+        if values is not None:
+            # Already in this session (e.g. loaded earlier in the request): use that one
+            existing = db.session.identity_map.get(db.session.identity_key(User, user_id))
+            if existing is not None:
+                return existing
+            user = User(**values)
+            make_transient_to_detached(user)
+            db.session.add(user)
+            return user
+
+        user = db.session.get(User, user_id)
+        if user is not None:
+            self._store(user_id, {key: getattr(user, key) for key in self._columns}, now, generation)
+        return user
+
+    def _store(self, user_id: int, values: Dict, now: float, generation: int) -> None:
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[user_id] = (now + self.ttl, values)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._generation += 1
+            if self._entries.pop(user_id, None) is not None:
+                self.stats['invalidations'] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {**self.stats, 'entries': len(self._entries), 'ttl': self.ttl}
+
+
+# One per process, shared by app.py's user_loader and quota.py
+user_cache = UserCache()
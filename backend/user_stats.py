@@ -0,0 +1,134 @@
+"""
+Materialized User Statistics
+The user_stats row is updated in the same transaction as the change it
+reflects (story saved, edited or deleted, activity recorded), so the dashboard
+reads one row instead of counting the library. Every update starts with an
+atomic UPDATE of a counter, which takes the row's write lock, and only then
+reads and rewrites the per-genre / per-age-group JSON, so concurrent writers
+cannot lose each other's changes. Callers commit.
+"""
+
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import func, update
+from models import db, User, Story, UserStats
+
+
+def _adjust(counts: Optional[Dict[str, int]], key: str, delta: int) -> Dict[str, int]:
+    # A new dict, so the JSON column sees the change
+    counts = dict(counts or {})
+    value = counts.get(key, 0) + delta
+    if value > 0:
+        counts[key] = value
+    else:
+        counts.pop(key, None)
+    return counts
+
+
+def _lock_stats(user_id: int, **increments) -> Optional[UserStats]:
+    """Apply counter increments and return the (now write-locked) row; None if the user has no row yet"""
+    values = {name: getattr(UserStats, name) + delta for name, delta in increments.items()}
+    updated = db.session.execute(
+        update(UserStats).where(UserStats.user_id == user_id)
+        .values(updated_at=datetime.utcnow(), **values)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not updated:
+        return None
+    return db.session.get(UserStats, user_id, populate_existing=True)
+
+
+def story_added(user_id: int, genre: str, age_group: str) -> None:
+    """Count a story that was just added to the session"""
+    stats = _lock_stats(user_id, total_saved=1)
+    if stats is None:
+        # Built from the story table, which already includes the new (flushed) story
+        rebuild_user_stats(user_id)
+        return
+    stats.genre_counts = _adjust(stats.genre_counts, str(genre), 1)
+    stats.age_group_counts = _adjust(stats.age_group_counts, str(age_group), 1)
+
+
+def story_removed(user_id: int, genre: str, age_group: str) -> None:
+    """Uncount a story that was just deleted in the session"""
+    stats = _lock_stats(user_id, total_saved=-1)
+    if stats is None:
+        rebuild_user_stats(user_id)
+        return
+    stats.genre_counts = _adjust(stats.genre_counts, str(genre), -1)
+    stats.age_group_counts = _adjust(stats.age_group_counts, str(age_group), -1)
+
+
+def story_regenred(user_id: int, old_genre: str, new_genre: str) -> None:
+    """Move a story between genre buckets after an edit"""
+    if old_genre == new_genre:
+        return
+    stats = _lock_stats(user_id)
+    if stats is None:
+        rebuild_user_stats(user_id)
+        return
+    counts = _adjust(stats.genre_counts, str(old_genre), -1)
+    stats.genre_counts = _adjust(counts, str(new_genre), 1)
+
+
+def record_activity(user_id: int, now: Optional[datetime] = None) -> UserStats:
+    """Count one generated story and extend, keep or restart the daily streak"""
+    stats = _lock_stats(user_id, stories_generated=1)
+    if stats is None:
+        rebuild_user_stats(user_id)
+        stats = _lock_stats(user_id, stories_generated=1)
+
+    today = (now or datetime.utcnow()).date()
+    days = (today - stats.last_active_on).days if stats.last_active_on else None
+    if days == 1:
+        stats.current_streak += 1
+    elif days is None or days > 1 or stats.current_streak == 0:
+        stats.current_streak = 1
+    stats.longest_streak = max(stats.longest_streak, stats.current_streak)
+    stats.last_active_on = today
+    return stats
+
+
+def compute_library_counts(user_id: int) -> Dict:
+    """The library-derived numbers, counted from the story table"""
+    genre_counts = dict(db.session.query(Story.genre, func.count(Story.id))
+                        .filter(Story.user_id == user_id).group_by(Story.genre).all())
+    age_group_counts = dict(db.session.query(Story.age_group, func.count(Story.id))
+                            .filter(Story.user_id == user_id).group_by(Story.age_group).all())
+    return {
+        'total_saved': sum(genre_counts.values()),
+        'genre_counts': {str(k): v for k, v in genre_counts.items()},
+        'age_group_counts': {str(k): v for k, v in age_group_counts.items()},
+    }
+
+
+def rebuild_user_stats(user_id: int) -> UserStats:
+    """
+    Recount the library numbers from the story table. Activity and streaks have
+    no other source: they are kept, or seeded from the legacy user columns.
+    """
+    stats = db.session.get(UserStats, user_id)
+    if stats is None:
+        user = db.session.get(User, user_id)
+        stats = UserStats(
+            user_id=user_id,
+            stories_generated=user.stories_generated or 0,
+            current_streak=user.current_streak or 0,
+            longest_streak=user.longest_streak or 0,
+            last_active_on=user.last_activity.date() if user.last_activity else None
+        )
+        db.session.add(stats)
+    for name, value in compute_library_counts(user_id).items():
+        setattr(stats, name, value)
+    stats.updated_at = datetime.utcnow()
+    return stats
+
+
+def get_user_stats(user_id: int) -> UserStats:
+    """One primary-key lookup; users from before the stats table get their row built once"""
+    stats = db.session.get(UserStats, user_id)
+    if stats is None:
+        stats = rebuild_user_stats(user_id)
+        db.session.commit()
+    return stats
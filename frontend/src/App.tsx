@@ -1,8 +1,8 @@
 import { useState, useEffect } from 'react';
 import { BookOpen, Sparkles, CheckCircle, XCircle, Loader2, GraduationCap, Volume2 } from 'lucide-react';
 import toast, { Toaster } from 'react-hot-toast';
-import { storyApi, authApi, libraryApi, userApi } from './services/api';
-import type { Theme, StoryWithQuiz, ViewType, AgeGroup, AgeGroupInfo, Flashcard, User, SavedStory, UserStats } from './types';
+import { storyApi, authApi, libraryApi, userApi, newIdempotencyKey } from './services/api';
+import type { Theme, StoryWithQuiz, ViewType, AgeGroup, AgeGroupInfo, Flashcard, User, SavedStorySummary, UserStats } from './types';
 import Header from './components/Header';
 import LoadingBar from './components/LoadingBar';
 import Footer from './components/Footer';
@@ -42,10 +42,12 @@ export default function StoryLoom() {
   const [isRecovering, setIsRecovering] = useState(false);
 
   // Library state
-  const [savedStories, setSavedStories] = useState<SavedStory[]>([]);
+  const [savedStories, setSavedStories] = useState<SavedStorySummary[]>([]);
   const [isLoadingLibrary, setIsLoadingLibrary] = useState(false);
   const [isSavingStory, setIsSavingStory] = useState(false);
   const [currentLoadedStoryId, setCurrentLoadedStoryId] = useState<number | null>(null);
+  // Idempotency-Key for saving the generated story, so double-clicks and retries store it once
+  const [saveKey, setSaveKey] = useState<string | null>(null);
 
   // User stats state
   const [userStats, setUserStats] = useState<UserStats>({
@@ -272,6 +274,7 @@ export default function StoryLoom() {
         ...story,
         questions: [], // Empty initially
       });
+      setSaveKey(newIdempotencyKey());
 
       setActiveView('story');
       setCurrentQuestion(0);
@@ -296,6 +299,7 @@ export default function StoryLoom() {
       const flashcardData = await storyApi.generateFlashcards({
         content: currentStory.content,
         ageGroup: selectedAgeGroup,
+        storyId: currentLoadedStoryId ?? undefined,
       });
       setFlashcards(flashcardData.flashcards);
       setCurrentFlashcardIndex(0);
@@ -325,6 +329,15 @@ export default function StoryLoom() {
     setSelectedLanguage(language);
 
     try {
+      // Saved stories are translated in one call (and stored server-side per language)
+      if (currentLoadedStoryId) {
+        const { translation } = await libraryApi.translateStory(currentLoadedStoryId, language);
+        setTranslatedStory(translation.content);
+        setTranslatedQuiz(translation.questions);
+        setTranslatedFlashcards(translation.flashcards);
+        return;
+      }
+
       // Translate story content
       const storyResult = await storyApi.translate({
         text: currentStory.content,
@@ -394,6 +407,7 @@ export default function StoryLoom() {
           title: currentStory!.title,
           content: currentStory!.content,
           ageGroup: selectedAgeGroup,
+          storyId: currentLoadedStoryId ?? undefined,
         });
         setCurrentStory({
           ...currentStory!,
@@ -458,6 +472,7 @@ export default function StoryLoom() {
     setTranslatedFlashcards([]);
     setCoverImage(null);
     setCurrentLoadedStoryId(null);
+    setSaveKey(null);
   };
 
   const flipFlashcard = () => {
@@ -595,9 +610,10 @@ export default function StoryLoom() {
         ...currentStory,
         ageGroup: selectedAgeGroup,
         coverImage: coverImage || undefined,
-      });
+      }, saveKey ?? undefined);
       setCurrentLoadedStoryId(story.id);
-      setSavedStories((prev) => [...prev, story]);
+      // A repeated save returns the copy that is already in the library
+      setSavedStories((prev) => (prev.some((s) => s.id === story.id) ? prev : [...prev, story]));
       // Update stats after saving a story
       try {
         const stats = await userApi.getStats();
@@ -1,9 +1,9 @@
 import { Loader2, Library, Sparkles, BookOpen, Trash2 } from 'lucide-react';
-import type { SavedStory } from '../types';
+import type { SavedStorySummary } from '../types';
 
 interface LibraryViewProps {
   isLoadingLibrary: boolean;
-  savedStories: SavedStory[];
+  savedStories: SavedStorySummary[];
   handleNewStory: () => void;
   handleLoadSavedStory: (storyId: number) => void;
   handleDeleteStory: (storyId: number) => void;
@@ -79,7 +79,7 @@ export default function LibraryView({
                   <span>{story.readTime}</span>
                 </div>
                 <p className="text-slate-400 text-sm mb-4 line-clamp-2">
-                  {story.content.substring(0, 100)}...
+                  {story.excerpt}...
                 </p>
                 
                 {/* Actions */}
@@ -17,6 +17,9 @@ import type {
   AuthResponse,
   User,
   SavedStory,
+  SavedStorySummary,
+  StoryTranslation,
+  StorySearchResult,
   StoryWithQuiz
 } from '../types';
 
@@ -25,6 +28,12 @@ const API_BASE_URL = import.meta.env.VITE_API_TARGET || '/api';
 // Configure axios to send cookies
 axios.defaults.withCredentials = true;
 
+// Key for the Idempotency-Key header (the backend accepts 1-64 characters)
+export const newIdempotencyKey = (): string =>
+  typeof crypto !== 'undefined' && typeof crypto.randomUUID === 'function'
+    ? crypto.randomUUID()
+    : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+
 export const storyApi = {
   // Health check
   healthCheck: async (): Promise<{ status: string; message: string }> => {
@@ -110,15 +119,35 @@ export const authApi = {
 
 // Story Library API
 export const libraryApi = {
-  // Get all user's saved stories
-  getStories: async (): Promise<{ stories: SavedStory[] }> => {
-    const response = await axios.get(`${API_BASE_URL}/library/stories`);
+  // Get all user's saved stories (summary fields only, fetched page by page)
+  getStories: async (): Promise<{ stories: SavedStorySummary[] }> => {
+    const stories: SavedStorySummary[] = [];
+    let cursor: string | null = null;
+    do {
+      const response: { data: { stories: SavedStorySummary[]; nextCursor: string | null } } = await axios.get(
+        `${API_BASE_URL}/library/stories`,
+        { params: { fields: 'summary', limit: 100, cursor: cursor || undefined } }
+      );
+      stories.push(...response.data.stories);
+      cursor = response.data.nextCursor;
+    } while (cursor);
+    return { stories };
+  },
+
+  // Full-text search over the user's library, best matches first
+  searchStories: async (q: string, limit = 20, offset = 0): Promise<{ results: StorySearchResult[]; nextOffset: number | null }> => {
+    const response = await axios.get(`${API_BASE_URL}/library/search`, { params: { q, limit, offset } });
     return response.data;
   },
 
-  // Save a story
-  saveStory: async (story: StoryWithQuiz & { ageGroup: string; coverImage?: string }): Promise<{ message: string; story: SavedStory }> => {
-    const response = await axios.post(`${API_BASE_URL}/library/stories`, story);
+  // Save a story; saving the same story (or reusing idempotencyKey) returns the existing copy
+  saveStory: async (
+    story: StoryWithQuiz & { ageGroup: string; coverImage?: string },
+    idempotencyKey?: string
+  ): Promise<{ message: string; story: SavedStory }> => {
+    const response = await axios.post(`${API_BASE_URL}/library/stories`, story, {
+      headers: idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : undefined,
+    });
     return response.data;
   },
 
@@ -134,6 +163,12 @@ export const libraryApi = {
     return response.data;
   },
 
+  // Translate a saved story with its quiz and flashcards in one request
+  translateStory: async (storyId: number, language: string): Promise<{ translation: StoryTranslation; languageName: string }> => {
+    const response = await axios.post(`${API_BASE_URL}/library/stories/${storyId}/translate/${language}`);
+    return response.data;
+  },
+
   // Delete a story
   deleteStory: async (storyId: number): Promise<{ message: string }> => {
     const response = await axios.delete(`${API_BASE_URL}/library/stories/${storyId}`);
@@ -149,6 +184,10 @@ export const userApi = {
     currentStreak: number;
     longestStreak: number;
     totalStoriesSaved: number;
+    storiesRemainingToday?: number;
+    dailyStoryLimit?: number;
+    storiesByGenre?: Record<string, number>;
+    storiesByAgeGroup?: Record<string, number>;
   }> => {
     const response = await axios.get(`${API_BASE_URL}/user/stats`);
     return response.data;
@@ -3,12 +3,47 @@ export interface Story {
   genre: string;
   content: string;
   readTime: string;
-  coverImage?: string; // Base64 image data
+  coverImage?: string; // Cover URL (legacy stories may still hold base64 data)
 }
 
 export interface SavedStory extends Story {
   id: number;
   ageGroup: AgeGroup;
+  excerpt: string;
+  questions: Question[];
+  flashcards: Flashcard[];
+  createdAt: string;
+}
+
+// Library listing row: the card fields only, with the first characters of the text
+export interface SavedStorySummary {
+  id: number;
+  title: string;
+  genre: string;
+  ageGroup: AgeGroup;
+  readTime: string;
+  coverImage?: string;
+  excerpt: string;
+  createdAt: string;
+}
+
+export interface StorySearchResult {
+  id: number;
+  title: string;
+  genre: string;
+  ageGroup: AgeGroup;
+  readTime: string;
+  coverImage?: string;
+  createdAt: string;
+  snippet: string; // HTML: escaped story text with <mark> around matches
+  score: number | null; // BM25 relevance (null when the server falls back to unranked search)
+}
+
+export interface StoryTranslation {
+  storyId: number;
+  language: string;
+  title: string;
+  content: string;
   questions: Question[];
   flashcards: Flashcard[];
   createdAt: string;
@@ -29,6 +64,10 @@ export interface UserStats {
   currentStreak: number;
   longestStreak: number;
   totalStoriesSaved: number;
+  storiesRemainingToday?: number;
+  dailyStoryLimit?: number;
+  storiesByGenre?: Record<string, number>;
+  storiesByAgeGroup?: Record<string, number>;
 }
 
 export interface AuthResponse {
@@ -103,11 +142,13 @@ export interface GenerateQuizRequest {
   title: string;
   content: string;
   ageGroup: AgeGroup;
+  storyId?: number; // Saved story whose stored quiz can be reused
 }
 
 export interface GenerateFlashcardsRequest {
   content: string;
   ageGroup: AgeGroup;
+  storyId?: number; // Saved story whose stored flashcards can be reused
 }
 
 export interface TranslateRequest {
@@ -125,10 +166,18 @@ export interface GenerateCoverImageRequest {
   title: string;
   genre: string;
   summary?: string;
+  inline?: boolean;
+  regenerate?: boolean; // bypass the cover cache
 }
 
 export interface CoverImageResponse {
-  imageData: string | null;
+  imageData: string | null; // /api/covers/<hash> URL (data-URI when requested inline)
+  coverHash?: string;
+  thumbnails?: Record<string, string>;
+  width?: number;
+  height?: number;
+  sourceFormat?: string;
+  cached?: 'exact' | 'similar' | null;
   prompt?: string;
   error?: string;
   fallback?: boolean;